@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api import auth, posts, machines, calculate, analysis, reports
+from app.api import auth, posts, machines, calculate, analysis, reports, jobs, profiles
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="")
@@ -8,3 +8,5 @@ api_router.include_router(machines.router, prefix="")
 api_router.include_router(calculate.router, prefix="")
 api_router.include_router(analysis.router, prefix="")
 api_router.include_router(reports.router, prefix="")
+api_router.include_router(jobs.router, prefix="")
+api_router.include_router(profiles.router, prefix="")
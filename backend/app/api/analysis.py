@@ -1,19 +1,19 @@
-"""分析页对话 API"""
+"""分析页对话 API：数据库读写走异步会话（get_async_db），不阻塞其他进行中的 SSE 流"""
 import json
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user
-from app.models import User, MachineClient, AnalysisSession, AnalysisMessage
+from app.api.deps import get_current_user
+from app.api.sse import sse_line
+from app.db.session import get_async_db, get_async_sessionmaker
+from app.models import User
 from app.services.analysis_chat import handle_analysis_chat, handle_analysis_chat_stream
+from app.services.analysis_store import client_names, save_chat_turn
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
-ADMIN_ID = 999
-
-
 class ChatMessage(BaseModel):
     role: str
     content: str
@@ -39,7 +39,7 @@ def _title_from_content(content: str, max_len: int = 28) -> str:
 @router.post("/chat")
 async def analysis_chat(
     body: AnalysisChatRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """分析页对话：支持意图识别、设备表格解析落库、能耗计算意图解析。可选 session_id 持久化消息。"""
@@ -51,10 +51,7 @@ async def analysis_chat(
         attachments = [{"type": a.type, "content": a.content} for a in body.attachments]
 
     # 当前用户客户列表，供模型引导用
-    q = db.query(MachineClient.name).filter(MachineClient.name.isnot(None)).distinct()
-    if current_user.id != ADMIN_ID:
-        q = q.filter(MachineClient.user_id == current_user.id)
-    context_clients = [r[0] for r in q.all() if r[0]]
+    context_clients = await client_names(db, current_user.id)
 
     try:
         result = await handle_analysis_chat(
@@ -69,47 +66,23 @@ async def analysis_chat(
         raise HTTPException(status_code=400, detail=str(e))
 
     # 持久化到 AnalysisSession / AnalysisMessage（可选）
-    session_id = body.session_id
-    if session_id is not None:
-        session = db.query(AnalysisSession).filter(
-            AnalysisSession.id == session_id,
-            AnalysisSession.user_id == current_user.id,
-        ).first()
-        if not session:
-            session_id = None
-    if session_id is None:
-        session = AnalysisSession(
-            user_id=current_user.id,
-            title=_title_from_content(body.message),
-        )
-        db.add(session)
-        db.commit()
-        db.refresh(session)
-        session_id = session.id
-
-    # 保存本轮 user + assistant 消息
-    db.add(AnalysisMessage(session_id=session_id, role="user", content=body.message))
-    db.add(AnalysisMessage(session_id=session_id, role="assistant", content=result.get("reply", "")))
-    db.commit()
+    session_id = await save_chat_turn(
+        db,
+        current_user.id,
+        body.session_id,
+        _title_from_content(body.message),
+        body.message,
+        result.get("reply", ""),
+    )
 
     result["session_id"] = session_id
     return result
 
 
-def _sse_line(event: str, data: str) -> str:
-    """生成一条 SSE：event + data；data 内换行按 SSE 规范用多行 data 表示。"""
-    lines = (data or "").split("\n")
-    out = f"event: {event}\n"
-    for line in lines:
-        out += f"data: {line}\n"
-    out += "\n"
-    return out
-
-
 @router.post("/chat/stream")
 async def analysis_chat_stream(
     body: AnalysisChatRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """流式对话：先推 content 事件（文本块），最后推 done 事件（含 intent、session_id 等）。"""
@@ -120,59 +93,45 @@ async def analysis_chat_stream(
     if body.attachments:
         attachments = [{"type": a.type, "content": a.content} for a in body.attachments]
 
-    q = db.query(MachineClient.name).filter(MachineClient.name.isnot(None)).distinct()
-    if current_user.id != ADMIN_ID:
-        q = q.filter(MachineClient.user_id == current_user.id)
-    context_clients = [r[0] for r in q.all() if r[0]]
+    context_clients = await client_names(db, current_user.id)
 
     async def generate():
-        reply_acc = []
-        metadata = None
-        try:
-            async for typ, data in handle_analysis_chat_stream(
-                message=body.message,
-                history=history,
-                attachments=attachments,
-                db=db,
-                current_user=current_user,
-                context_clients=context_clients or None,
-            ):
-                if typ == "content":
-                    reply_acc.append(data)
-                    yield _sse_line("content", data)
-                elif typ == "done":
-                    metadata = json.loads(data)
-                    break
-        except Exception as e:
-            yield _sse_line("error", json.dumps({"detail": str(e)}, ensure_ascii=False))
-            return
-
-        full_reply = "".join(reply_acc)
-        session_id = body.session_id
-        if session_id is not None:
-            session = db.query(AnalysisSession).filter(
-                AnalysisSession.id == session_id,
-                AnalysisSession.user_id == current_user.id,
-            ).first()
-            if not session:
-                session_id = None
-        if session_id is None:
-            session = AnalysisSession(
-                user_id=current_user.id,
-                title=_title_from_content(body.message),
+        # 流式响应在接口返回后才开始迭代，生成器自带会话，不依赖请求级会话的生命周期
+        async with get_async_sessionmaker()() as stream_db:
+            reply_acc = []
+            metadata = None
+            try:
+                async for typ, data in handle_analysis_chat_stream(
+                    message=body.message,
+                    history=history,
+                    attachments=attachments,
+                    db=stream_db,
+                    current_user=current_user,
+                    context_clients=context_clients or None,
+                ):
+                    if typ == "content":
+                        reply_acc.append(data)
+                        yield sse_line("content", data)
+                    elif typ == "done":
+                        metadata = json.loads(data)
+                        break
+            except Exception as e:
+                yield sse_line("error", json.dumps({"detail": str(e)}, ensure_ascii=False))
+                return
+
+            full_reply = "".join(reply_acc)
+            session_id = await save_chat_turn(
+                stream_db,
+                current_user.id,
+                body.session_id,
+                _title_from_content(body.message),
+                body.message,
+                full_reply,
             )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-            session_id = session.id
-
-        db.add(AnalysisMessage(session_id=session_id, role="user", content=body.message))
-        db.add(AnalysisMessage(session_id=session_id, role="assistant", content=full_reply))
-        db.commit()
-
-        metadata["session_id"] = session_id
-        metadata["reply"] = full_reply
-        yield _sse_line("done", json.dumps(metadata, ensure_ascii=False))
+
+            metadata["session_id"] = session_id
+            metadata["reply"] = full_reply
+            yield sse_line("done", json.dumps(metadata, ensure_ascii=False))
 
     return StreamingResponse(
         generate(),
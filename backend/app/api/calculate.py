@@ -1,23 +1,43 @@
+import json
 import os
-import shutil
-import uuid
+from contextlib import closing
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
 from app.api.deps import get_db, get_current_user
+from app.api.profiles import load_company_profiles
+from app.api.sse import sse_line
+from app.api.reports import report_download_name
+from app.db.session import SessionLocal
 from app.models import User, MachineClient, MachineSupplier, MachineCompare, EnergyReport
-from app.services.cal_func import final_results_excel
+from app.services.cal_func import (
+    YEAR_RUNNING_TIME,
+    normalize_machines as _normalize_machines,
+    normalize_new_eq as _normalize_new_eq,
+)
+from app.services.cal_batch import scheme_savings, scheme_sheets
+from app.services.cal_sweep import sweep_savings
+from app.services.cal_matrix import savings_matrix
+from app.services.cal_montecarlo import DEFAULT_SAMPLES, monte_carlo_savings
+from app.services.hourly import hourly_fleet_savings, hourly_sheet
+from app.services.report_writer import write_report_workbook
+from app.services.report_cache import cached_results_excel, ensure_results_excel
+from app.services.portfolio import iter_portfolio, load_portfolio, restore_missing_reports, save_portfolio_reports
 from app.services.device_match import (
     client_orm_to_dict,
+    demand_p,
+    expand_scheme,
     recommend_suppliers_multi,
 )
+from app.services.catalog_snapshot import get_supplier_catalog
+from app.services.zone_recommend import ZONE_PRESSURE_STEP, recommend_by_zone
 
 router = APIRouter(prefix="/calculate", tags=["calculate"])
 
-# 生成文件存放目录（相对于 backend 根目录）
+# 报告文件存放目录（相对于 backend 根目录）；download 仅保留旧版按公司名生成的文件
 _BACKEND_APP = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 DOWNLOAD_DIR = os.path.join(_BACKEND_APP, "app", "download")
 REPORTS_DIR = os.path.join(_BACKEND_APP, "app", "reports")
@@ -34,11 +54,8 @@ def _save_report(
     energy_savings_kwh: int,
     energy_savings_cost: float | None = None,
 ) -> EnergyReport:
-    """将生成的 Excel 复制到 reports 目录并创建报告记录。"""
-    os.makedirs(REPORTS_DIR, exist_ok=True)
-    unique_name = f"report_{uuid.uuid4().hex}.xlsx"
-    dest_path = os.path.join(REPORTS_DIR, unique_name)
-    shutil.copy2(filepath, dest_path)
+    """为已写入 reports 目录的 Excel 创建报告记录（文件已直接写入，无需复制；内容相同的报告共用同一文件）。"""
+    unique_name = os.path.basename(filepath)
     title = f"{company_name} 节能量计算" if company_name else "节能量计算"
     report = EnergyReport(
         user_id=user_id,
@@ -55,6 +72,65 @@ def _save_report(
     return report
 
 
+def _calc_params(body) -> dict:
+    """从请求体中取出已设置的计算参数（未设置的按品牌/默认值）。"""
+    calc_params = {}
+    for key in ("default_ser_p", "default_por", "empty_waste_ratio", "pressure_drop_ratio"):
+        value = getattr(body, key, None)
+        if value is not None:
+            calc_params[key] = value
+    return calc_params
+
+
+class Distribution(BaseModel):
+    """输入扰动分布；relative=True 时按比例 x·(1+e)，否则为绝对量 x+e。"""
+    dist: str = "normal"  # "normal" | "uniform" | "triangular"
+    sd: float | None = None    # normal
+    low: float | None = None   # uniform / triangular
+    mode: float | None = None  # triangular，缺省 0
+    high: float | None = None  # uniform / triangular
+    relative: bool = True
+
+
+class UncertaintyRequest(BaseModel):
+    """蒙特卡洛模式：对现场估计的输入抽样，返回年节电 P10/P50/P90。"""
+    samples: int = DEFAULT_SAMPLES
+    seed: int | None = None
+    run_time: Distribution | None = None
+    load_time: Distribution | None = None
+    actual_pre: Distribution | None = None
+    ser_p: Distribution | None = None  # 品牌服务系数
+    por: Distribution | None = None    # 品牌变频加载比例
+
+
+def _uncertainty(
+    body,
+    machines: list[dict],
+    new_eq: list[dict],
+    running_hours: int,
+    calc_params: dict,
+) -> dict | None:
+    """请求带 uncertainty 时按抽样计算节电分位数；入参须已规范化。"""
+    u = body.uncertainty
+    if u is None:
+        return None
+    distributions = {
+        key: spec.model_dump(exclude_none=True)
+        for key in ("run_time", "load_time", "actual_pre", "ser_p", "por")
+        if (spec := getattr(u, key)) is not None
+    }
+    return monte_carlo_savings(
+        machines,
+        new_eq,
+        distributions,
+        samples=u.samples,
+        running_hours_per_year=running_hours,
+        calc_params=calc_params or None,
+        electricity_price=body.electricity_price,
+        seed=u.seed,
+    )
+
+
 class CalculateRequest(BaseModel):
     compare_ids: list[int]
     running_hours_per_year: int | None = 8000
@@ -63,15 +139,45 @@ class CalculateRequest(BaseModel):
     default_por: float | None = None
     empty_waste_ratio: float | None = None
     pressure_drop_ratio: float | None = None
+    uncertainty: UncertaintyRequest | None = None  # 设置时另返回年节电 P10/P50/P90
 
 
 class RecommendRequest(BaseModel):
     company_name: str
     client_nos: list[int] | None = None  # 空则该公司下全部客户机
     margin_ratio: float = 1.1
-    strategy: str = "efficiency"  # "efficiency" | "capacity"
+    strategy: str = "efficiency"  # "efficiency" | "capacity" | "optimal"（过盈最小） | "optimal_energy"（输入功率最小）
+    max_units: int | None = None  # 推荐台数上限（不超过客户机台数），空则为参与计算的客户机台数
+    top_k: int | None = None  # 设置时返回至多 top_k 个 Pareto 最优方案（过盈/比功率/台数/年耗电权衡），各方案含 metrics
     use_actual_flow: bool = True  # True=按实际用气量推荐，False=按额定用气量推荐（二者为组合上限口径）
     schemes_only: bool = False  # True=仅返回选型方案不生成 Excel；False=生成 Excel 并返回节能量
+    scheme_sheets: bool = False  # True=报告中追加「方案对比」及各方案逐台节电表
+    pressure_zones: bool = False  # True=按需求压力分区各自推荐后合并（大型站房），此时不支持 top_k / max_units
+    zone_step: float | None = None  # 分区压力级差 (MPa)，默认 0.1
+
+
+class MatrixRequest(BaseModel):
+    """客户机 × 供应商机型节电矩阵：不生成 Excel。"""
+    company_name: str
+    client_nos: list[int] | None = None  # 空则该公司下全部客户机
+    top_n: int | None = None  # 设置时每台设备只返回年节电最高的 N 个机型，否则返回完整矩阵
+    running_hours_per_year: int | None = None
+    electricity_price: float | None = None
+    default_ser_p: float | None = None
+    default_por: float | None = None
+    empty_waste_ratio: float | None = None
+    pressure_drop_ratio: float | None = None
+
+
+class PortfolioRequest(BaseModel):
+    """全部客户公司批量计算：每家公司自动推荐选型并生成报告。"""
+    running_hours_per_year: int = 8000
+    electricity_price: float | None = None
+    default_ser_p: float | None = None
+    default_por: float | None = None
+    empty_waste_ratio: float | None = None
+    pressure_drop_ratio: float | None = None
+    max_workers: int | None = Field(default=None, ge=1)  # 进程数，缺省及上限为 PORTFOLIO_WORKERS（未配置时为 CPU 核数）
 
 
 class RunWithParamsRequest(BaseModel):
@@ -85,38 +191,105 @@ class RunWithParamsRequest(BaseModel):
     default_por: float | None = None     # 变频加载比例默认值（未设则按品牌）
     empty_waste_ratio: float | None = None   # 空载浪费系数，默认 0.4
     pressure_drop_ratio: float | None = None  # 压降浪费系数，默认 0.07
+    uncertainty: UncertaintyRequest | None = None  # 设置时另返回年节电 P10/P50/P90
 
 
-@router.post("")
-def run_calculate(
-    body: CalculateRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    compare_ids = body.compare_ids
-    if not compare_ids:
-        raise HTTPException(status_code=400, detail="请至少选择一条对比数据")
+class SweepRange(BaseModel):
+    """等步长区间（含 stop）。"""
+    start: float
+    stop: float
+    step: float
+
+
+SweepValue = float | list[float] | SweepRange | None
+
+
+class SweepRequest(BaseModel):
+    """参数敏感性扫描：各参数可给单值、列表或区间，按全部组合计算年节电，不生成 Excel。
+    设备来源二选一：compare_ids（对比记录）或 machines + new_eq（与 run-with-params 相同格式）。"""
+    compare_ids: list[int] | None = None
+    machines: list[dict] | None = None
+    new_eq: list[dict] | None = None
+    running_hours_per_year: SweepValue = None
+    default_ser_p: SweepValue = None
+    default_por: SweepValue = None
+    empty_waste_ratio: SweepValue = None
+    pressure_drop_ratio: SweepValue = None
+    electricity_price: SweepValue = None
+
+
+class TariffRequest(BaseModel):
+    """分时电价：prices + schedule（24 小时时段表，可另给周末时段表），或直接给 8760 逐时电价。"""
+    prices: dict[str, float] | None = None  # 如 {"峰": 1.2, "平": 0.75, "谷": 0.35}
+    schedule: list[str] | None = None
+    weekend_schedule: list[str] | None = None
+    year_start_weekday: int = 0  # 1 月 1 日星期几，0=周一
+    hourly_prices: list[float] | None = None
+
+
+class HourlyRequest(BaseModel):
+    """按已上传的逐时负载曲线与分时电价计算节能量并生成 Excel（报告另含「分时节电」表）。
+    设备来源二选一：compare_ids，或 company_name + machines + new_eq。"""
+    company_name: str | None = None  # 负载曲线按公司查找；用 compare_ids 时取对比记录的公司
+    compare_ids: list[int] | None = None
+    machines: list[dict] | None = None
+    new_eq: list[dict] | None = None
+    tariff: TariffRequest
+    running_hours_per_year: int = 8000  # 没有负载曲线的设备按此均匀分布
+    default_ser_p: float | None = None
+    default_por: float | None = None
+    empty_waste_ratio: float | None = None
+    pressure_drop_ratio: float | None = None
+
+
+def _resolve_compare_pairs(db: Session, user: User, compare_ids: list[int]) -> tuple[str | None, list[dict], list[dict]]:
+    """按对比记录取出 (公司名, 原有设备列表, 选型设备列表)；客户机已删除的对比项跳过。
+
+    对比记录 → 客户机 → 供应商机一次外连接查出，不再逐条查库；跳过的记录按 id 逐条说明。
+    """
+    rows = (
+        db.query(MachineCompare, MachineClient, MachineSupplier)
+        .outerjoin(
+            MachineClient,
+            and_(
+                MachineClient.name == MachineCompare.company_name,
+                MachineClient.no == MachineCompare.client_no,
+            ),
+        )
+        .outerjoin(
+            MachineSupplier,
+            and_(
+                MachineSupplier.name == MachineCompare.supplier_name,
+                MachineSupplier.no == MachineCompare.supplier_no,
+            ),
+        )
+        .filter(MachineCompare.id.in_(set(compare_ids)), MachineCompare.user_id == user.id)
+        .order_by(MachineCompare.id, MachineClient.id, MachineSupplier.id)
+        .all()
+    )
+    by_id: dict[int, tuple] = {}
+    for comp, client, supp in rows:
+        by_id.setdefault(comp.id, (comp, client, supp))
     valid_pairs = []
+    missing = []
     company_name = None
     for data_id in compare_ids:
-        comp = db.query(MachineCompare).filter(
-            MachineCompare.id == data_id,
-            MachineCompare.user_id == current_user.id,
-        ).first()
+        comp, client, supp = by_id.get(data_id, (None, None, None))
         if not comp:
+            missing.append(f"对比记录 {data_id} 不存在")
             continue
-        client = db.query(MachineClient).filter(
-            and_(
-                MachineClient.name == comp.company_name,
-                MachineClient.no == comp.client_no,
-            ),
-        ).first()
         if not client:
+            missing.append(f"对比记录 {data_id} 的客户机 {comp.company_name} / {comp.client_no} 已删除")
             continue
         company_name = client.name
-        valid_pairs.append((comp, client))
+        valid_pairs.append((comp, client, supp))
+    if missing:
+        print(f"[AirComp] 对比数据跳过 {len(missing)} 条：{'；'.join(missing)}", flush=True)
     if not valid_pairs:
-        raise HTTPException(status_code=400, detail="没有有效的对比数据，请检查所选记录是否存在且客户机仍存在")
+        raise HTTPException(
+            status_code=400,
+            detail="没有有效的对比数据，请检查所选记录是否存在且客户机仍存在：" + "；".join(missing),
+        )
     machines = [
         {
             "no": c.no,
@@ -130,18 +303,15 @@ def run_calculate(
             "origin_pre": float(c.origin_pre),
             "actucal_pre": float(c.actual_pre),
         }
-        for _, c in valid_pairs
+        for _, c, _ in valid_pairs
     ]
     new_eq = []
-    for comp, _ in valid_pairs:
-        supp = db.query(MachineSupplier).filter(
-            and_(
-                MachineSupplier.name == comp.supplier_name,
-                MachineSupplier.no == comp.supplier_no,
-            ),
-        ).first()
+    for comp, _, supp in valid_pairs:
         if not supp:
-            raise HTTPException(status_code=404, detail=f"未找到供应商机: {comp.supplier_name} / {comp.supplier_no}")
+            raise HTTPException(
+                status_code=404,
+                detail=f"对比记录 {comp.id}：未找到供应商机: {comp.supplier_name} / {comp.supplier_no}",
+            )
         new_eq.append({
             "brand": supp.brand,
             "model": supp.model,
@@ -151,25 +321,35 @@ def run_calculate(
             "energy_con": float(supp.energy_con),
             "energy_con_min": float(supp.energy_con_min),
         })
+    return company_name, machines, new_eq
+
+
+@router.post("")
+def run_calculate(
+    body: CalculateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    compare_ids = body.compare_ids
+    if not compare_ids:
+        raise HTTPException(status_code=400, detail="请至少选择一条对比数据")
+    company_name, machines, new_eq = _resolve_compare_pairs(db, current_user, compare_ids)
     safe_name = "".join(c for c in str(company_name or "未命名") if c not in r'\/:*?"<>|').strip() or "未命名"
     running_hours = body.running_hours_per_year if body.running_hours_per_year is not None else 8000
-    calc_params = {}
-    if body.default_ser_p is not None:
-        calc_params["default_ser_p"] = body.default_ser_p
-    if body.default_por is not None:
-        calc_params["default_por"] = body.default_por
-    if body.empty_waste_ratio is not None:
-        calc_params["empty_waste_ratio"] = body.empty_waste_ratio
-    if body.pressure_drop_ratio is not None:
-        calc_params["pressure_drop_ratio"] = body.pressure_drop_ratio
-    filepath, energy_savings_kwh = final_results_excel(
-        company_name or "未命名",
-        machines,
-        new_eq,
-        DOWNLOAD_DIR,
-        running_hours_per_year=running_hours,
-        calc_params=calc_params if calc_params else None,
-    )
+    calc_params = _calc_params(body)
+    machines = _normalize_machines(machines)
+    new_eq = _normalize_new_eq(new_eq)
+    try:
+        filepath, energy_savings_kwh = cached_results_excel(
+            machines,
+            new_eq,
+            REPORTS_DIR,
+            running_hours_per_year=running_hours,
+            calc_params=calc_params if calc_params else None,
+        )
+        uncertainty = _uncertainty(body, machines, new_eq, running_hours, calc_params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     energy_savings_cost = None
     if body.electricity_price is not None and body.electricity_price >= 0:
         energy_savings_cost = round(energy_savings_kwh * body.electricity_price, 2)
@@ -177,6 +357,7 @@ def run_calculate(
         db, current_user.id, "manual", filepath, safe_name,
         energy_savings_kwh, energy_savings_cost,
     )
+    ensure_results_excel(filepath, machines, new_eq, REPORTS_DIR, running_hours, calc_params if calc_params else None)
     filename = os.path.basename(filepath)
     result = {
         "message": "生成成功，已加入历史报告",
@@ -187,9 +368,81 @@ def run_calculate(
     }
     if energy_savings_cost is not None:
         result["energy_savings_cost"] = energy_savings_cost
+    if uncertainty is not None:
+        result["uncertainty"] = uncertainty
     return result
 
 
+@router.post("/sweep")
+def run_sweep(
+    body: SweepRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """参数敏感性扫描：返回各扫描轴取值及年节电 kWh（给出电费时另返回电费）矩阵，矩阵维度按 axes 顺序。"""
+    company_name = None
+    if body.compare_ids:
+        company_name, machines, new_eq = _resolve_compare_pairs(db, current_user, body.compare_ids)
+    elif body.machines and body.new_eq:
+        machines = body.machines
+        new_eq = body.new_eq
+        if len(machines) != len(new_eq):
+            raise HTTPException(status_code=400, detail="原有设备与选型设备数量须一致")
+    else:
+        raise HTTPException(status_code=400, detail="请提供对比数据或原有设备与选型设备")
+    axes = body.model_dump(exclude={"compare_ids", "machines", "new_eq"})  # 区间转为 dict
+    try:
+        result = sweep_savings(_normalize_machines(machines), _normalize_new_eq(new_eq), axes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"company_name": company_name, **result}
+
+
+@router.post("/hourly")
+def run_hourly(
+    body: HourlyRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """逐时负载曲线 × 分时电价：按 8760 小时计算年节电与节约电费，写入报告并返回分时汇总。"""
+    company_name = body.company_name
+    if body.compare_ids:
+        resolved_name, machines, new_eq = _resolve_compare_pairs(db, current_user, body.compare_ids)
+        company_name = company_name or resolved_name
+    elif body.machines and body.new_eq:
+        machines, new_eq = body.machines, body.new_eq
+        if len(machines) != len(new_eq):
+            raise HTTPException(status_code=400, detail="原有设备与选型设备数量须一致")
+    else:
+        raise HTTPException(status_code=400, detail="请提供对比数据或原有设备与选型设备")
+    safe_name = "".join(c for c in str(company_name or "未命名") if c not in r'\/:*?"<>|').strip() or "未命名"
+    profiles = load_company_profiles(db, current_user, company_name) if company_name else {}
+    calc_params = _calc_params(body)
+    try:
+        result, summary = hourly_fleet_savings(
+            _normalize_machines(machines),
+            _normalize_new_eq(new_eq),
+            profiles,
+            body.tariff.model_dump(),
+            running_hours_per_year=body.running_hours_per_year,
+            calc_params=calc_params or None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filepath = write_report_workbook(result, REPORTS_DIR, extra_sheets=[hourly_sheet(summary)])
+    report = _save_report(
+        db, current_user.id, "manual", filepath, safe_name,
+        summary["energy_savings_kwh"], summary["energy_savings_cost"],
+    )
+    return {
+        "message": "生成成功，已加入历史报告",
+        "filename": os.path.basename(filepath),
+        "company_name": safe_name,
+        "report_id": report.id,
+        **summary,
+    }
+
+
 def _client_query_by_user(db: Session, user: User):
     if user.id == ADMIN_ID:
         return db.query(MachineClient)
@@ -203,6 +456,9 @@ def run_recommend(
     current_user: User = Depends(get_current_user),
 ):
     """根据客户公司及机器编号，自动推荐供应商机型并生成节能计算 Excel。"""
+    if body.pressure_zones and (body.top_k is not None or body.max_units is not None):
+        # 分区推荐各区台数上限取该区客户机台数，合并后只有一个方案
+        raise HTTPException(status_code=400, detail="按压力分区推荐（pressure_zones）时不支持 top_k 与 max_units")
     q = _client_query_by_user(db, current_user).filter(MachineClient.name == body.company_name)
     if body.client_nos is not None and len(body.client_nos) > 0:
         q = q.filter(MachineClient.no.in_(body.client_nos))
@@ -214,18 +470,30 @@ def run_recommend(
                 f"、编号 {body.client_nos}" if body.client_nos else ""
             ),
         )
-    suppliers = db.query(MachineSupplier).filter(MachineSupplier.name.isnot(None)).all()
-    if not suppliers:
+    catalog = get_supplier_catalog(db)
+    if not len(catalog):
         raise HTTPException(status_code=404, detail="暂无供应商设备数据，请先录入供应商设备")
 
     machines = [client_orm_to_dict(c) for c in clients]
-    new_eq, scheme_primary, schemes_all, summary = recommend_suppliers_multi(
-        machines,
-        suppliers,
-        margin_ratio=body.margin_ratio,
-        max_units=getattr(body, "max_units", 6),
-        use_caliber_a=body.use_actual_flow,
-    )
+    if body.pressure_zones:
+        new_eq, scheme_primary, schemes_all, summary = recommend_by_zone(
+            machines,
+            catalog,
+            step=body.zone_step or ZONE_PRESSURE_STEP,
+            margin_ratio=body.margin_ratio,
+            use_caliber_a=body.use_actual_flow,
+            strategy=body.strategy,
+        )
+    else:
+        new_eq, scheme_primary, schemes_all, summary = recommend_suppliers_multi(
+            machines,
+            catalog,
+            margin_ratio=body.margin_ratio,
+            max_units=body.max_units or len(machines),
+            use_caliber_a=body.use_actual_flow,
+            strategy=body.strategy,
+            top_k=body.top_k,
+        )
     if not new_eq:
         raise HTTPException(status_code=400, detail=summary or "无法生成推荐方案")
 
@@ -254,15 +522,48 @@ def run_recommend(
         "machines": machines,
         "new_eq": new_eq_serializable,
     }
+    # 各方案展开为逐台选型（主方案即 new_eq），全部方案的节电一次算出，原有设备侧只算一次
+    view = catalog.view(demand_p(machines))
+    scheme_new_eqs = [new_eq] + [
+        expand_scheme([(view.by_key[(u["brand"], u["model"])], u["count"]) for u in s["scheme"]], len(machines))
+        for s in schemes_all[1:]
+    ]
+    # 预览与生成报告使用同一份规范化输入，预览的节电与报告一致
+    try:
+        norm_machines = _normalize_machines(machines)
+        norm_new_eqs = [_normalize_new_eq(x) for x in scheme_new_eqs]
+        results = scheme_savings(norm_machines, norm_new_eqs, running_hours_per_year=YEAR_RUNNING_TIME)
+    except ValueError as e:  # FleetValidationError：返回 400 及原因
+        raise HTTPException(status_code=400, detail=str(e))
     if body.schemes_only:
+        # 预览只需节电数值：走纯数值计算，不拼公式字符串、不生成 Excel
+        for s, result in zip(schemes_all, results):
+            s["energy_savings_kwh"] = result.all_year_savings
+        base["energy_savings_kwh"] = results[0].all_year_savings
         return base
 
-    company_name = body.company_name or "未命名"
-    filepath, energy_savings_kwh = final_results_excel(company_name, machines, new_eq, DOWNLOAD_DIR)
+    # 主方案已由 scheme_savings 算出，写报告时直接复用，不再重算
+    if body.scheme_sheets:
+        filepath = write_report_workbook(results[0], REPORTS_DIR, extra_sheets=scheme_sheets(schemes_all, results))
+        energy_savings_kwh = results[0].all_year_savings
+    else:
+        filepath, energy_savings_kwh = cached_results_excel(
+            norm_machines,
+            norm_new_eqs[0],
+            REPORTS_DIR,
+            running_hours_per_year=YEAR_RUNNING_TIME,
+            result=results[0],
+        )
+    for s, result in zip(schemes_all, results):
+        s["energy_savings_kwh"] = result.all_year_savings
     report = _save_report(
         db, current_user.id, "dialogue", filepath, safe_name,
         energy_savings_kwh, None,
     )
+    if not body.scheme_sheets:
+        ensure_results_excel(
+            filepath, norm_machines, norm_new_eqs[0], REPORTS_DIR, YEAR_RUNNING_TIME, result=results[0],
+        )
     filename = os.path.basename(filepath)
     return {
         **base,
@@ -272,6 +573,37 @@ def run_recommend(
     }
 
 
+@router.post("/matrix")
+def run_matrix(
+    body: MatrixRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """公司下每台客户机换成每个供应商机型的小时/年节电（不满足压力要求的为 None），或每台的 top-N 机型。"""
+    q = _client_query_by_user(db, current_user).filter(MachineClient.name == body.company_name)
+    if body.client_nos:
+        q = q.filter(MachineClient.no.in_(body.client_nos))
+    clients = q.order_by(MachineClient.no).all()
+    if not clients:
+        raise HTTPException(status_code=404, detail=f"未找到客户设备：公司「{body.company_name}」")
+    catalog = get_supplier_catalog(db)
+    if not len(catalog):
+        raise HTTPException(status_code=404, detail="暂无供应商设备数据，请先录入供应商设备")
+    machines = _normalize_machines([client_orm_to_dict(c) for c in clients])
+    try:
+        result = savings_matrix(
+            machines,
+            catalog,
+            running_hours_per_year=body.running_hours_per_year,
+            calc_params=_calc_params(body),
+            electricity_price=body.electricity_price,
+            top_n=body.top_n,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"company_name": body.company_name, **result}
+
+
 @router.post("/run-with-params")
 def run_with_params(
     body: RunWithParamsRequest,
@@ -285,23 +617,18 @@ def run_with_params(
     new_eq = _normalize_new_eq(body.new_eq)
     if len(machines) != len(new_eq):
         raise HTTPException(status_code=400, detail="原有设备与选型设备数量须一致")
-    calc_params = {}
-    if body.default_ser_p is not None:
-        calc_params["default_ser_p"] = body.default_ser_p
-    if body.default_por is not None:
-        calc_params["default_por"] = body.default_por
-    if body.empty_waste_ratio is not None:
-        calc_params["empty_waste_ratio"] = body.empty_waste_ratio
-    if body.pressure_drop_ratio is not None:
-        calc_params["pressure_drop_ratio"] = body.pressure_drop_ratio
-    filepath, energy_savings_kwh = final_results_excel(
-        company_name,
-        machines,
-        new_eq,
-        DOWNLOAD_DIR,
-        running_hours_per_year=body.running_hours_per_year,
-        calc_params=calc_params if calc_params else None,
-    )
+    calc_params = _calc_params(body)
+    try:
+        filepath, energy_savings_kwh = cached_results_excel(
+            machines,
+            new_eq,
+            REPORTS_DIR,
+            running_hours_per_year=body.running_hours_per_year,
+            calc_params=calc_params if calc_params else None,
+        )
+        uncertainty = _uncertainty(body, machines, new_eq, body.running_hours_per_year, calc_params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     energy_savings_cost = None
     if body.electricity_price is not None and body.electricity_price >= 0:
         energy_savings_cost = round(energy_savings_kwh * body.electricity_price, 2)
@@ -309,6 +636,9 @@ def run_with_params(
         db, current_user.id, "dialogue", filepath, safe_name,
         energy_savings_kwh, energy_savings_cost,
     )
+    ensure_results_excel(
+        filepath, machines, new_eq, REPORTS_DIR, body.running_hours_per_year, calc_params if calc_params else None
+    )
     filename = os.path.basename(filepath)
     result = {
         "message": "生成成功，已加入历史报告",
@@ -318,50 +648,77 @@ def run_with_params(
     }
     if energy_savings_cost is not None:
         result["energy_savings_cost"] = energy_savings_cost
+    if uncertainty is not None:
+        result["uncertainty"] = uncertainty
     return result
 
 
-def _normalize_machines(machines: list[dict]) -> list[dict]:
-    out = []
-    for m in machines:
-        out.append({
-            "no": int(m.get("no") or 0),
-            "model": str(m.get("model") or ""),
-            "run_time": int(m.get("run_time") or 0),
-            "load_time": int(m.get("load_time") or 0),
-            "ori_power": int(m.get("ori_power") or 0),
-            "air": float(m.get("air") or 0),
-            "brand": str(m.get("brand") or ""),
-            "isFC": bool(m.get("isFC")),
-            "origin_pre": float(m.get("origin_pre") or 0),
-            "actucal_pre": float(m.get("actucal_pre") or m.get("actual_pre") or 0),
-        })
-    return out
-
-
-def _normalize_new_eq(new_eq: list[dict]) -> list[dict]:
-    out = []
-    for e in new_eq:
-        out.append({
-            "brand": str(e.get("brand") or ""),
-            "model": str(e.get("model") or ""),
-            "ori_power": int(e.get("ori_power") or 0),
-            "air": float(e.get("air") or 0),
-            "isFC": bool(e.get("isFC")),
-            "energy_con": float(e.get("energy_con") or 0),
-            "energy_con_min": float(e.get("energy_con_min") or 0),
-        })
-    return out
+@router.post("/portfolio")
+def run_portfolio_all(
+    body: PortfolioRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """对当前用户名下全部客户公司批量推荐选型并计算节能量（多进程），以 SSE 推送进度：
+    每完成一家推 progress 事件，最后推 done 事件（含各公司结果与汇总报告 id）。"""
+    companies, suppliers = load_portfolio(db, current_user)
+    if not companies:
+        raise HTTPException(status_code=404, detail="未找到客户设备")
+    if not len(suppliers):
+        raise HTTPException(status_code=404, detail="暂无供应商设备数据，请先录入供应商设备")
+    user_id = current_user.id
+    calc_params = _calc_params(body) or None
+
+    def generate():
+        results = []
+        try:
+            # 客户端断开时本生成器被关闭，closing 随即关闭 iter_portfolio，取消尚未开始的公司
+            with closing(iter_portfolio(
+                companies, suppliers, body.running_hours_per_year, calc_params, body.max_workers, REPORTS_DIR,
+            )) as it:
+                for done, total, r in it:
+                    results.append(r)
+                    progress = {"done": done, "total": total, **r}
+                    yield sse_line("progress", json.dumps(progress, ensure_ascii=False))
+            results.sort(key=lambda r: r["company_name"])
+            session = SessionLocal()
+            try:
+                out = save_portfolio_reports(session, user_id, results, body.electricity_price, REPORTS_DIR)
+                restore_missing_reports(
+                    results, companies, suppliers, body.running_hours_per_year, calc_params, REPORTS_DIR,
+                )
+            finally:
+                session.close()
+        except Exception as e:
+            yield sse_line("error", json.dumps({"detail": str(e)}, ensure_ascii=False))
+            return
+        yield sse_line("done", json.dumps(out, ensure_ascii=False))
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/download")
 def download_file(
     filename: str,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if not filename or ".." in filename or filename.startswith("/"):
         raise HTTPException(status_code=400, detail="无效文件名")
-    filepath = os.path.join(DOWNLOAD_DIR, filename)
+    report = db.query(EnergyReport).filter(
+        EnergyReport.filename == filename,
+        EnergyReport.user_id == current_user.id,
+    ).first()
+    if report:
+        filepath = os.path.join(REPORTS_DIR, filename)
+        download_name = report_download_name(report)
+    else:
+        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        download_name = filename
     if not os.path.isfile(filepath):
         raise HTTPException(status_code=404, detail="文件不存在")
-    return FileResponse(filepath, filename=filename, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    return FileResponse(filepath, filename=download_name, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
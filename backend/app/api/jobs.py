@@ -0,0 +1,182 @@
+"""后台报告任务：提交、查询状态、取结果、SSE 进度
+
+POST /jobs 提交 calculate / recommend / run_with_params 任务（参数与对应同步接口的请求体一致），
+立即返回任务 id；计算与写 Excel 在常驻进程池中执行，完成后结果与同步接口的响应相同。
+"""
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from app.api.calculate import (
+    CalculateRequest,
+    RecommendRequest,
+    RunWithParamsRequest,
+    run_calculate,
+    run_recommend,
+    run_with_params,
+)
+from app.api.deps import get_db, get_current_user
+from app.api.sse import sse_line
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models import User, ReportJob
+from app.services.jobs import JobFailed, JobRunner, queue_position, submit_job
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+settings = get_settings()
+
+
+# 任务类型 -> (请求体模型, 同步接口处理函数)
+JOB_HANDLERS = {
+    "calculate": (CalculateRequest, run_calculate),
+    "recommend": (RecommendRequest, run_recommend),
+    "run_with_params": (RunWithParamsRequest, run_with_params),
+}
+
+
+def execute_job(kind: str, user_id: int, params: dict) -> dict:
+    """在任务进程中执行：直接复用同步接口的处理函数，HTTPException 转为任务失败。"""
+    request_model, handler = JOB_HANDLERS[kind]
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        if user is None:
+            raise JobFailed("用户不存在")
+        return jsonable_encoder(handler(request_model(**params), db, user))
+    except HTTPException as e:
+        raise JobFailed(e.detail if isinstance(e.detail, str) else json.dumps(e.detail, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+runner = JobRunner(
+    execute_job,
+    workers=settings.JOB_WORKERS,
+    stale_seconds=settings.JOB_STALE_SECONDS,
+    warm_modules=("app.api.jobs",),
+)
+
+
+def start_job_runner() -> None:
+    runner.start()
+
+
+def stop_job_runner() -> None:
+    runner.stop()
+
+
+class JobSubmitRequest(BaseModel):
+    kind: str  # "calculate" | "recommend" | "run_with_params"
+    params: dict  # 对应同步接口的请求体
+    idempotency_key: str | None = None  # 也可用请求头 Idempotency-Key
+
+
+def _job_status(db: Session, job: ReportJob) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "queue_position": queue_position(db, job),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _get_job(db: Session, user: User, job_id: int) -> ReportJob:
+    job = db.query(ReportJob).filter(ReportJob.id == job_id, ReportJob.user_id == user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@router.post("")
+def create_job(
+    body: JobSubmitRequest,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """提交报告任务；相同幂等键（或排队/运行中的相同请求）返回已有任务，不会重复生成。"""
+    if body.kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"不支持的任务类型：{body.kind}（可选 {' / '.join(JOB_HANDLERS)}）")
+    request_model, _ = JOB_HANDLERS[body.kind]
+    try:
+        params = request_model(**body.params).model_dump(mode="json")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors(include_url=False)))
+    key = body.idempotency_key or idempotency_key
+    job, deduplicated = submit_job(db, runner, current_user.id, body.kind, params, key)
+    return {**_job_status(db, job), "deduplicated": deduplicated}
+
+
+@router.get("/{job_id}")
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return _job_status(db, _get_job(db, current_user, job_id))
+
+
+@router.get("/{job_id}/result")
+def get_job_result(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """任务成功时返回与同步接口相同的响应；未完成 409，失败 400（detail 为失败原因）。"""
+    job = _get_job(db, current_user, job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=400, detail=job.error or "任务失败")
+    if job.status != "success":
+        raise HTTPException(status_code=409, detail="任务尚未完成")
+    return json.loads(job.result)
+
+
+def _poll_status(job_id: int) -> tuple[dict, dict | None]:
+    with SessionLocal() as db:
+        job = db.get(ReportJob, job_id)
+        status = _job_status(db, job)
+        result = json.loads(job.result) if job.status == "success" else None
+    return status, result
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """SSE：状态或进度变化时推 status 事件；成功推 done（含结果），失败推 error。"""
+    _get_job(db, current_user, job_id)
+
+    async def generate():
+        last = None
+        while True:
+            status, result = await run_in_threadpool(_poll_status, job_id)
+            current = (status["status"], status["progress"], status["queue_position"])
+            if current != last:
+                yield sse_line("status", json.dumps(status, ensure_ascii=False))
+                last = current
+            if status["status"] == "success":
+                yield sse_line("done", json.dumps(result, ensure_ascii=False))
+                return
+            if status["status"] == "failed":
+                yield sse_line("error", json.dumps({"detail": status["error"]}, ensure_ascii=False))
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
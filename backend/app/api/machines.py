@@ -1,8 +1,12 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_user
+from app.api.pagination import MAX_PAGE_SIZE, apply_range, keyset_page, parse_sort
 
 logger = logging.getLogger(__name__)
 from app.models import User, MachineClient, MachineSupplier, MachineCompare
@@ -21,11 +25,35 @@ from app.schemas import (
     MachineCompareCreate,
     MachineCompareResponse,
 )
+from app.services.catalog_snapshot import get_snapshot
 from app.services.doubao import parse_equipment_text, parse_equipment_text_supplier
+from app.services.machine_options import OPTION_FIELDS, machine_options
+from app.services.machine_import import (
+    ON_CONFLICT_MODES,
+    ConflictTargetMissing,
+    count_status,
+    import_clients,
+    import_suppliers,
+)
 
 router = APIRouter(prefix="/machines", tags=["machines"])
 ADMIN_ID = 999
 
+# 列表排序键 -> 排序列（id 自动追加为最后一列），均有对应索引
+CLIENT_SORTS = {
+    "id": (MachineClient.id,),
+    "name": (MachineClient.name, MachineClient.no),
+    "collect_time": (MachineClient.collect_time,),
+}
+SUPPLIER_SORTS = {
+    "id": (MachineSupplier.id,),
+    "name": (MachineSupplier.name, MachineSupplier.model),
+    "energy_con": (MachineSupplier.energy_con,),
+}
+COMPARE_SORTS = {
+    "id": (MachineCompare.id,),
+}
+
 
 def _client_query(db: Session, user: User):
     if user.id == ADMIN_ID:
@@ -41,13 +69,57 @@ def _compare_query(db: Session, user: User):
     return db.query(MachineCompare).filter(MachineCompare.user_id == user.id)
 
 
+def _run_import(import_fn, db: Session, user: User, items: list, on_conflict: str) -> list[dict]:
+    if on_conflict not in ON_CONFLICT_MODES:
+        raise HTTPException(status_code=400, detail=f"on_conflict 只能是 {' / '.join(ON_CONFLICT_MODES)}")
+    try:
+        return import_fn(db, user.id, [d.model_dump() for d in items], on_conflict)
+    except ConflictTargetMissing:
+        raise HTTPException(status_code=409, detail="库中存在重复记录，唯一键尚未建立，暂不能按唯一键覆盖，请先清理重复数据")
+
+
+def _commit_unique(db: Session, detail: str) -> None:
+    """提交；与已有记录唯一键冲突（含并发写入同一键）时回滚并返回 400。"""
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=detail)
+
+
 # ---------- Client ----------
 @router.get("/clients", response_model=list[MachineClientResponse])
 def list_clients(
+    response: Response,
+    company: str | None = None,
+    brand: str | None = None,
+    is_FC: bool | None = None,
+    min_pressure: float | None = None,
+    max_pressure: float | None = None,
+    min_air: float | None = None,
+    max_air: float | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    sort: str | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return _client_query(db, current_user).all()
+    """客户设备列表。可按公司、品牌、是否变频、实际压力 / 气量 / 采集日期范围过滤；
+    sort 为 id / name / collect_time（前缀 - 降序）；传 limit 时分页，下一页游标见响应头 X-Next-Cursor。"""
+    sort_columns, desc = parse_sort(sort, CLIENT_SORTS, "id")
+    q = _client_query(db, current_user)
+    if company is not None:
+        q = q.filter(MachineClient.name == company)
+    if brand is not None:
+        q = q.filter(MachineClient.brand == brand)
+    if is_FC is not None:
+        q = q.filter(MachineClient.is_FC == int(is_FC))
+    q = apply_range(q, MachineClient.actual_pre, min_pressure, max_pressure)
+    q = apply_range(q, MachineClient.air, min_air, max_air)
+    q = apply_range(q, MachineClient.collect_time, date_from, date_to)
+    return keyset_page(q, sort_columns, MachineClient.id, desc, limit, cursor, response)
 
 
 @router.post("/smart-parse")
@@ -90,40 +162,9 @@ def batch_create_clients(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """批量创建客户设备，已存在的（同公司同编号）跳过"""
-    created = 0
-    skipped = 0
-    results = []
-    for data in body.items:
-        existing = db.query(MachineClient).filter(
-            MachineClient.name == data.name,
-            MachineClient.no == data.no,
-        ).first()
-        if existing:
-            skipped += 1
-            results.append({"name": data.name, "no": data.no, "status": "skipped", "detail": "该客户该编号已存在"})
-            continue
-        row = MachineClient(
-            user_id=current_user.id,
-            name=data.name,
-            no=data.no,
-            model=data.model,
-            run_time=data.run_time,
-            load_time=data.load_time,
-            ori_power=data.ori_power,
-            air=data.air,
-            brand=data.brand,
-            is_FC=1 if data.is_FC else 0,
-            origin_pre=data.origin_pre,
-            actual_pre=data.actual_pre,
-            collect_time=data.collect_time,
-        )
-        db.add(row)
-        db.commit()
-        db.refresh(row)
-        created += 1
-        results.append({"name": data.name, "no": data.no, "status": "created", "id": row.id})
-    return BatchClientsResponse(created=created, skipped=skipped, results=results)
+    """批量创建客户设备（一个事务），已存在的（同公司同编号）按 on_conflict 跳过或覆盖"""
+    results = _run_import(import_clients, db, current_user, body.items, body.on_conflict)
+    return BatchClientsResponse(**count_status(results), results=results)
 
 
 @router.post("/clients", response_model=MachineClientResponse)
@@ -154,7 +195,7 @@ def create_client(
         collect_time=data.collect_time,
     )
     db.add(row)
-    db.commit()
+    _commit_unique(db, "该客户该编号已存在")
     db.refresh(row)
     return row
 
@@ -186,7 +227,7 @@ def update_client(
         d["is_FC"] = 1 if d["is_FC"] else 0
     for k, v in d.items():
         setattr(row, k, v)
-    db.commit()
+    _commit_unique(db, "该客户该编号已存在")
     db.refresh(row)
     return row
 
@@ -208,10 +249,40 @@ def delete_client(
 # ---------- Supplier ----------
 @router.get("/suppliers", response_model=list[MachineSupplierResponse])
 def list_suppliers(
+    response: Response,
+    supplier: str | None = None,
+    brand: str | None = None,
+    is_FC: bool | None = None,
+    min_pressure: float | None = None,
+    max_pressure: float | None = None,
+    min_air: float | None = None,
+    max_air: float | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    sort: str | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return _supplier_query(db).all()
+    """供应商设备列表。可按供应商、品牌、是否变频、额定压力 / 气量 / 采集日期范围过滤；
+    sort 为 id / name / energy_con（前缀 - 降序）；传 limit 时分页，下一页游标见响应头 X-Next-Cursor。
+    不带任何参数时直接返回目录快照中的全部记录。"""
+    filters = (supplier, brand, is_FC, min_pressure, max_pressure, min_air, max_air, date_from, date_to)
+    if sort is None and limit is None and cursor is None and all(v is None for v in filters):
+        return get_snapshot(db).responses()
+    sort_columns, desc = parse_sort(sort, SUPPLIER_SORTS, "id")
+    q = _supplier_query(db)
+    if supplier is not None:
+        q = q.filter(MachineSupplier.name == supplier)
+    if brand is not None:
+        q = q.filter(MachineSupplier.brand == brand)
+    if is_FC is not None:
+        q = q.filter(MachineSupplier.is_FC == int(is_FC))
+    q = apply_range(q, MachineSupplier.origin_pre, min_pressure, max_pressure)
+    q = apply_range(q, MachineSupplier.air, min_air, max_air)
+    q = apply_range(q, MachineSupplier.collect_time, date_from, date_to)
+    return keyset_page(q, sort_columns, MachineSupplier.id, desc, limit, cursor, response)
 
 
 @router.post("/suppliers/batch", response_model=BatchSuppliersResponse)
@@ -220,40 +291,9 @@ def batch_create_suppliers(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """批量创建供应商设备，已存在的（同供应商同型号）跳过"""
-    created = 0
-    skipped = 0
-    results = []
-    for data in body.items:
-        existing = db.query(MachineSupplier).filter(
-            MachineSupplier.name == data.name,
-            MachineSupplier.model == data.model,
-        ).first()
-        if existing:
-            skipped += 1
-            results.append({"name": data.name, "model": data.model, "status": "skipped", "detail": "该供应商该型号已存在"})
-            continue
-        energy_con_min = data.energy_con / 60
-        row = MachineSupplier(
-            user_id=current_user.id,
-            name=data.name,
-            no=data.no,
-            model=data.model,
-            ori_power=data.ori_power,
-            air=data.air,
-            brand=data.brand,
-            is_FC=1 if data.is_FC else 0,
-            origin_pre=data.origin_pre,
-            energy_con=data.energy_con,
-            energy_con_min=energy_con_min,
-            collect_time=data.collect_time,
-        )
-        db.add(row)
-        db.commit()
-        db.refresh(row)
-        created += 1
-        results.append({"name": data.name, "model": data.model, "status": "created", "id": row.id})
-    return BatchSuppliersResponse(created=created, skipped=skipped, results=results)
+    """批量创建供应商设备（一个事务），已存在的（同供应商同型号）按 on_conflict 跳过或覆盖"""
+    results = _run_import(import_suppliers, db, current_user, body.items, body.on_conflict)
+    return BatchSuppliersResponse(**count_status(results), results=results)
 
 
 @router.post("/suppliers", response_model=MachineSupplierResponse)
@@ -284,7 +324,7 @@ def create_supplier(
         collect_time=data.collect_time,
     )
     db.add(row)
-    db.commit()
+    _commit_unique(db, "该供应商该型号已存在")
     db.refresh(row)
     return row
 
@@ -318,7 +358,7 @@ def update_supplier(
         d["energy_con_min"] = d["energy_con"] / 60
     for k, v in d.items():
         setattr(row, k, v)
-    db.commit()
+    _commit_unique(db, "该供应商该型号已存在")
     db.refresh(row)
     return row
 
@@ -340,10 +380,23 @@ def delete_supplier(
 # ---------- Compare ----------
 @router.get("/compare", response_model=list[MachineCompareResponse])
 def list_compare(
+  response: Response,
+  company: str | None = None,
+  supplier: str | None = None,
+  sort: str | None = None,
+  limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  cursor: str | None = None,
   db: Session = Depends(get_db),
   current_user: User = Depends(get_current_user),
 ):
-    return _compare_query(db, current_user).all()
+    """对比记录列表，可按客户公司、供应商过滤；传 limit 时分页，下一页游标见响应头 X-Next-Cursor。"""
+    sort_columns, desc = parse_sort(sort, COMPARE_SORTS, "id")
+    q = _compare_query(db, current_user)
+    if company is not None:
+        q = q.filter(MachineCompare.company_name == company)
+    if supplier is not None:
+        q = q.filter(MachineCompare.supplier_name == supplier)
+    return keyset_page(q, sort_columns, MachineCompare.id, desc, limit, cursor, response)
 
 
 @router.post("/compare", response_model=MachineCompareResponse)
@@ -386,18 +439,16 @@ def delete_compare(
 # ---------- Options for forms ----------
 @router.get("/options")
 def get_options(
+  fields: str | None = None,
+  prefix: str | None = None,
+  limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
   db: Session = Depends(get_db),
   current_user: User = Depends(get_current_user),
 ):
-    clients = _client_query(db, current_user).all()
-    suppliers = _supplier_query(db).all()
-    return {
-        "company_name": list({c.name for c in clients if c.name}),
-        "client_no": list({c.no for c in clients if c.no is not None}),
-        "client_brand": list({c.brand for c in clients if c.brand}),
-        "client_model": list({c.model for c in clients if c.model}),
-        "supplier_name": list({s.name for s in suppliers if s.name}),
-        "supplier_no": list({s.no for s in suppliers if s.no is not None}),
-        "supplier_brand": list({s.brand for s in suppliers if s.brand}),
-        "supplier_model": list({s.model for s in suppliers if s.model}),
-    }
+    """表单下拉选项：各列去重后升序排列。fields 为逗号分隔的列名（默认全部），
+    prefix 只返回以其开头的取值，limit 限制每列条数。"""
+    names = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    unknown = [f for f in names if f not in OPTION_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的选项列：{'、'.join(unknown)}，可选 {' / '.join(OPTION_FIELDS)}")
+    return machine_options(db, current_user.id, names or None, prefix or None, limit)
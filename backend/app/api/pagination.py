@@ -0,0 +1,128 @@
+"""列表接口的键集分页（keyset）与排序
+
+传 limit 时只返回一页，下一页的游标放在响应头 X-Next-Cursor（没有下一页时不设），
+下次请求带 cursor=<游标> 即从上一页最后一条之后继续；不传 limit 时返回全部，与原接口一致。
+游标记录上一页最后一行的排序列取值 + id；游标之后的行拆成几段（见 _segments），
+每段都是索引上的一次定位（等值前缀 + 一列范围），依次读取直到凑满一页，
+深翻页不像 OFFSET 那样逐行跳过，配合对应索引每页耗时与翻到第几页无关。
+NULL 一律视为最小值（升序在前、降序在后），各数据库排序一致。
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+
+
+def parse_sort(sort: str | None, allowed: dict[str, tuple], default: str) -> tuple[tuple, bool]:
+    """sort 为 allowed 中的键，前缀 "-" 表示降序；返回 (排序列, 是否降序)。"""
+    sort = sort or default
+    desc = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in allowed:
+        raise HTTPException(status_code=400, detail=f"sort 只能是 {' / '.join(allowed)}（降序加前缀 -）")
+    return allowed[key], desc
+
+
+def _dump(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load(value, column):
+    if value is None:
+        return None
+    py_type = column.type.python_type
+    if py_type is datetime:
+        return datetime.fromisoformat(value)
+    if py_type is date:
+        return date.fromisoformat(value)
+    if py_type is Decimal:
+        return Decimal(value)
+    return py_type(value)
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([_dump(v) for v in values], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_load(v, c) for v, c in zip(values, columns)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor 无效，请从第一页重新获取")
+
+
+def _segments(columns: list, values: list, desc: bool) -> list:
+    """游标之后的行按排序先后拆成若干段，每段是「前几列等值 + 一列范围」的合取，可直接在索引上定位。
+    NULL 不参与大小比较，单独成段：升序时在最前，降序时在最后。"""
+    column, value = columns[0], values[0]
+    if len(columns) == 1:  # 末列为 id，非空
+        return [column < value if desc else column > value]
+    head = column.is_(None) if value is None else column == value
+    segments = [and_(head, rest) for rest in _segments(columns[1:], values[1:], desc)]
+    if desc:
+        if value is not None:
+            segments += [column < value, column.is_(None)]
+    else:
+        segments.append(column.isnot(None) if value is None else column > value)
+    return segments
+
+
+def _order(column, desc: bool, dialect: str):
+    order = column.desc() if desc else column.asc()
+    if dialect in ("mysql", "mariadb"):  # 不支持 NULLS FIRST/LAST，默认即为 NULL 最小
+        return order
+    return order.nulls_last() if desc else order.nulls_first()
+
+
+def keyset_queries(query, sort_columns: tuple, id_column, desc: bool, cursor: str | None) -> tuple[list, list]:
+    """返回 (按顺序依次读取的查询, 排序列)；无游标时只有一个查询，有游标时每段一个查询。"""
+    columns = [c for c in sort_columns if c is not id_column] + [id_column]
+    dialect = query.session.get_bind().dialect.name
+    query = query.order_by(*(_order(c, desc, dialect) for c in columns))
+    if not cursor:
+        return [query], columns
+    values = decode_cursor(cursor, columns)
+    return [query.filter(segment) for segment in _segments(columns, values, desc)], columns
+
+
+def keyset_page(query, sort_columns: tuple, id_column, desc: bool, limit: int | None, cursor: str | None, response: Response):
+    """按 (sort_columns..., id) 排序；limit 为空时返回全部，否则返回一页并在 response 上设置下一页游标。"""
+    if cursor and limit is None:
+        raise HTTPException(status_code=400, detail="使用 cursor 时须同时指定 limit")
+    queries, columns = keyset_queries(query, sort_columns, id_column, desc, cursor)
+    if limit is None:
+        return queries[0].all()
+    rows = []
+    for q in queries:
+        rows += q.limit(limit + 1 - len(rows)).all()
+        if len(rows) > limit:
+            break
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows
+
+
+def apply_range(query, column, low=None, high=None):
+    """闭区间过滤，两端均可省略。"""
+    if low is not None:
+        query = query.filter(column >= low)
+    if high is not None:
+        query = query.filter(column <= high)
+    return query
@@ -0,0 +1,91 @@
+"""逐时负载曲线：上传、列表、删除（供 /calculate/hourly 分时计算使用）"""
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, get_current_user
+from app.models import User, LoadProfile
+from app.services.hourly import profile_from_bytes, profile_to_bytes, read_profile_table
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+def load_company_profiles(db: Session, user: User, company_name: str) -> dict:
+    """取出公司下的全部曲线：{机器编号 或 None(全厂): float32 数组}。"""
+    rows = (
+        db.query(LoadProfile)
+        .filter(LoadProfile.user_id == user.id, LoadProfile.company_name == company_name)
+        .all()
+    )
+    return {r.machine_no: profile_from_bytes(r.data) for r in rows}
+
+
+def _profile_to_dict(p: LoadProfile) -> dict:
+    return {
+        "id": p.id,
+        "company_name": p.company_name,
+        "machine_no": p.machine_no,
+        "load_hours": round(p.load_hours, 2),
+        "created_at": p.created_at.isoformat() if p.created_at else None,
+    }
+
+
+@router.post("")
+def upload_profiles(
+    company_name: str = Form(...),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """上传 xlsx/csv：每列一条 8760 小时负载系数（0~1），列名为机器编号或「全厂」；同一机器/全厂的旧曲线被替换。"""
+    content = file.file.read()  # 同步端点在线程池中执行，pandas 解析与写库不阻塞事件循环
+    try:
+        profiles = read_profile_table(content, file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"无法读取文件：{e}")
+    existing = {
+        p.machine_no: p
+        for p in db.query(LoadProfile).filter(
+            LoadProfile.user_id == current_user.id,
+            LoadProfile.company_name == company_name,
+        )
+    }
+    saved = []
+    for machine_no, values in profiles.items():
+        row = existing.get(machine_no)
+        if row is None:
+            row = LoadProfile(user_id=current_user.id, company_name=company_name, machine_no=machine_no)
+            db.add(row)
+        row.data = profile_to_bytes(values)
+        row.load_hours = float(values.sum(dtype="float64"))
+        saved.append(row)
+    db.commit()
+    return [_profile_to_dict(p) for p in saved]
+
+
+@router.get("")
+def list_profiles(
+    company_name: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    q = db.query(LoadProfile).filter(LoadProfile.user_id == current_user.id)
+    if company_name:
+        q = q.filter(LoadProfile.company_name == company_name)
+    rows = q.order_by(LoadProfile.company_name, LoadProfile.machine_no).all()
+    return [_profile_to_dict(p) for p in rows]
+
+
+@router.delete("/{profile_id}")
+def delete_profile(
+    profile_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    row = db.query(LoadProfile).filter(LoadProfile.id == profile_id, LoadProfile.user_id == current_user.id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="负载曲线不存在")
+    db.delete(row)
+    db.commit()
+    return {"message": "已删除"}
@@ -1,28 +1,64 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime, time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_user
+from app.api.pagination import MAX_PAGE_SIZE, apply_range, keyset_page, parse_sort
 from app.models import User, EnergyReport
+from app.services.report_cache import remove_unreferenced_report
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "app", "reports")
 
+REPORT_SORTS = {
+    "created_at": (EnergyReport.created_at,),
+    "id": (EnergyReport.id,),
+}
+
+
+def report_download_name(report: EnergyReport) -> str:
+    """下载时的文件名：按报告记录中的公司名（无则标题）命名，去掉文件名中不允许的字符。"""
+    download_name = (report.company_name or report.title or "节能量计算").strip()
+    safe_name = "".join(c for c in download_name if c not in r'\/:*?"<>|').strip() or "节能量计算"
+    return f"{safe_name}.xlsx"
+
+
+def _report_query(db: Session, user: User):
+    return db.query(EnergyReport).filter(EnergyReport.user_id == user.id)
+
 
 @router.get("")
 def list_reports(
+    response: Response,
+    company: str | None = None,
+    source: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    sort: str | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """列出当前用户的能耗计算报告，按创建时间倒序。"""
-    rows = (
-        db.query(EnergyReport)
-        .filter(EnergyReport.user_id == current_user.id)
-        .order_by(EnergyReport.created_at.desc())
-        .all()
+    """列出当前用户的能耗计算报告，默认按创建时间倒序。可按公司、来源、创建日期范围过滤；
+    传 limit 时分页，下一页游标见响应头 X-Next-Cursor。"""
+    sort_columns, desc = parse_sort(sort, REPORT_SORTS, "-created_at")
+    q = _report_query(db, current_user)
+    if company is not None:
+        q = q.filter(EnergyReport.company_name == company)
+    if source is not None:
+        q = q.filter(EnergyReport.source == source)
+    q = apply_range(
+        q,
+        EnergyReport.created_at,
+        datetime.combine(date_from, time.min) if date_from else None,
+        datetime.combine(date_to, time.max) if date_to else None,
     )
+    rows = keyset_page(q, sort_columns, EnergyReport.id, desc, limit, cursor, response)
     return [
         {
             "id": r.id,
@@ -81,13 +117,9 @@ def download_report(
     filepath = os.path.join(REPORTS_DIR, report.filename)
     if not os.path.isfile(filepath):
         raise HTTPException(status_code=404, detail="文件不存在")
-    download_name = (report.company_name or report.title or "节能量计算").strip()
-    if not download_name:
-        download_name = "节能量计算"
-    safe_name = "".join(c for c in download_name if c not in r'\/:*?"<>|').strip() or "节能量计算"
     return FileResponse(
         filepath,
-        filename=f"{safe_name}.xlsx",
+        filename=report_download_name(report),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
 
@@ -98,7 +130,7 @@ def delete_report(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """删除报告及对应文件。"""
+    """删除报告；内容相同的报告共用同一文件，记录删除提交后、已无其他记录引用时才删除文件。"""
     report = (
         db.query(EnergyReport)
         .filter(EnergyReport.id == report_id, EnergyReport.user_id == current_user.id)
@@ -106,12 +138,8 @@ def delete_report(
     )
     if not report:
         raise HTTPException(status_code=404, detail="报告不存在")
-    filepath = os.path.join(REPORTS_DIR, report.filename)
-    try:
-        if os.path.isfile(filepath):
-            os.remove(filepath)
-    except OSError:
-        pass
+    filename = report.filename
     db.delete(report)
     db.commit()
+    remove_unreferenced_report(db, filename, REPORTS_DIR)
     return {"message": "已删除"}
@@ -0,0 +1,11 @@
+"""Server-Sent Events 工具"""
+
+
+def sse_line(event: str, data: str) -> str:
+    """生成一条 SSE：event + data；data 内换行按 SSE 规范用多行 data 表示。"""
+    lines = (data or "").split("\n")
+    out = f"event: {event}\n"
+    for line in lines:
+        out += f"data: {line}\n"
+    out += "\n"
+    return out
@@ -1,6 +1,7 @@
 """应用配置 - 使用 pydantic-settings 管理环境变量，.env 与 2Vision 变量名一致可共用"""
 from pathlib import Path
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 import os
@@ -21,9 +22,49 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     DEBUG: bool = True
 
-    # 数据库（SQLite）
+    # 数据库：DATABASE_URI 为空时使用 backend 目录下的 SQLite 文件 SQLITE_PATH；
+    # 多个工作进程共用一个库时可设为 postgresql+psycopg://… 或 mysql+pymysql://…（驱动需另行安装）
+    DATABASE_URI: str = ""
     SQLITE_PATH: str = "aircomp.db"
 
+    # 连接池（PostgreSQL / MySQL）：常驻连接数、高峰时额外连接数、取连接等待秒数、连接回收秒数
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+
+    # SQLite：WAL 下读写互不阻塞；写锁被占用时最多等待 SQLITE_BUSY_TIMEOUT_MS 毫秒，页缓存 SQLITE_CACHE_SIZE_KB
+    SQLITE_WAL: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE_KB: int = 20000
+
+    # 计算结果缓存（相同输入复用已生成的报告与节电量）
+    RESULT_CACHE_SIZE: int = 256
+    RESULT_CACHE_TTL_SECONDS: int = 3600
+
+    # 推荐结果缓存（相同需求与目录版本直接复用推荐方案）
+    RECOMMEND_CACHE_SIZE: int = 512
+    RECOMMEND_CACHE_TTL_SECONDS: int = 3600
+
+    # 设备表单下拉选项缓存（按用户，客户机写入后清除；多进程时其他进程的写入最迟过期后可见）
+    OPTIONS_CACHE_SIZE: int = 1024
+    OPTIONS_CACHE_TTL_SECONDS: int = 300
+
+    # 后台报告任务（/api/jobs）常驻工作进程数
+    JOB_WORKERS: int = 2
+    # 运行中的任务超过该秒数无心跳即视为所在进程已退出，重新排队
+    JOB_STALE_SECONDS: int = 60
+
+    # 分压力区推荐（pressure_zones）并行计算的常驻进程数，<= 1 时顺序计算
+    RECOMMEND_WORKERS: int = 2
+
+    # 全部客户公司批量计算（/calculate/portfolio）的进程数上限，<= 0 时取 CPU 核数；请求指定的进程数不会超过该值
+    PORTFOLIO_WORKERS: int = 0
+
+    # 供应商目录快照共享目录：设置后各工作进程以 mmap 共用同一份快照文件，为空则仅进程内缓存
+    CATALOG_SNAPSHOT_DIR: str = ""
+
     # JWT（登录保持 7 天）
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 天，与前端「登录状态保持 7 天」一致
@@ -44,12 +85,14 @@ class Settings(BaseSettings):
     DOUBAO_API_URL: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
     DOUBAO_MODEL: str = "doubao-seed-1-6-vision-250815"
 
-    @property
-    def DATABASE_URI(self) -> str:
-        """SQLite 数据库路径（相对于 backend 目录）"""
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        path = os.path.join(base_dir, self.SQLITE_PATH)
-        return f"sqlite:///{path}"
+    @model_validator(mode="after")
+    def _default_database_uri(self) -> "Settings":
+        """未设置 DATABASE_URI 时使用 SQLite 文件（SQLITE_PATH 相对于 backend 目录）"""
+        if not self.DATABASE_URI:
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            path = os.path.join(base_dir, self.SQLITE_PATH)
+            self.DATABASE_URI = f"sqlite:///{path}"
+        return self
 
 
 @lru_cache
@@ -1,3 +1,3 @@
-from .session import Base, get_db, SessionLocal, engine
+from .session import Base, get_db, get_async_db, SessionLocal, engine
 
-__all__ = ["Base", "get_db", "SessionLocal", "engine"]
+__all__ = ["Base", "get_db", "get_async_db", "SessionLocal", "engine"]
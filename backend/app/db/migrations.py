@@ -0,0 +1,108 @@
+"""启动时的增量表结构升级
+
+create_all 只会创建缺失的表，已有 aircomp.db 上新增的列、索引、约束在这里补上。
+MIGRATIONS 按版本号顺序执行，每一项在单独事务中完成并记入 schema_migration 表，已执行的不再重复；
+某项因现有数据无法完成（如唯一键存在重复记录）时打印原因并跳过，下次启动再试，不影响服务启动。
+"""
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+_metadata = MetaData()
+schema_migration = Table(
+    "schema_migration",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(120), nullable=False),
+    Column("applied_at", DateTime, default=datetime.now),
+)
+
+
+class MigrationSkipped(Exception):
+    """现有数据不满足升级条件，本次跳过。"""
+
+
+def _create_index(conn: Connection, table: str, name: str, columns: tuple[str, ...], unique: bool = False) -> None:
+    if name in {ix["name"] for ix in inspect(conn).get_indexes(table)}:
+        return
+    cols = ", ".join(columns)
+    if unique:
+        dup = conn.execute(text(
+            f"SELECT {cols}, COUNT(*) FROM {table} "
+            f"WHERE {' AND '.join(f'{c} IS NOT NULL' for c in columns)} "
+            f"GROUP BY {cols} HAVING COUNT(*) > 1 LIMIT 1"
+        )).first()
+        if dup is not None:
+            raise MigrationSkipped(f"{table} 中存在重复的 ({cols})：{tuple(dup[:-1])} 共 {dup[-1]} 条，请先清理重复记录")
+    conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({cols})"))
+
+
+def _add_column(conn: Connection, table: str, name: str, ddl: str) -> None:
+    if name in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _machine_unique_keys(conn: Connection) -> None:
+    _create_index(conn, "machine_client", "uq_machine_client_name_no", ("name", "no"), unique=True)
+    _create_index(conn, "machine_supplier", "uq_machine_supplier_name_model", ("name", "model"), unique=True)
+
+
+def _lookup_indexes(conn: Connection) -> None:
+    _create_index(conn, "machine_client", "ix_machine_client_user_id_name_no", ("user_id", "name", "no"))
+    _create_index(conn, "machine_supplier", "ix_machine_supplier_name_no", ("name", "no"))
+    _create_index(conn, "machine_compare", "ix_machine_compare_user_id_id", ("user_id", "id"))
+    _create_index(conn, "energy_report", "ix_energy_report_user_id_created_at", ("user_id", "created_at"))
+    _create_index(conn, "energy_report", "ix_energy_report_filename", ("filename",))
+
+
+def _list_indexes(conn: Connection) -> None:
+    _create_index(conn, "machine_client", "ix_machine_client_user_id_id", ("user_id", "id"))
+    _create_index(conn, "machine_client", "ix_machine_client_user_id_collect_time", ("user_id", "collect_time"))
+    _create_index(conn, "machine_supplier", "ix_machine_supplier_energy_con", ("energy_con",))
+
+
+def _option_indexes(conn: Connection) -> None:
+    _create_index(conn, "machine_client", "ix_machine_client_user_id_brand", ("user_id", "brand"))
+    _create_index(conn, "machine_client", "ix_machine_client_user_id_model", ("user_id", "model"))
+
+
+def _list_sort_indexes(conn: Connection) -> None:
+    # 管理员看全部客户机时按采集日期排序、报告按 id 排序
+    _create_index(conn, "machine_client", "ix_machine_client_collect_time", ("collect_time",))
+    _create_index(conn, "energy_report", "ix_energy_report_user_id_id", ("user_id", "id"))
+
+
+def _job_owner(conn: Connection) -> None:
+    _add_column(conn, "report_job", "owner", "VARCHAR(100)")
+    _add_column(conn, "report_job", "heartbeat_at", "DATETIME")
+
+
+# (版本号, 说明, 升级函数)；只追加，不修改已发布的项
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "machine_client / machine_supplier 唯一键", _machine_unique_keys),
+    (2, "设备、对比、报告表的查询索引", _lookup_indexes),
+    (3, "设备列表分页排序索引", _list_indexes),
+    (4, "设备下拉选项去重索引", _option_indexes),
+    (5, "列表分页排序索引补充", _list_sort_indexes),
+    (6, "报告任务领取进程与心跳", _job_owner),
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migration.c.version)).scalars())
+    for version, name, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                upgrade(conn)
+                conn.execute(schema_migration.insert().values(version=version, name=name, applied_at=datetime.now()))
+        except MigrationSkipped as e:
+            print(f"[AirComp] 数据库升级 {version}（{name}）已跳过：{e}", flush=True)
+            continue
+        print(f"[AirComp] 数据库升级 {version}（{name}）完成", flush=True)
@@ -0,0 +1,161 @@
+"""常用查询的执行计划检查（SQLite EXPLAIN QUERY PLAN）
+
+列出 run_calculate、批量导入、下拉选项等路径上的典型查询，确认都走索引：
+计划中出现对表的全表扫描（SCAN <表>）或为排序建临时 B 树即视为问题。
+列表分页直接检查 api/pagination.keyset_queries 生成的 SQL：每个列表接口的每种排序（升/降序），
+分别用普通游标和排序列为 NULL 的游标生成各段查询，每段都须在索引上定位（SEARCH），
+且定位条件包含用户过滤列（如有）和该段的排序列，否则视为问题。
+在 backend/ 下执行 python -m app.db.query_plans，有问题时以非零状态退出；
+表为空时 SQLite 仍按索引规划，无需准备数据。
+"""
+import re
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+from typing import Callable
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.api.machines import ADMIN_ID, CLIENT_SORTS, COMPARE_SORTS, SUPPLIER_SORTS, _client_query, _compare_query, _supplier_query
+from app.api.pagination import encode_cursor, keyset_queries
+from app.api.reports import REPORT_SORTS, _report_query
+from app.models import EnergyReport, MachineClient, MachineCompare, MachineSupplier, User
+
+QUERIES = [
+    ("对比记录（id + 用户）", select(MachineCompare).where(MachineCompare.id == 1, MachineCompare.user_id == 1)),
+    ("对比列表（用户）", select(MachineCompare).where(MachineCompare.user_id == 1)),
+    ("客户机（公司 + 编号）", select(MachineClient).where(MachineClient.name == "公司", MachineClient.no == 1)),
+    (
+        "客户机列表（用户 + 公司，按编号）",
+        select(MachineClient).where(MachineClient.user_id == 1, MachineClient.name == "公司").order_by(MachineClient.no),
+    ),
+    ("客户机列表（公司，按编号）", select(MachineClient).where(MachineClient.name == "公司").order_by(MachineClient.no)),
+    ("供应商机（供应商 + 编号）", select(MachineSupplier).where(MachineSupplier.name == "供应商", MachineSupplier.no == 1)),
+    ("供应商机（供应商 + 型号）", select(MachineSupplier).where(MachineSupplier.name == "供应商", MachineSupplier.model == "M")),
+    (
+        "报告列表（用户，按时间倒序）",
+        select(EnergyReport).where(EnergyReport.user_id == 1).order_by(EnergyReport.created_at.desc()),
+    ),
+    ("报告（文件名）", select(EnergyReport.id).where(EnergyReport.filename == "report.xlsx")),
+    # 下拉选项（services/machine_options）
+    *(
+        (
+            f"客户机选项（用户，{col.key} 去重）",
+            select(col).where(col.isnot(None), MachineClient.user_id == 1).distinct().order_by(col),
+        )
+        for col in (MachineClient.name, MachineClient.brand, MachineClient.model)
+    ),
+]
+
+
+# (接口, 基础查询, 排序方式, id 列, 基础查询中的用户过滤列)；基础查询与列表接口一致，不含可选过滤
+LIST_ENDPOINTS = [
+    ("客户机列表（用户）", lambda db: _client_query(db, User(id=1)), CLIENT_SORTS, MachineClient.id, "user_id"),
+    ("客户机列表（管理员）", lambda db: _client_query(db, User(id=ADMIN_ID)), CLIENT_SORTS, MachineClient.id, None),
+    ("供应商机列表", _supplier_query, SUPPLIER_SORTS, MachineSupplier.id, None),
+    ("对比记录列表（用户）", lambda db: _compare_query(db, User(id=1)), COMPARE_SORTS, MachineCompare.id, "user_id"),
+    ("报告列表（用户）", lambda db: _report_query(db, User(id=1)), REPORT_SORTS, EnergyReport.id, "user_id"),
+]
+PAGE_LIMIT = 51  # keyset_page 每次多取一行判断是否还有下一页
+
+_SAMPLE_VALUES = {int: 100, str: "M", date: date(2024, 1, 1), datetime: datetime(2024, 1, 1, 8), Decimal: Decimal("6.5")}
+
+
+def _problems(plan: list[str]) -> list[str]:
+    return [d for d in plan if (d.startswith("SCAN ") and "INDEX" not in d) or "TEMP B-TREE" in d]
+
+
+def _seek_problems(plan: list[str], required: set[str], unique: set[str]) -> list[str]:
+    """每行须为索引（或主键）定位，且定位条件包含 required 中的全部列（id 在计划中显示为 rowid）；
+    唯一索引上的全等值定位至多一行，不受此限。"""
+    problems = []
+    for d in plan:
+        m = re.match(r"SEARCH \S+ USING (?:.*INDEX (\w+)|INTEGER PRIMARY KEY) \((.*)\)$", d)
+        if m is None:
+            problems.append(d)
+            continue
+        index, constraint = m.groups()
+        used = {"id" if c == "rowid" else c for c in re.findall(r"(\w+)[=<>]", constraint)}
+        single_row = index in unique and not re.search(r"[<>]", constraint)
+        if not (required <= used or single_row):
+            problems.append(d)
+    return problems
+
+
+def _compile(engine: Engine, query) -> str:
+    return str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+
+
+def _cursors(columns: list) -> list[tuple[str, str]]:
+    """普通游标，以及（首列可为空时）首列为 NULL 的游标。"""
+    values = [_SAMPLE_VALUES[c.type.python_type] for c in columns]
+    cursors = [("游标", encode_cursor(values))]
+    if columns[0].nullable:
+        cursors.append(("NULL 游标", encode_cursor([None, *values[1:]])))
+    return cursors
+
+
+def _no_temp_btree(plan: list[str]) -> list[str]:
+    return [d for d in plan if "TEMP B-TREE" in d]
+
+
+def _pagination_checks(engine: Engine) -> list[tuple[str, str, Callable[[list[str]], list[str]]]]:
+    """[(说明, SQL, 检查函数)]；首页查询只要求不建临时 B 树（按索引顺序读满一页即停），游标之后的各段须在索引上定位。"""
+    insp = inspect(engine)
+    unique = {ix["name"] for t in insp.get_table_names() for ix in insp.get_indexes(t) if ix["unique"]}
+    out = []
+    with Session(engine) as db:
+        for label, base, sorts, id_column, user_column in LIST_ENDPOINTS:
+            for key, sort_columns in sorts.items():
+                for desc in (False, True):
+                    sort = f"{label} sort={'-' if desc else ''}{key}"
+                    queries, columns = keyset_queries(base(db), sort_columns, id_column, desc, None)
+                    out.append((f"{sort} 首页", _compile(engine, queries[0].limit(PAGE_LIMIT)), _no_temp_btree))
+                    # 各段均以首个排序列等值或范围开头，定位条件里须有它（以及用户过滤列）
+                    required = {columns[0].key} | ({user_column} if user_column else set())
+                    check = partial(_seek_problems, required=required, unique=unique)
+                    for cursor_label, cursor in _cursors(columns):
+                        queries, _ = keyset_queries(base(db), sort_columns, id_column, desc, cursor)
+                        for i, q in enumerate(queries, 1):
+                            out.append((f"{sort} {cursor_label}第 {i} 段", _compile(engine, q.limit(PAGE_LIMIT)), check))
+    return out
+
+
+def check_query_plans(engine: Engine) -> list[tuple[str, list[str], list[str]]]:
+    """返回 [(查询说明, 执行计划各行, 其中的问题行)]；非 SQLite 返回空列表。"""
+    if engine.dialect.name != "sqlite":
+        return []
+    checks = [
+        (label, str(stmt.compile(engine, compile_kwargs={"literal_binds": True})), _problems) for label, stmt in QUERIES
+    ]
+    checks += _pagination_checks(engine)
+    out = []
+    with engine.connect() as conn:
+        for label, sql, check in checks:
+            plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+            out.append((label, plan, check(plan)))
+    return out
+
+
+def main() -> int:
+    from app.db.migrations import run_migrations
+    from app.db.session import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    results = check_query_plans(engine)
+    if not results:
+        print(f"[AirComp] 当前数据库为 {engine.dialect.name}，只检查 SQLite 的执行计划", flush=True)
+        return 0
+    failed = 0
+    for label, plan, problems in results:
+        failed += bool(problems)
+        print(f"[AirComp] {'未走索引' if problems else 'OK'}  {label}：{'；'.join(plan)}", flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
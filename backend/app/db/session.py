@@ -1,18 +1,86 @@
-"""SQLAlchemy 2.0 数据库会话（SQLite）"""
-from sqlalchemy import create_engine
+"""SQLAlchemy 2.0 数据库会话
+
+默认 SQLite 文件库：每个连接开启 WAL 并设置 busy_timeout / synchronous / cache_size，
+多个工作进程同时写报告、对话记录时排队等待写锁而不是直接报 "database is locked"。
+DATABASE_URI 指向 PostgreSQL / MySQL 时使用带连接池的引擎（DB_POOL_* 配置），多进程共用同一个库。
+分析页对话等 async 接口使用同一个库的异步引擎（get_async_db），查询与提交不阻塞事件循环。
+"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URI,
-    connect_args={"check_same_thread": False},
-    echo=settings.DEBUG,
-)
+
+def _engine_kwargs(uri: str) -> dict:
+    if make_url(uri).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    # busy_timeout 放在最前：切换 WAL 本身也可能要等其他进程的锁
+    cursor.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size = {-int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+
+engine = create_engine(settings.DATABASE_URI, echo=settings.DEBUG, **_engine_kwargs(settings.DATABASE_URI))
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 同步驱动 -> 异步驱动；已是异步驱动（如 postgresql+psycopg）的保持不变
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+}
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+
+def async_database_uri(uri: str) -> str:
+    url = make_url(uri)
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(hide_password=False)
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """首次使用时创建异步引擎（驱动 aiosqlite / asyncpg / aiomysql 按需导入），连接参数与同步引擎一致。"""
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        uri = async_database_uri(settings.DATABASE_URI)
+        _async_engine = create_async_engine(uri, echo=settings.DEBUG, **_engine_kwargs(uri))
+        if _async_engine.dialect.name == "sqlite":
+            event.listen(_async_engine.sync_engine, "connect", _sqlite_pragmas)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = _async_sessionmaker = None
+
 
 def get_db():
     db = SessionLocal()
@@ -20,3 +88,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
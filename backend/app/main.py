@@ -7,10 +7,17 @@ from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.config import get_settings
 from app.api import api_router
-from app.db.session import engine
+from app.db.session import engine, dispose_async_engine
+from app.db.migrations import run_migrations
 from app.models.user import User, Post
 from app.models.machine import MachineClient, MachineSupplier, MachineCompare
 from app.models.analysis import AnalysisSession, AnalysisMessage
+from app.models.job import ReportJob
+from app.models.profile import LoadProfile
+from app.models.catalog import CatalogVersion
+from app.api.jobs import start_job_runner, stop_job_runner
+from app.services.device_match import recommend_cache_stats
+from app.services.machine_options import options_cache_stats
 from app.db.session import Base
 
 # 保证请求在终端有输出，便于排查“后台没有任何显示”
@@ -53,7 +60,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # 带凭据的跨域请求不认通配符，分页游标头须显式列出
+    expose_headers=["*", "X-Next-Cursor"],
 )
 
 
@@ -99,9 +107,17 @@ app.include_router(api_router, prefix="/api")
 @app.on_event("startup")
 def startup():
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    start_job_runner()
     print("[AirComp] 后端已启动，每个请求都会在终端打印 METHOD PATH", flush=True)
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    stop_job_runner()
+    await dispose_async_engine()
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "recommend_cache": recommend_cache_stats(), "options_cache": options_cache_stats()}
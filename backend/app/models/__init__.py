@@ -2,8 +2,12 @@ from .user import User, Post
 from .machine import MachineClient, MachineSupplier, MachineCompare
 from .analysis import AnalysisSession, AnalysisMessage
 from .report import EnergyReport
+from .job import ReportJob
+from .profile import LoadProfile
+from .catalog import CatalogVersion
 
 __all__ = [
     "User", "Post", "MachineClient", "MachineSupplier", "MachineCompare",
-    "AnalysisSession", "AnalysisMessage", "EnergyReport",
+    "AnalysisSession", "AnalysisMessage", "EnergyReport", "ReportJob", "LoadProfile",
+    "CatalogVersion",
 ]
@@ -0,0 +1,32 @@
+"""供应商机型目录版本号：供应商设备任何增删改都会递增，进程内/共享的目录快照据此判断是否过期"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, event, insert, update
+from sqlalchemy.orm import Session
+from app.db.session import Base
+from app.models.machine import MachineSupplier
+
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)  # 固定为 1，单行表
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+def bump_catalog_version(conn) -> None:
+    """在 conn 当前事务内递增目录版本号，随供应商数据一同提交。
+    ORM 写入由下方 after_flush 钩子自动调用；绕过 ORM 的批量语句须自行调用。"""
+    table = CatalogVersion.__table__
+    res = conn.execute(
+        update(table).where(table.c.id == 1).values(version=table.c.version + 1, updated_at=datetime.now())
+    )
+    if res.rowcount == 0:
+        conn.execute(insert(table).values(id=1, version=1, updated_at=datetime.now()))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_supplier_change(session, flush_context):
+    # after_flush 时 new / dirty / deleted 仍为本次 flush 前的状态
+    if any(isinstance(obj, MachineSupplier) for obj in (*session.new, *session.dirty, *session.deleted)):
+        bump_catalog_version(session.connection())
@@ -0,0 +1,25 @@
+"""后台报告生成任务（本表即 SQLite 任务队列）"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, UniqueConstraint
+from app.db.session import Base
+
+
+class ReportJob(Base):
+    __tablename__ = "report_job"
+    __table_args__ = (UniqueConstraint("user_id", "idempotency_key", name="uq_report_job_idempotency"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    kind = Column(String(30), nullable=False)  # "calculate" | "recommend" | "run_with_params"
+    idempotency_key = Column(String(128), nullable=True)  # 客户端给定的幂等键
+    payload_hash = Column(String(64), nullable=False, index=True)  # 请求内容哈希，排队/运行中的相同请求直接复用
+    payload = Column(Text, nullable=False)  # 请求体 JSON
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued | running | success | failed
+    progress = Column(Integer, nullable=False, default=0)  # 0 ~ 100
+    result = Column(Text, nullable=True)  # 成功时的响应 JSON
+    error = Column(Text, nullable=True)  # 失败原因
+    owner = Column(String(100), nullable=True)  # 领取任务的进程（主机名:pid）
+    heartbeat_at = Column(DateTime, nullable=True)  # 领取进程最近一次确认仍在运行的时间
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,11 +1,21 @@
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, DECIMAL, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
 
 class MachineClient(Base):
     __tablename__ = "machine_client"
+    # 索引均具名建立，与 db/migrations.py 为已有库补建的索引一致
+    __table_args__ = (
+        Index("uq_machine_client_name_no", "name", "no", unique=True),
+        Index("ix_machine_client_user_id_name_no", "user_id", "name", "no"),
+        Index("ix_machine_client_user_id_id", "user_id", "id"),
+        Index("ix_machine_client_user_id_collect_time", "user_id", "collect_time"),
+        Index("ix_machine_client_collect_time", "collect_time"),
+        Index("ix_machine_client_user_id_brand", "user_id", "brand"),
+        Index("ix_machine_client_user_id_model", "user_id", "model"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
@@ -34,6 +44,11 @@ class MachineClient(Base):
 
 class MachineSupplier(Base):
     __tablename__ = "machine_supplier"
+    __table_args__ = (
+        Index("uq_machine_supplier_name_model", "name", "model", unique=True),
+        Index("ix_machine_supplier_name_no", "name", "no"),
+        Index("ix_machine_supplier_energy_con", "energy_con"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
@@ -55,6 +70,7 @@ class MachineSupplier(Base):
 
 class MachineCompare(Base):
     __tablename__ = "machine_compare"
+    __table_args__ = (Index("ix_machine_compare_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
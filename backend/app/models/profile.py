@@ -0,0 +1,16 @@
+"""逐时负载曲线（8760 小时，float32 二进制存储）"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary, Float
+from app.db.session import Base
+
+
+class LoadProfile(Base):
+    __tablename__ = "load_profile"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    company_name = Column(String(140), nullable=False, index=True)
+    machine_no = Column(Integer, nullable=True)  # 机器编号；为空表示全厂曲线
+    load_hours = Column(Float, nullable=False)  # 等效满负荷小时（Σ负载系数），列表展示用
+    data = Column(LargeBinary, nullable=False)  # 8760 个 little-endian float32
+    created_at = Column(DateTime, default=datetime.now)
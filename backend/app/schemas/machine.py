@@ -123,24 +123,30 @@ class SmartParseRecord(BaseModel):
 
 
 class BatchClientsCreate(BaseModel):
-    """批量创建客户设备"""
+    """批量创建客户设备；on_conflict: "skip" 已存在的跳过，"update" 覆盖已存在的记录"""
     items: list[MachineClientCreate]
+    on_conflict: str = "skip"
 
 
 class BatchClientsResponse(BaseModel):
     created: int
     skipped: int
-    results: list[dict]  # [{ "name", "no", "status": "created"|"skipped", "detail"? }]
+    updated: int = 0
+    invalid: int = 0
+    results: list[dict]  # [{ "name", "no", "status": "created"|"updated"|"skipped"|"invalid", "id"?, "detail"? }]
 
 
 class BatchSuppliersCreate(BaseModel):
-    """批量创建供应商设备"""
+    """批量创建供应商设备；on_conflict 同 BatchClientsCreate"""
     items: list[MachineSupplierCreate]
+    on_conflict: str = "skip"
 
 
 class BatchSuppliersResponse(BaseModel):
     created: int
     skipped: int
+    updated: int = 0
+    invalid: int = 0
     results: list[dict]
 
 
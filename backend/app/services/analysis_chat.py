@@ -1,18 +1,23 @@
-"""分析页对话：意图识别、设备解析落库、能耗计算意图解析"""
+"""分析页对话：意图识别、设备解析落库、能耗计算意图解析
+
+数据库读写均经 analysis_store 的异步函数，大模型请求与落库都不阻塞事件循环。
+"""
 import json
 import logging
 import re
 from datetime import date
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import User, MachineClient, MachineSupplier
+from app.models import User
 from app.services.doubao import (
     chat_completion,
     chat_completion_stream,
     parse_equipment_text,
     parse_equipment_text_supplier,
 )
+from app.services.analysis_store import find_clients, import_client_rows, import_supplier_rows
+from app.services.machine_import import count_status
 
 logger = logging.getLogger(__name__)
 
@@ -65,90 +70,65 @@ def _extract_json(content: str) -> dict | None:
         return None
 
 
-def _batch_create_clients(db: Session, user: User, items: list[dict]) -> tuple[int, int]:
-    """批量创建客户设备，返回 (created, skipped)。"""
-    created = skipped = 0
-    for data in items:
-        existing = db.query(MachineClient).filter(
-            MachineClient.name == data["name"],
-            MachineClient.no == data["no"],
-        ).first()
-        if existing:
-            skipped += 1
-            continue
-        collect = data.get("collect_time") or date.today().isoformat()
-        if isinstance(collect, str):
-            try:
-                collect = date.fromisoformat(collect[:10])
-            except Exception:
-                collect = date.today()
-        row = MachineClient(
-            user_id=user.id,
-            name=data["name"],
-            no=data["no"],
-            model=data["model"],
-            run_time=data.get("run_time", 0),
-            load_time=data.get("load_time", 0),
-            ori_power=data.get("ori_power", 0),
-            air=data.get("air", 0),
-            brand=data.get("brand", "其他"),
-            is_FC=1 if data.get("is_FC") else 0,
-            origin_pre=data.get("origin_pre", 0.8),
-            actual_pre=data.get("actual_pre", data.get("origin_pre", 0.8)),
-            collect_time=collect,
-        )
-        db.add(row)
-        db.commit()
-        db.refresh(row)
-        created += 1
-    return created, skipped
-
-
-def _batch_create_suppliers(db: Session, user: User, items: list[dict]) -> tuple[int, int]:
-    """批量创建供应商设备，返回 (created, skipped)。"""
-    created = skipped = 0
-    for data in items:
-        existing = db.query(MachineSupplier).filter(
-            MachineSupplier.name == data["name"],
-            MachineSupplier.model == data["model"],
-        ).first()
-        if existing:
-            skipped += 1
-            continue
-        collect = data.get("collect_time") or date.today().isoformat()
-        if isinstance(collect, str):
-            try:
-                collect = date.fromisoformat(collect[:10])
-            except Exception:
-                collect = date.today()
-        energy_con = float(data.get("energy_con") or 0)
-        energy_con_min = energy_con / 60
-        row = MachineSupplier(
-            user_id=user.id,
-            name=data["name"],
-            no=data.get("no", 0),
-            model=data["model"],
-            ori_power=data.get("ori_power", 0),
-            air=data.get("air", 0),
-            brand=data.get("brand", "其他"),
-            is_FC=1 if data.get("is_FC") else 0,
-            origin_pre=data.get("origin_pre", 0.8),
-            energy_con=energy_con,
-            energy_con_min=energy_con_min,
-            collect_time=collect,
-        )
-        db.add(row)
-        db.commit()
-        db.refresh(row)
-        created += 1
-    return created, skipped
+def _collect_date(data: dict) -> date:
+    collect = data.get("collect_time") or date.today().isoformat()
+    if isinstance(collect, str):
+        try:
+            collect = date.fromisoformat(collect[:10])
+        except Exception:
+            collect = date.today()
+    return collect
+
+
+async def _batch_create_clients(db: AsyncSession, user: User, items: list[dict]) -> tuple[int, int]:
+    """批量创建客户设备（一个事务），返回 (created, skipped)；缺少公司名或编号的行计入 skipped。"""
+    rows = [
+        {
+            "name": data.get("name"),
+            "no": data.get("no"),
+            "model": data.get("model"),
+            "run_time": data.get("run_time", 0),
+            "load_time": data.get("load_time", 0),
+            "ori_power": data.get("ori_power", 0),
+            "air": data.get("air", 0),
+            "brand": data.get("brand", "其他"),
+            "is_FC": data.get("is_FC"),
+            "origin_pre": data.get("origin_pre", 0.8),
+            "actual_pre": data.get("actual_pre", data.get("origin_pre", 0.8)),
+            "collect_time": _collect_date(data),
+        }
+        for data in items
+    ]
+    counts = count_status(await import_client_rows(db, user.id, rows))
+    return counts["created"], counts["skipped"] + counts["invalid"]
+
+
+async def _batch_create_suppliers(db: AsyncSession, user: User, items: list[dict]) -> tuple[int, int]:
+    """批量创建供应商设备（一个事务），返回 (created, skipped)；缺少供应商名或型号的行计入 skipped。"""
+    rows = [
+        {
+            "name": data.get("name"),
+            "no": data.get("no", 0),
+            "model": data.get("model"),
+            "ori_power": data.get("ori_power", 0),
+            "air": data.get("air", 0),
+            "brand": data.get("brand", "其他"),
+            "is_FC": data.get("is_FC"),
+            "origin_pre": data.get("origin_pre", 0.8),
+            "energy_con": float(data.get("energy_con") or 0),
+            "collect_time": _collect_date(data),
+        }
+        for data in items
+    ]
+    counts = count_status(await import_supplier_rows(db, user.id, rows))
+    return counts["created"], counts["skipped"] + counts["invalid"]
 
 
 async def handle_analysis_chat(
     message: str,
     history: list[dict],
     attachments: list[dict],
-    db: Session,
+    db: AsyncSession,
     current_user: User,
     context_clients: list[str] | None = None,
 ) -> dict:
@@ -198,7 +178,7 @@ async def handle_analysis_chat(
         try:
             records = await parse_equipment_text(full_text)
             if records:
-                created, skipped = _batch_create_clients(db, current_user, records)
+                created, skipped = await _batch_create_clients(db, current_user, records)
                 created_clients = {"created": created, "skipped": skipped, "total": len(records)}
                 reply = f"已录入 {created} 条客户设备" + (f"，{skipped} 条已存在已跳过。" if skipped else "。") + " 接下来可以进行能耗计算，请告诉我您要计算哪家客户的设备节能量（可指定公司名和机器编号，如「计算测试公司A的1号2号机」）。"
             else:
@@ -213,7 +193,7 @@ async def handle_analysis_chat(
         try:
             records = await parse_equipment_text_supplier(full_text)
             if records:
-                created, skipped = _batch_create_suppliers(db, current_user, records)
+                created, skipped = await _batch_create_suppliers(db, current_user, records)
                 created_suppliers = {"created": created, "skipped": skipped, "total": len(records)}
                 reply = f"已录入 {created} 条供应商设备" + (f"，{skipped} 条已存在已跳过。" if skipped else "。")
             else:
@@ -226,12 +206,7 @@ async def handle_analysis_chat(
 
     elif intent == "run_energy_calculation" and company_name:
         # 查询客户机列表
-        q = db.query(MachineClient).filter(MachineClient.name == company_name)
-        if current_user.id != 999:
-            q = q.filter(MachineClient.user_id == current_user.id)
-        if client_nos:
-            q = q.filter(MachineClient.no.in_(client_nos))
-        clients = q.order_by(MachineClient.no).all()
+        clients = await find_clients(db, current_user.id, company_name, client_nos)
         if clients:
             client_list = [
                 {"no": c.no, "model": c.model, "brand": c.brand, "name": c.name}
@@ -269,7 +244,7 @@ async def handle_analysis_chat_stream(
     message: str,
     history: list[dict],
     attachments: list[dict],
-    db: Session,
+    db: AsyncSession,
     current_user: User,
     context_clients: list[str] | None = None,
 ):
@@ -316,7 +291,7 @@ async def handle_analysis_chat_stream(
         try:
             records = await parse_equipment_text(full_text)
             if records:
-                created, skipped = _batch_create_clients(db, current_user, records)
+                created, skipped = await _batch_create_clients(db, current_user, records)
                 created_clients = {"created": created, "skipped": skipped, "total": len(records)}
                 reply = f"已录入 {created} 条客户设备" + (f"，{skipped} 条已存在已跳过。" if skipped else "。") + " 接下来可以进行能耗计算，请告诉我您要计算哪家客户的设备节能量（可指定公司名和机器编号，如「计算测试公司A的1号2号机」）。"
             else:
@@ -331,7 +306,7 @@ async def handle_analysis_chat_stream(
         try:
             records = await parse_equipment_text_supplier(full_text)
             if records:
-                created, skipped = _batch_create_suppliers(db, current_user, records)
+                created, skipped = await _batch_create_suppliers(db, current_user, records)
                 created_suppliers = {"created": created, "skipped": skipped, "total": len(records)}
                 reply = f"已录入 {created} 条供应商设备" + (f"，{skipped} 条已存在已跳过。" if skipped else "。")
             else:
@@ -343,12 +318,7 @@ async def handle_analysis_chat_stream(
             reply = "解析或保存失败，请稍后重试。"
 
     elif intent == "run_energy_calculation" and company_name:
-        q = db.query(MachineClient).filter(MachineClient.name == company_name)
-        if current_user.id != 999:
-            q = q.filter(MachineClient.user_id == current_user.id)
-        if client_nos:
-            q = q.filter(MachineClient.no.in_(client_nos))
-        clients = q.order_by(MachineClient.no).all()
+        clients = await find_clients(db, current_user.id, company_name, client_nos)
         if clients:
             client_list = [
                 {"no": c.no, "model": c.model, "brand": c.brand, "name": c.name}
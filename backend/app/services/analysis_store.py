@@ -0,0 +1,64 @@
+"""分析页对话的异步数据访问：客户列表、设备录入、会话消息落库
+
+均接收 AsyncSession（见 db/session.get_async_db），在 async 接口与 SSE 生成器中直接 await，不阻塞事件循环。
+设备录入复用 machine_import 的批量写入（run_sync 在异步连接上执行同一套语句）。
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import MachineClient, AnalysisSession, AnalysisMessage
+from app.services.machine_import import import_clients, import_suppliers
+
+ADMIN_ID = 999
+
+
+def _owned_clients(stmt, user_id: int):
+    return stmt if user_id == ADMIN_ID else stmt.where(MachineClient.user_id == user_id)
+
+
+async def client_names(db: AsyncSession, user_id: int) -> list[str]:
+    """当前用户的客户公司名（去重），供模型引导用。"""
+    stmt = _owned_clients(select(MachineClient.name).where(MachineClient.name.isnot(None)).distinct(), user_id)
+    return [name for name in (await db.scalars(stmt)) if name]
+
+
+async def find_clients(
+    db: AsyncSession, user_id: int, company_name: str, client_nos: list[int] | None = None
+) -> list[MachineClient]:
+    stmt = _owned_clients(select(MachineClient).where(MachineClient.name == company_name), user_id)
+    if client_nos:
+        stmt = stmt.where(MachineClient.no.in_(client_nos))
+    return list(await db.scalars(stmt.order_by(MachineClient.no)))
+
+
+async def import_client_rows(db: AsyncSession, user_id: int, rows: list[dict]) -> list[dict]:
+    return await db.run_sync(import_clients, user_id, rows)
+
+
+async def import_supplier_rows(db: AsyncSession, user_id: int, rows: list[dict]) -> list[dict]:
+    return await db.run_sync(import_suppliers, user_id, rows)
+
+
+async def save_chat_turn(
+    db: AsyncSession,
+    user_id: int,
+    session_id: int | None,
+    title: str,
+    user_content: str,
+    assistant_content: str,
+) -> int:
+    """保存一轮 user + assistant 消息，返回会话 id；session_id 为空或不属于该用户时新建会话（title 为标题）。
+    新建会话与两条消息在同一事务内提交。"""
+    session = None
+    if session_id is not None:
+        session = await db.scalar(
+            select(AnalysisSession).where(AnalysisSession.id == session_id, AnalysisSession.user_id == user_id)
+        )
+    if session is None:
+        session = AnalysisSession(user_id=user_id, title=title)
+        db.add(session)
+        await db.flush()
+    db.add(AnalysisMessage(session_id=session.id, role="user", content=user_content))
+    db.add(AnalysisMessage(session_id=session.id, role="assistant", content=assistant_content))
+    await db.commit()
+    return session.id
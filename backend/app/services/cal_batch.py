@@ -0,0 +1,425 @@
+"""AirComp 能耗批量计算（NumPy 向量化）
+
+与 cal_func.calculate_process 逐台计算口径一致，但整批设备以列数组形式一次算完：
+  fleet_columns      设备 dict 列表 -> 列数组
+  validate_fleet     批量校验（运行时间为 0、气量为 0 等会导致除零的数据）
+  compute_fleet      空载浪费、压降浪费、加载比例、实际比功率、实际产气
+  compute_savings    与新设备比功率对比得出节电比例、小时/年节电
+  fleet_savings      仅数值结果（FleetSavings），不拼公式、不建表
+  scheme_savings     同一批原有设备对多套选型方案，原有设备侧只算一次
+  scheme_sheets      多方案节电的报告附加表（方案对比 + 各方案逐台节电）
+  consumption_rows / equipment_rows / energy_compare_rows  三张报告表的数据，直接由列数组生成
+  savings_tables     由上述数据生成与 originEC_to_dataframe 相同的三张 DataFrame
+  originEC_to_dataframe_batch  fleet_savings + savings_tables
+"""
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from app.services.cal_func import (
+    MachineEnergy,
+    render_formulas,
+    service_para_dict,
+    por_dict,
+    DEFAULT_SER_P,
+    DEFAULT_POR,
+    YEAR_RUNNING_TIME,
+)
+
+DEFAULT_EMPTY_WASTE_RATIO = 0.4
+DEFAULT_PRESSURE_DROP_RATIO = 0.07
+
+CONSUMPTION_COLUMNS = [
+    "设备编号", "原设备型号", "运行时间", "加载时间", "额定功率",
+    "空载浪费", "工频压降浪费", "总计浪费", "实际比功率",
+]
+EQUIPMENT_COLUMNS = ["No", "额定功率", "额定排量", "额定压力", "实际运行压力", "型号"]
+SCHEME_COMPARE_COLUMNS = ["方案", "组合", "方案总气量", "年节电"]
+SCHEME_DETAIL_COLUMNS = [
+    "设备编号", "原设备型号", "实际比功率", "选型品牌", "选型型号", "选型比功率",
+    "节电比例", "小时节电", "年节电",
+]
+ENERGY_TABLE_LABELS = [
+    "品牌", "型号", "功率", "气量", "控制方式", "实际比功率", "均每立方耗电",
+    "节电比例", "小时节电", "年节电", "年总节电",
+]
+
+
+class FleetValidationError(ValueError):
+    """设备数据无法参与计算；errors 为逐条问题描述。"""
+
+    def __init__(self, errors: list[str]):
+        self.errors = errors
+        super().__init__("；".join(errors))
+
+
+def _param(calc_params: dict | None, key: str, default: float) -> float:
+    if calc_params and key in calc_params:
+        return float(calc_params[key])
+    return default
+
+
+def pyround(x, ndigits: int = 0) -> np.ndarray:
+    """与内置 round() 结果一致的向量化舍入。
+
+    np.round 先乘 10**ndigits 再取整，临界 .5 附近会与 round() 的精确十进制舍入不一致；
+    这里只对临界附近的少数元素回退到 round() 计算（按不同取值去重，广播出的重复值只算一次）。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    scale = 10.0 ** ndigits
+    y = x * scale
+    out = np.rint(y) / scale
+    near_tie = np.abs(np.abs(y - np.floor(y)) - 0.5) < 1e-6
+    if near_tie.any():
+        out = np.array(out, copy=True)
+        values, inverse = np.unique(x[near_tie], return_inverse=True)
+        out[near_tie] = np.array([round(v, ndigits) for v in values.tolist()], dtype=np.float64)[inverse]
+    return out
+
+
+def fleet_columns(machines: list[dict], calc_params: dict | None = None) -> dict[str, np.ndarray]:
+    """将设备 dict 列表转为列数组；品牌系数按 calc_params 覆盖或按品牌查表。"""
+    n = len(machines)
+    default_ser_p = calc_params.get("default_ser_p") if calc_params else None
+    default_por = calc_params.get("default_por") if calc_params else None
+    brands = [m["brand"] for m in machines]
+    cols = {
+        "no": np.array([m["no"] for m in machines], dtype=object),
+        "model": np.array([m["model"] for m in machines], dtype=object),
+        "brand": np.array(brands, dtype=object),
+        "run_time": np.fromiter((int(m["run_time"]) for m in machines), dtype=np.int64, count=n),
+        "load_time": np.fromiter((int(m["load_time"]) for m in machines), dtype=np.int64, count=n),
+        "ori_power": np.fromiter((int(m["ori_power"]) for m in machines), dtype=np.int64, count=n),
+        "air": np.fromiter((float(m["air"]) for m in machines), dtype=np.float64, count=n),
+        "is_fc": np.fromiter((bool(m["isFC"]) for m in machines), dtype=bool, count=n),
+        "origin_pre": np.fromiter((float(m["origin_pre"]) for m in machines), dtype=np.float64, count=n),
+        "actual_pre": np.fromiter((float(m["actucal_pre"]) for m in machines), dtype=np.float64, count=n),
+    }
+    if default_ser_p is not None:
+        cols["ser_p"] = np.full(n, float(default_ser_p))
+    else:
+        cols["ser_p"] = np.fromiter((service_para_dict.get(b, DEFAULT_SER_P) for b in brands), dtype=np.float64, count=n)
+    if default_por is not None:
+        cols["por_fc"] = np.full(n, float(default_por))
+    else:
+        cols["por_fc"] = np.fromiter((por_dict.get(b, DEFAULT_POR) for b in brands), dtype=np.float64, count=n)
+    cols["empty_ratio"] = np.full(n, _param(calc_params, "empty_waste_ratio", DEFAULT_EMPTY_WASTE_RATIO))
+    cols["pressure_ratio"] = np.full(n, _param(calc_params, "pressure_drop_ratio", DEFAULT_PRESSURE_DROP_RATIO))
+    return cols
+
+
+def validate_fleet(cols: dict[str, np.ndarray], new_energy_con: np.ndarray | None = None) -> None:
+    """批量校验，发现任何一台无法计算即抛 FleetValidationError（一次列出全部问题）。"""
+    is_fc = cols["is_fc"]
+    run_time, load_time = cols["run_time"], cols["load_time"]
+    checks = [
+        (~is_fc & (run_time <= 0), "工频设备运行时间须大于 0"),
+        (~is_fc & (load_time <= 0), "工频设备加载时间须大于 0"),
+        (~is_fc & (run_time > 0) & (load_time > run_time), "加载时间不能大于运行时间"),
+        (cols["air"] <= 0, "额定气量须大于 0"),
+        (cols["ori_power"] <= 0, "额定功率须大于 0"),
+        (is_fc & (cols["por_fc"] <= 0), "变频加载比例须大于 0"),
+    ]
+    if new_energy_con is not None:
+        checks.append((new_energy_con < 0, "选型设备比功率不能为负"))
+    nos = cols["no"]
+    found = sorted((int(i), k) for k, (mask, _) in enumerate(checks) for i in np.flatnonzero(mask))
+    if found:
+        raise FleetValidationError([f"第 {i + 1} 台（编号 {nos[i]}）：{checks[k][1]}" for i, k in found])
+
+
+def compute_fleet(cols: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """向量化计算各台原有设备的浪费与实际比功率，舍入位置与逐台计算一致。
+
+    系数列（ser_p、por_fc、empty_ratio、pressure_ratio）可传入可广播的更高维数组，
+    结果随之广播，供参数扫描等场景一次计算多组参数。
+    """
+    is_fc = cols["is_fc"]
+    run_time = cols["run_time"].astype(np.float64)
+    load_time = cols["load_time"].astype(np.float64)
+    ori_power = cols["ori_power"].astype(np.float64)
+    air = cols["air"]
+    ser_p, pressure_ratio = cols["ser_p"], cols["pressure_ratio"]
+    safe_run = np.where(run_time > 0, run_time, 1.0)
+
+    d_val = pyround(cols["origin_pre"] - cols["actual_pre"], 3)
+    d_val_waste = pyround(ori_power * d_val * pressure_ratio, 4)
+    empty_waste = np.where(
+        is_fc, 0.0, pyround((run_time - load_time) / safe_run * cols["empty_ratio"] * ori_power, 4)
+    )
+    total_waste = pyround(empty_waste + d_val_waste, 4)
+    por = np.where(is_fc, cols["por_fc"], pyround(load_time / safe_run, 4))
+    safe_den = air * np.where(por != 0, por, 1.0)
+    d_cal_wast_por = 1 - pyround(d_val * pressure_ratio, 4)
+    actual_energyE = np.where(
+        is_fc,
+        pyround(ori_power * ser_p * d_cal_wast_por / safe_den, 2),
+        pyround((ori_power * ser_p * por + empty_waste + d_val_waste) / safe_den, 2),
+    )
+    return {
+        "d_val": d_val,
+        "empty_waste": empty_waste,
+        "d_val_waste": d_val_waste,
+        "total_waste": total_waste,
+        "d_cal_wast_por": d_cal_wast_por,
+        "por": por,
+        "actual_energyE": actual_energyE,
+        "act_air": pyround(por * air, 4),
+    }
+
+
+def compute_savings(
+    actual_energyE: np.ndarray,
+    act_air: np.ndarray,
+    new_energy_con: np.ndarray,
+    running_hours_per_year=YEAR_RUNNING_TIME,
+) -> dict[str, np.ndarray]:
+    """原有设备与新设备比功率之差 -> 节电比例、小时节电、年节电（末轴为设备）。"""
+    saving = pyround(actual_energyE - new_energy_con, 4)
+    safe_ee = np.where(actual_energyE != 0, actual_energyE, 1.0)
+    saving_per_hour = pyround(saving * act_air, 4)
+    saving_per_year = pyround(saving_per_hour * running_hours_per_year)
+    return {
+        "saving": saving,
+        "saving_portion": pyround(saving / safe_ee * 100, 2),
+        "saving_per_hour": saving_per_hour,
+        "saving_per_year": saving_per_year,
+        "all_year_savings": saving_per_year.sum(axis=-1),
+    }
+
+
+@dataclass(frozen=True)
+class FleetSavings:
+    """整批数值结果：原有设备列数组与计算结果、节电数据（不含任何公式字符串）。
+
+    报告表直接由 cols / res 列数组生成；逐台 MachineEnergy 记录（machines）仅在访问时才拆出。
+    """
+    cols: dict[str, np.ndarray]
+    res: dict[str, np.ndarray]
+    new_machine: list[dict]
+    saving_portion: list[float]
+    saving_per_hour: list[float]
+    saving_per_year: list[int]
+    all_year_savings: int
+
+    @cached_property
+    def machines(self) -> list[MachineEnergy]:
+        return fleet_records(self.cols, self.res)
+
+
+def fleet_records(cols: dict[str, np.ndarray], res: dict[str, np.ndarray]) -> list[MachineEnergy]:
+    """把列数组结果拆成逐台 MachineEnergy 记录（与 cal_func.calculate_numeric 一致）。"""
+    is_fc = cols["is_fc"].tolist()
+    empty_ratio = cols["empty_ratio"].tolist()
+    d_cal_wast_por = res["d_cal_wast_por"].tolist()
+    fields = zip(
+        cols["no"].tolist(), cols["model"].tolist(), cols["brand"].tolist(),
+        cols["run_time"].tolist(), cols["load_time"].tolist(), cols["ori_power"].tolist(), cols["air"].tolist(),
+        cols["origin_pre"].tolist(), cols["actual_pre"].tolist(), cols["ser_p"].tolist(), cols["pressure_ratio"].tolist(),
+        res["d_val"].tolist(), res["empty_waste"].tolist(), res["d_val_waste"].tolist(), res["total_waste"].tolist(),
+        res["por"].tolist(), res["actual_energyE"].tolist(), res["act_air"].tolist(),
+    )
+    records = []
+    for i, (no, model, brand, rt, lt, p, air, op, ap, sp, pr, dv, ew, dw, tw, por, ee, aa) in enumerate(fields):
+        fc = is_fc[i]
+        records.append(MachineEnergy(
+            no=no, model=model, brand=brand, is_fc=fc, run_time=rt, load_time=lt, ori_power=p, air=air,
+            ori_pre=op, actual_pre=ap, ser_p=sp, empty_ratio=0.0 if fc else empty_ratio[i], pressure_ratio=pr,
+            d_val=dv, empty_waste=0 if fc else ew, d_val_waste=dw, total_waste=tw,
+            d_cal_wast_por=d_cal_wast_por[i] if fc else None, por=por, actual_energyE=ee, act_air=aa,
+        ))
+    return records
+
+
+def fleet_savings(
+    machine1: list[dict],
+    new_machine: list[dict],
+    running_hours_per_year: int = None,
+    calc_params: dict | None = None,
+) -> FleetSavings:
+    """仅数值：整批校验并计算节电，不生成公式字符串与 DataFrame（预览、试算用）。"""
+    if running_hours_per_year is None:
+        running_hours_per_year = YEAR_RUNNING_TIME
+    n = len(machine1)
+    if len(new_machine) < n:
+        raise FleetValidationError([f"选型设备数量（{len(new_machine)}）少于原有设备数量（{n}）"])
+    new_machine = new_machine[:n]
+    cols = fleet_columns(machine1, calc_params)
+    new_ec = np.fromiter((float(e["energy_con"]) for e in new_machine), dtype=np.float64, count=n)
+    validate_fleet(cols, new_ec)
+    res = compute_fleet(cols)
+    sav = compute_savings(res["actual_energyE"], res["act_air"], new_ec, running_hours_per_year)
+    return FleetSavings(
+        cols=cols,
+        res=res,
+        new_machine=new_machine,
+        saving_portion=sav["saving_portion"].tolist(),
+        saving_per_hour=sav["saving_per_hour"].tolist(),
+        saving_per_year=[int(x) for x in sav["saving_per_year"].tolist()],
+        all_year_savings=int(sav["all_year_savings"]),
+    )
+
+
+def scheme_savings(
+    machine1: list[dict],
+    new_machines: list[list[dict]],
+    running_hours_per_year: int = None,
+    calc_params: dict | None = None,
+) -> list[FleetSavings]:
+    """多套选型方案的节电（与逐套调用 fleet_savings 结果一致）。
+
+    原有设备的实际比功率、实际产气只算一次，各方案比功率组成 (方案数, 设备数) 数组一次算出节电。
+    """
+    if running_hours_per_year is None:
+        running_hours_per_year = YEAR_RUNNING_TIME
+    n = len(machine1)
+    for k, new_machine in enumerate(new_machines):
+        if len(new_machine) < n:
+            raise FleetValidationError([f"方案 {k + 1}：选型设备数量（{len(new_machine)}）少于原有设备数量（{n}）"])
+    new_machines = [new_machine[:n] for new_machine in new_machines]
+    if not new_machines:
+        return []
+    cols = fleet_columns(machine1, calc_params)
+    new_ec = np.array([[float(e["energy_con"]) for e in new_machine] for new_machine in new_machines], dtype=np.float64)
+    new_ec = new_ec.reshape(len(new_machines), n)
+    validate_fleet(cols, new_ec.min(axis=0))
+    res = compute_fleet(cols)
+    sav = compute_savings(res["actual_energyE"], res["act_air"], new_ec, running_hours_per_year)
+    return [
+        FleetSavings(
+            cols=cols,
+            res=res,
+            new_machine=new_machine,
+            saving_portion=sav["saving_portion"][k].tolist(),
+            saving_per_hour=sav["saving_per_hour"][k].tolist(),
+            saving_per_year=[int(x) for x in sav["saving_per_year"][k].tolist()],
+            all_year_savings=int(sav["all_year_savings"][k]),
+        )
+        for k, new_machine in enumerate(new_machines)
+    ]
+
+
+def scheme_sheets(schemes: list[dict], results: list[FleetSavings]) -> list[tuple[str, list[str], list[tuple]]]:
+    """报告附加表：「方案对比」一张 + 每个方案一张逐台节电表「方案N」。
+
+    schemes 为推荐接口的 recommended_schemes 项（name、scheme、total_air），与 results 一一对应。
+    """
+    compare = []
+    for s, result in zip(schemes, results):
+        combo = ", ".join(f"{u['count']}台 {u.get('brand') or ''}-{u.get('model') or ''}" for u in s["scheme"])
+        compare.append((s["name"], combo, s.get("total_air"), result.all_year_savings))
+    sheets = [("方案对比", SCHEME_COMPARE_COLUMNS, compare)]
+    for k, result in enumerate(results, 1):
+        fields = zip(
+            result.cols["no"].tolist(), result.cols["model"].tolist(), result.res["actual_energyE"].tolist(),
+            result.new_machine, result.saving_portion, result.saving_per_hour, result.saving_per_year,
+        )
+        rows = [
+            (str(no), model, ee, e["brand"], e["model"], e["energy_con"], portion, per_hour, per_year)
+            for no, model, ee, e, portion, per_hour, per_year in fields
+        ]
+        rows.append(("合计", "", None, "", "", None, None, None, result.all_year_savings))
+        sheets.append((f"方案{k}", SCHEME_DETAIL_COLUMNS, rows))
+    return sheets
+
+
+def _str_list(a: np.ndarray) -> list[str]:
+    return [str(x) for x in a.tolist()]
+
+
+def _percent_list(a: np.ndarray) -> list[str]:
+    """系数列 -> 「40」之类的百分数文本；系数通常全批相同，按不同取值只格式化一次。"""
+    values = a.tolist()
+    text = {v: f"{v * 100:.0f}" for v in set(values)}
+    return [text[v] for v in values]
+
+
+def consumption_rows(result: FleetSavings):
+    """「原有设备能耗」表逐行数据：由列数组直接拼公式字符串（与 cal_func.render_formulas 一致）。"""
+    cols, res = result.cols, result.res
+    # 压降浪费公式的结果与 render_formulas 一样取 round(p * d_val * 压降比例, 3)
+    d_val_waste_3 = pyround(cols["ori_power"].astype(np.float64) * res["d_val"] * cols["pressure_ratio"], 3)
+    fields = zip(
+        cols["no"].tolist(), cols["model"].tolist(), cols["is_fc"].tolist(),
+        cols["run_time"].tolist(), cols["load_time"].tolist(), cols["ori_power"].tolist(), cols["air"].tolist(),
+        cols["ser_p"].tolist(), _percent_list(cols["empty_ratio"]), _percent_list(cols["pressure_ratio"]),
+        res["d_val"].tolist(), d_val_waste_3.tolist(), res["empty_waste"].tolist(), res["total_waste"].tolist(),
+        res["d_cal_wast_por"].tolist(), res["por"].tolist(), res["actual_energyE"].tolist(),
+    )
+    for no, model, fc, rt, lt, p, air, sp, empty_pct, pressure_pct, dv, dw3, ew, tw, dcp, por, ee in fields:
+        str_d_val_waste = f"{p}*({dv})*{pressure_pct}%={dw3}"
+        if fc:
+            str_empty_waste = "0"
+            str_actual_energyE = f"({p}*{sp}*{dcp})/({air}*{por})={ee}"
+        else:
+            str_empty_waste = f"({rt}-{lt})/{rt}*{empty_pct}%*{p}={ew}"
+            str_actual_energyE = f"({p}*{sp}*{por}+{tw})/({air}*{por})={ee}"
+        yield str(no), model, str(rt), str(lt), str(p), str_empty_waste, str_d_val_waste, str(tw), str_actual_energyE
+
+
+def equipment_rows(result: FleetSavings):
+    """「原有设备一览」表逐行数据。"""
+    cols = result.cols
+    return zip(
+        _str_list(cols["no"]), _str_list(cols["ori_power"]), _str_list(cols["air"]),
+        _str_list(cols["origin_pre"]), _str_list(cols["actual_pre"]), cols["model"].tolist(),
+    )
+
+
+def energy_compare_rows(result: FleetSavings) -> list[list]:
+    """「能效对比」表：按 ENERGY_TABLE_LABELS 逐字段一行，各行依次为每台的新设备、原有设备两列。"""
+    cols, res = result.cols, result.res
+    n = len(cols["no"])
+    new_machine = result.new_machine[:n]
+    new_values = [
+        [e["brand"] for e in new_machine],
+        [e["model"] for e in new_machine],
+        [e["ori_power"] for e in new_machine],
+        [e["air"] for e in new_machine],
+        ["变频" if (e.get("isFC") == 1 or e.get("isFC") is True) else "工频" for e in new_machine],
+        [e["energy_con"] for e in new_machine],
+        [e["energy_con_min"] for e in new_machine],
+    ]
+    old_values = [
+        cols["brand"].tolist(),
+        cols["model"].tolist(),
+        cols["ori_power"].tolist(),
+        _str_list(cols["air"]),
+        ["变频" if fc else "工频" for fc in cols["is_fc"].tolist()],
+        res["actual_energyE"].tolist(),
+        pyround(res["actual_energyE"] / 60, 4).tolist(),
+    ]
+    rows = []
+    for new, old in zip(new_values, old_values):
+        row = [None] * (2 * n)
+        row[0::2] = new
+        row[1::2] = old
+        rows.append(row)
+    # 节电各项新旧两列相同
+    for values in (result.saving_portion, result.saving_per_hour, result.saving_per_year, [result.all_year_savings] * n):
+        rows.append([v for v in values for _ in range(2)])
+    return rows
+
+
+def savings_tables(result: FleetSavings):
+    """报告渲染：由列数组生成 (原有设备能耗, 原有设备一览, 能效对比) 三张 DataFrame。"""
+    all_table = pd.DataFrame(list(consumption_rows(result)), columns=CONSUMPTION_COLUMNS)
+    ori_eq_table = pd.DataFrame(list(equipment_rows(result)), columns=EQUIPMENT_COLUMNS)
+    # 与 DataFrame.from_dict(orient="index") 结果相同（各列均为 object），但整表作为一个 object 块构建、不逐列推断类型
+    ee_pd_da = pd.DataFrame(
+        np.array(energy_compare_rows(result), dtype=object), index=ENERGY_TABLE_LABELS, dtype=object
+    )
+    return all_table, ori_eq_table, ee_pd_da
+
+
+def originEC_to_dataframe_batch(
+    machine1: list[dict],
+    new_machine: list[dict],
+    running_hours_per_year: int = None,
+    calc_params: dict | None = None,
+):
+    """批量版 originEC_to_dataframe：返回 (原有设备能耗, 原有设备一览, 能效对比, 年总节电)。"""
+    result = fleet_savings(machine1, new_machine, running_hours_per_year, calc_params)
+    return (*savings_tables(result), result.all_year_savings)
@@ -1,6 +1,7 @@
 """AirComp 能耗计算逻辑（从蓝本迁移，兼容更多品牌）"""
+from dataclasses import dataclass
+
 import pandas as pd
-import os
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", 500)
@@ -40,60 +41,160 @@ def _get_por(brand, calc_params: dict | None):
     return _por(brand)
 
 
-def calculate_it_noneFC(air_dict, calc_params: dict | None = None):
-    no, model = air_dict["no"], air_dict["model"]
-    run_time, load_time = int(air_dict["run_time"]), int(air_dict["load_time"])
-    ori_power, air = int(air_dict["ori_power"]), float(air_dict["air"])
+@dataclass(frozen=True, slots=True)
+class MachineEnergy:
+    """单台原有设备的数值计算结果（不含公式字符串），is_fc 为所用计算分支。"""
+    no: object
+    model: object
+    brand: object
+    is_fc: bool
+    run_time: int
+    load_time: int
+    ori_power: int
+    air: float
+    ori_pre: float
+    actual_pre: float
+    ser_p: float
+    empty_ratio: float
+    pressure_ratio: float
+    d_val: float
+    empty_waste: float
+    d_val_waste: float
+    total_waste: float
+    d_cal_wast_por: float | None  # 仅变频
+    por: float
+    actual_energyE: float
+    act_air: float
+
+    @property
+    def energy_con_min(self) -> float:
+        return round(self.actual_energyE / 60, 4)
+
+
+def _base_fields(air_dict, calc_params: dict | None) -> dict:
     brand = air_dict["brand"]
-    ori_pre, actual_pre = float(air_dict["origin_pre"]), float(air_dict["actucal_pre"])
-    ser_p = _get_ser_p(brand, calc_params)
+    return {
+        "no": air_dict["no"],
+        "model": air_dict["model"],
+        "brand": brand,
+        "run_time": int(air_dict["run_time"]),
+        "load_time": int(air_dict["load_time"]),
+        "ori_power": int(air_dict["ori_power"]),
+        "air": float(air_dict["air"]),
+        "ori_pre": float(air_dict["origin_pre"]),
+        "actual_pre": float(air_dict["actucal_pre"]),
+        "ser_p": _get_ser_p(brand, calc_params),
+        "pressure_ratio": float(calc_params["pressure_drop_ratio"]) if calc_params and "pressure_drop_ratio" in calc_params else 0.07,
+    }
+
+
+def calculate_numeric_noneFC(air_dict, calc_params: dict | None = None) -> MachineEnergy:
+    f = _base_fields(air_dict, calc_params)
+    run_time, load_time, ori_power, air = f["run_time"], f["load_time"], f["ori_power"], f["air"]
     empty_ratio = float(calc_params["empty_waste_ratio"]) if calc_params and "empty_waste_ratio" in calc_params else 0.4
-    pressure_ratio = float(calc_params["pressure_drop_ratio"]) if calc_params and "pressure_drop_ratio" in calc_params else 0.07
-    d_val = round(ori_pre - actual_pre, 3)
+    d_val = round(f["ori_pre"] - f["actual_pre"], 3)
     empty_waste = round((run_time - load_time) / run_time * empty_ratio * ori_power, 4)
-    str_empty_waste = f"({run_time}-{load_time})/{run_time}*{empty_ratio*100:.0f}%*{ori_power}={empty_waste}"
-    d_val_waste = round(ori_power * d_val * pressure_ratio, 4)
-    str_d_val_waste = f"{ori_power}*({d_val})*{pressure_ratio*100:.0f}%={round(ori_power * d_val * pressure_ratio, 3)}"
-    total_waste = round(empty_waste + d_val_waste, 4)
+    d_val_waste = round(ori_power * d_val * f["pressure_ratio"], 4)
     por = float(round(load_time / run_time, 4))
     actual_energyE = round(
-        (float(ori_power) * float(ser_p) * por + empty_waste + d_val_waste) / (air * por), 2
+        (float(ori_power) * float(f["ser_p"]) * por + empty_waste + d_val_waste) / (air * por), 2
+    )
+    return MachineEnergy(
+        **f, is_fc=False, empty_ratio=empty_ratio, d_val=d_val, empty_waste=empty_waste,
+        d_val_waste=d_val_waste, total_waste=round(empty_waste + d_val_waste, 4), d_cal_wast_por=None,
+        por=por, actual_energyE=actual_energyE, act_air=round(por * air, 4),
     )
-    str_actual_energyE = f"({ori_power}*{ser_p}*{por}+{total_waste})/({air}*{por})={actual_energyE}"
-    isFccn = "变频 " if air_dict["isFC"] else "工频"
-    return [
-        [str(no), model, str(run_time), str(load_time), str(ori_power), str_empty_waste, str_d_val_waste, str(total_waste), str_actual_energyE, round(por * air, 4)],
-        [str(ori_power), str(air), str(ori_pre), str(actual_pre), str(model), str(brand)],
-        [brand, model, ori_power, isFccn, actual_energyE, round(actual_energyE / 60, 4)],
-    ]
 
 
-def calculate_it_FC(air_dict, calc_params: dict | None = None):
-    no, model = air_dict["no"], air_dict["model"]
-    run_time, load_time = int(air_dict["run_time"]), int(air_dict["load_time"])
-    ori_power, air = int(air_dict["ori_power"]), float(air_dict["air"])
-    brand = air_dict["brand"]
-    ori_pre, actual_pre = float(air_dict["origin_pre"]), float(air_dict["actucal_pre"])
-    ser_p = _get_ser_p(brand, calc_params)
-    pressure_ratio = float(calc_params["pressure_drop_ratio"]) if calc_params and "pressure_drop_ratio" in calc_params else 0.07
-    d_val = round(ori_pre - actual_pre, 3)
+def calculate_numeric_FC(air_dict, calc_params: dict | None = None) -> MachineEnergy:
+    f = _base_fields(air_dict, calc_params)
+    ori_power, air = f["ori_power"], f["air"]
+    d_val = round(f["ori_pre"] - f["actual_pre"], 3)
     empty_waste = 0
-    str_empty_waste = "0"
-    d_val_waste = round(ori_power * d_val * pressure_ratio, 4)
-    d_cal_wast_por = 1 - round(d_val * pressure_ratio, 4)
-    str_d_val_waste = f"{ori_power}*({d_val})*{pressure_ratio*100:.0f}%={round(ori_power * d_val * pressure_ratio, 3)}"
-    total_waste = round(empty_waste + d_val_waste, 4)
-    por = _get_por(brand, calc_params)
-    actual_energyE = round((float(ori_power) * ser_p * d_cal_wast_por) / (air * por), 2)
-    str_actual_energyE = f"({ori_power}*{ser_p}*{d_cal_wast_por})/({air}*{por})={actual_energyE}"
-    isFccn = "变频" if air_dict["isFC"] else "工频"
+    d_val_waste = round(ori_power * d_val * f["pressure_ratio"], 4)
+    d_cal_wast_por = 1 - round(d_val * f["pressure_ratio"], 4)
+    por = _get_por(f["brand"], calc_params)
+    actual_energyE = round((float(ori_power) * f["ser_p"] * d_cal_wast_por) / (air * por), 2)
+    return MachineEnergy(
+        **f, is_fc=True, empty_ratio=0.0, d_val=d_val, empty_waste=empty_waste,
+        d_val_waste=d_val_waste, total_waste=round(empty_waste + d_val_waste, 4), d_cal_wast_por=d_cal_wast_por,
+        por=por, actual_energyE=actual_energyE, act_air=round(por * air, 4),
+    )
+
+
+def calculate_numeric(air_dict, calc_params: dict | None = None) -> MachineEnergy:
+    """仅数值计算（不拼公式字符串），供预览、脚本试算等不出报告的场景。"""
+    if not air_dict["isFC"]:
+        return calculate_numeric_noneFC(air_dict, calc_params)
+    return calculate_numeric_FC(air_dict, calc_params)
+
+
+def render_formulas(r: MachineEnergy) -> tuple[str, str, str]:
+    """按计算结果生成 (空载浪费, 压降浪费, 实际比功率) 公式字符串，仅在生成报告时调用。"""
+    p = r.ori_power
+    str_d_val_waste = f"{p}*({r.d_val})*{r.pressure_ratio*100:.0f}%={round(p * r.d_val * r.pressure_ratio, 3)}"
+    if r.is_fc:
+        str_empty_waste = "0"
+        str_actual_energyE = f"({p}*{r.ser_p}*{r.d_cal_wast_por})/({r.air}*{r.por})={r.actual_energyE}"
+    else:
+        str_empty_waste = f"({r.run_time}-{r.load_time})/{r.run_time}*{r.empty_ratio*100:.0f}%*{p}={r.empty_waste}"
+        str_actual_energyE = f"({p}*{r.ser_p}*{r.por}+{r.total_waste})/({r.air}*{r.por})={r.actual_energyE}"
+    return str_empty_waste, str_d_val_waste, str_actual_energyE
+
+
+def _render_rows(r: MachineEnergy):
+    str_empty_waste, str_d_val_waste, str_actual_energyE = render_formulas(r)
+    isFccn = "变频" if r.is_fc else "工频"
     return [
-        [str(no), model, str(run_time), str(load_time), str(ori_power), str_empty_waste, str_d_val_waste, str(total_waste), str_actual_energyE, round(por * air, 4)],
-        [str(ori_power), str(air), str(ori_pre), str(actual_pre), str(model), str(brand)],
-        [brand, model, ori_power, isFccn, actual_energyE, round(actual_energyE / 60, 4)],
+        [str(r.no), r.model, str(r.run_time), str(r.load_time), str(r.ori_power), str_empty_waste, str_d_val_waste, str(r.total_waste), str_actual_energyE, r.act_air],
+        [str(r.ori_power), str(r.air), str(r.ori_pre), str(r.actual_pre), str(r.model), str(r.brand)],
+        [r.brand, r.model, r.ori_power, isFccn, r.actual_energyE, r.energy_con_min],
     ]
 
 
+def calculate_it_noneFC(air_dict, calc_params: dict | None = None):
+    return _render_rows(calculate_numeric_noneFC(air_dict, calc_params))
+
+
+def calculate_it_FC(air_dict, calc_params: dict | None = None):
+    return _render_rows(calculate_numeric_FC(air_dict, calc_params))
+
+
+def normalize_machines(machines: list[dict]) -> list[dict]:
+    """将请求或 ORM 转换来的原有设备统一为计算口径（类型固定、缺省补零）。"""
+    out = []
+    for m in machines:
+        out.append({
+            "no": int(m.get("no") or 0),
+            "model": str(m.get("model") or ""),
+            "run_time": int(m.get("run_time") or 0),
+            "load_time": int(m.get("load_time") or 0),
+            "ori_power": int(m.get("ori_power") or 0),
+            "air": float(m.get("air") or 0),
+            "brand": str(m.get("brand") or ""),
+            "isFC": bool(m.get("isFC")),
+            "origin_pre": float(m.get("origin_pre") or 0),
+            "actucal_pre": float(m.get("actucal_pre") or m.get("actual_pre") or 0),
+        })
+    return out
+
+
+def normalize_new_eq(new_eq: list[dict]) -> list[dict]:
+    """将选型设备统一为计算口径。"""
+    out = []
+    for e in new_eq:
+        out.append({
+            "brand": str(e.get("brand") or ""),
+            "model": str(e.get("model") or ""),
+            "ori_power": int(e.get("ori_power") or 0),
+            "air": float(e.get("air") or 0),
+            "isFC": bool(e.get("isFC")),
+            "energy_con": float(e.get("energy_con") or 0),
+            "energy_con_min": float(e.get("energy_con_min") or 0),
+        })
+    return out
+
+
 def originEC_to_dataframe(
     machine1,
     new_machine,
@@ -189,25 +290,21 @@ def originEC_to_dataframe(
 
 
 def final_results_excel(
-    company_name: str,
     machines: list,
     eqs: list,
     output_dir: str,
     running_hours_per_year: int = None,
     calc_params: dict | None = None,
 ) -> tuple[str, int]:
-    """生成 Excel 并返回 (文件路径, 年总节电量 kWh)。"""
-    if running_hours_per_year is None:
-        running_hours_per_year = YEAR_RUNNING_TIME
-    os.makedirs(output_dir, exist_ok=True)
-    origin_final_table, origin_eq_table, energy_table, all_year_savings = originEC_to_dataframe(
-        machines, eqs, running_hours_per_year=running_hours_per_year, calc_params=calc_params
-    )
-    safe_name = "".join(c for c in str(company_name) if c not in r'\/:*?"<>|').strip() or "未命名"
-    filename = f"{safe_name}_能耗计算概况表.xlsx"
-    filepath = os.path.join(output_dir, filename)
-    with pd.ExcelWriter(filepath, engine="openpyxl") as writer:
-        origin_eq_table.to_excel(writer, sheet_name="原有设备一览", index=False)
-        origin_final_table.to_excel(writer, sheet_name="原有设备能耗", index=False)
-        energy_table.to_excel(writer, sheet_name="能效对比")
-    return filepath, all_year_savings
+    """生成 Excel 并返回 (文件路径, 年总节电量 kWh)。
+
+    由计算结果逐行流式写入 output_dir 下唯一的 report_<uuid>.xlsx（临时文件写完后原子改名），
+    并发请求互不覆盖；文件名不含公司名，下载时按报告记录中的公司名命名。
+    """
+    # 批量引擎：整批向量化计算并先行校验，数据不合法时抛 FleetValidationError(ValueError)
+    from app.services.cal_batch import fleet_savings
+    from app.services.report_writer import write_report_workbook
+
+    result = fleet_savings(machines, eqs, running_hours_per_year=running_hours_per_year, calc_params=calc_params)
+    filepath = write_report_workbook(result, output_dir)
+    return filepath, result.all_year_savings
@@ -0,0 +1,116 @@
+"""客户机 × 供应商机型 节电矩阵：每台原有设备换成每个供应商机型时的小时/年节电
+
+原有设备侧（实际比功率 actual_energyE、实际产气 act_air）整批只算一次，
+与全部供应商机型的比功率 energy_con 广播为 (设备, 机型) 一次算出；
+与 device_match 相同的压力约束：机型额定压力 < 该设备需求压力的格子不可选（记为 None / 不进入 top-N）。
+"""
+import numpy as np
+
+from app.services.cal_batch import (
+    compute_fleet,
+    compute_savings,
+    fleet_columns,
+    validate_fleet,
+)
+from app.services.cal_func import YEAR_RUNNING_TIME
+from app.services.device_match import client_pressure
+from app.services.supplier_catalog import SupplierCatalog
+
+MAX_MATRIX_CELLS = 2_000_000  # 返回完整矩阵时的格子数上限；超出须用 top_n
+
+
+def _masked(values: np.ndarray, ok: np.ndarray, cast) -> list[list]:
+    return [[cast(v) if f else None for v, f in zip(row, mask)] for row, mask in zip(values.tolist(), ok.tolist())]
+
+
+def savings_matrix(
+    machines: list[dict],
+    catalog: SupplierCatalog,
+    running_hours_per_year: int | None = None,
+    calc_params: dict | None = None,
+    electricity_price: float | None = None,
+    top_n: int | None = None,
+) -> dict:
+    """machines 须已 normalize_machines。
+
+    top_n 为空时返回完整矩阵 saving_per_hour / saving_per_year（行为设备、列为 suppliers，不满足压力为 None）；
+    否则每台设备只返回年节电最高的 top_n 个机型 [{supplier, saving_portion, saving_per_hour, saving_per_year}]。
+    """
+    if running_hours_per_year is None:
+        running_hours_per_year = YEAR_RUNNING_TIME
+    n, m = len(machines), len(catalog)
+    if top_n is None and n * m > MAX_MATRIX_CELLS:
+        raise ValueError(f"矩阵过大（{n} 台 × {m} 个机型），请设置 top_n 只返回每台设备的前 N 个机型")
+    rows = catalog.rows
+    cols = fleet_columns(machines, calc_params or None)
+    validate_fleet(cols)
+    res = compute_fleet(cols)
+    new_ec = np.array([r["energy_con"] for r in rows], dtype=np.float64)
+    if (new_ec < 0).any():
+        raise ValueError("供应商机型比功率不能为负")
+    # 末轴为设备：(机型, 1) 与 (设备,) 广播为 (机型, 设备)，再转置为 (设备, 机型)
+    sav = compute_savings(res["actual_energyE"], res["act_air"], new_ec[:, None], running_hours_per_year)
+    portion, per_hour, per_year = (sav[k].T for k in ("saving_portion", "saving_per_hour", "saving_per_year"))
+    need_p = np.array([client_pressure(c) for c in machines], dtype=np.float64)
+    ok = np.array(catalog.pressures, dtype=np.float64)[None, :] >= need_p[:, None]
+
+    result = {
+        "machines": [
+            {
+                "no": int(no),
+                "model": model,
+                "actual_energyE": float(ee),
+                "act_air": float(air),
+                "pressure": float(p),
+            }
+            for no, model, ee, air, p in zip(
+                cols["no"].tolist(), cols["model"].tolist(), res["actual_energyE"].tolist(),
+                res["act_air"].tolist(), need_p.tolist(),
+            )
+        ],
+        "suppliers": [
+            {
+                "brand": r["brand"],
+                "model": r["model"],
+                "air": r["_air"],
+                "origin_pre": r["_origin_pre"],
+                "energy_con": r["energy_con"],
+            }
+            for r in rows
+        ],
+        "running_hours_per_year": running_hours_per_year,
+    }
+    price = electricity_price if electricity_price is not None and electricity_price >= 0 else None
+    if top_n is None:
+        result["saving_per_hour"] = _masked(per_hour, ok, float)
+        result["saving_per_year"] = _masked(per_year, ok, int)
+        if price is not None:
+            result["saving_cost"] = _masked(np.round(per_year * price, 2), ok, float)
+        return result
+
+    top_n = max(1, min(int(top_n), m))
+    score = np.where(ok, per_year, -np.inf)
+    if top_n < m:
+        part = np.argpartition(-score, top_n - 1, axis=1)[:, :top_n]
+    else:
+        part = np.broadcast_to(np.arange(m), (n, m))
+    # 年节电降序，相同时按 suppliers 中的顺序
+    order = np.take_along_axis(part, np.lexsort((part, -np.take_along_axis(score, part, axis=1)), axis=1), axis=1)
+    top = []
+    for i in range(n):
+        items = []
+        for j in order[i].tolist():
+            if not ok[i, j]:
+                continue
+            item = {
+                "supplier": j,
+                "saving_portion": float(portion[i, j]),
+                "saving_per_hour": float(per_hour[i, j]),
+                "saving_per_year": int(per_year[i, j]),
+            }
+            if price is not None:
+                item["saving_cost"] = round(float(per_year[i, j]) * price, 2)
+            items.append(item)
+        top.append(items)
+    result["top"] = top
+    return result
@@ -0,0 +1,128 @@
+"""年节电不确定性：对现场估计的输入按给定分布抽样，批量计算 P10 / P50 / P90
+
+可抽样的输入（均为在原值上的扰动）：
+  run_time / load_time / actual_pre  逐台独立抽样
+  ser_p / por                        品牌系数（service_para_dict / por_dict 或 calc_params 默认值），同一品牌同一样本共用一个扰动
+分布写法：{"dist": "normal", "sd": 0.05}、{"dist": "uniform", "low": -0.1, "high": 0.1}、
+{"dist": "triangular", "low": -0.1, "mode": 0, "high": 0.1}；relative 为 True（默认）时按比例 x·(1+e)，否则为绝对量 x+e。
+样本按块组成 (样本, 设备) 二维数组交给 compute_fleet / compute_savings，一次算完整块。
+"""
+import numpy as np
+
+from app.services.cal_batch import (
+    FleetValidationError,
+    compute_fleet,
+    compute_savings,
+    fleet_columns,
+    validate_fleet,
+)
+from app.services.cal_func import YEAR_RUNNING_TIME
+
+UNCERTAIN_FIELDS = ("run_time", "load_time", "actual_pre", "ser_p", "por")
+DEFAULT_SAMPLES = 10_000
+MAX_SAMPLES = 200_000
+CHUNK_CELLS = 1_000_000  # 每块 样本数 × 设备数 上限，约束中间数组内存
+PERCENTILES = (10, 50, 90)
+
+
+def _check_spec(name: str, spec: dict) -> None:
+    dist = spec.get("dist", "normal")
+    if dist == "normal":
+        if spec.get("sd") is None or spec["sd"] < 0:
+            raise ValueError(f"{name}：正态分布须给出非负的 sd")
+    elif dist == "uniform":
+        if spec.get("low") is None or spec.get("high") is None or spec["low"] > spec["high"]:
+            raise ValueError(f"{name}：均匀分布须给出 low <= high")
+    elif dist == "triangular":
+        low, mode, high = spec.get("low"), spec.get("mode", 0.0), spec.get("high")
+        if low is None or high is None or mode is None or not (low <= mode <= high) or low == high:
+            raise ValueError(f"{name}：三角分布须满足 low <= mode <= high 且 low < high")
+    else:
+        raise ValueError(f"{name}：不支持的分布 {dist}（可选 normal / uniform / triangular）")
+
+
+def _perturb(rng: np.random.Generator, base: np.ndarray, spec: dict, size: tuple) -> np.ndarray:
+    dist = spec.get("dist", "normal")
+    if dist == "normal":
+        e = rng.normal(0.0, spec["sd"], size)
+    elif dist == "uniform":
+        e = rng.uniform(spec["low"], spec["high"], size)
+    else:
+        e = rng.triangular(spec["low"], spec.get("mode", 0.0), spec["high"], size)
+    return base * (1.0 + e) if spec.get("relative", True) else base + e
+
+
+def monte_carlo_savings(
+    machines: list[dict],
+    new_eq: list[dict],
+    distributions: dict,
+    samples: int = DEFAULT_SAMPLES,
+    running_hours_per_year: int | None = None,
+    calc_params: dict | None = None,
+    electricity_price: float | None = None,
+    seed: int | None = None,
+) -> dict:
+    """distributions: {字段名: 分布}；返回年节电（及电费）的 P10/P50/P90 与均值。
+
+    入参须已经过 normalize_machines / normalize_new_eq。抽样值会截断到可计算范围
+    （运行时间 >= 1，0 < 加载时间 <= 运行时间，压力与系数非负），不会因个别样本报错。
+    """
+    unknown = set(distributions) - set(UNCERTAIN_FIELDS)
+    if unknown:
+        raise ValueError(f"不支持抽样的字段：{'、'.join(sorted(unknown))}")
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"抽样次数须在 1 ~ {MAX_SAMPLES} 之间")
+    for name, spec in distributions.items():
+        _check_spec(name, spec)
+    if running_hours_per_year is None:
+        running_hours_per_year = YEAR_RUNNING_TIME
+    n = len(machines)
+    if len(new_eq) < n:
+        raise FleetValidationError([f"选型设备数量（{len(new_eq)}）少于原有设备数量（{n}）"])
+
+    cols = fleet_columns(machines, calc_params)
+    new_ec = np.fromiter((float(e["energy_con"]) for e in new_eq[:n]), dtype=np.float64, count=n)
+    validate_fleet(cols, new_ec)
+    brands, brand_idx = np.unique(cols["brand"].astype(str), return_inverse=True)
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, min(samples, CHUNK_CELLS // max(n, 1)))
+    kwh = np.empty(samples, dtype=np.float64)
+    for start in range(0, samples, chunk):
+        size = min(chunk, samples - start)
+        c = dict(cols)
+        if "run_time" in distributions:
+            c["run_time"] = np.maximum(_perturb(rng, cols["run_time"], distributions["run_time"], (size, n)), 1.0)
+        run_time = np.broadcast_to(c["run_time"], (size, n))
+        if "load_time" in distributions:
+            load_time = _perturb(rng, cols["load_time"], distributions["load_time"], (size, n))
+        else:
+            load_time = cols["load_time"]
+        c["load_time"] = np.clip(load_time, np.minimum(1.0, run_time), run_time)
+        if "actual_pre" in distributions:
+            c["actual_pre"] = np.maximum(_perturb(rng, cols["actual_pre"], distributions["actual_pre"], (size, n)), 0.0)
+        if "ser_p" in distributions:
+            factor = _perturb(rng, 1.0, distributions["ser_p"], (size, len(brands)))
+            c["ser_p"] = np.maximum(cols["ser_p"] * factor[:, brand_idx], 0.0)
+        if "por" in distributions:
+            factor = _perturb(rng, 1.0, distributions["por"], (size, len(brands)))
+            c["por_fc"] = np.clip(cols["por_fc"] * factor[:, brand_idx], 1e-3, 1.0)
+        res = compute_fleet(c)
+        energy = np.broadcast_to(res["actual_energyE"], (size, n))
+        act_air = np.broadcast_to(res["act_air"], (size, n))
+        kwh[start:start + size] = compute_savings(energy, act_air, new_ec, running_hours_per_year)["all_year_savings"]
+
+    def bands(values: np.ndarray, ndigits: int) -> dict:
+        p = np.percentile(values, PERCENTILES)
+        out = {f"p{q}": round(float(v), ndigits) for q, v in zip(PERCENTILES, p)}
+        out["mean"] = round(float(values.mean()), ndigits)
+        return out
+
+    result = {
+        "samples": samples,
+        "fields": sorted(distributions),
+        "energy_savings_kwh": {k: int(v) for k, v in bands(kwh, 0).items()},
+    }
+    if electricity_price is not None and electricity_price >= 0:
+        result["energy_savings_cost"] = bands(kwh * electricity_price, 2)
+    return result
@@ -0,0 +1,116 @@
+"""计算参数敏感性扫描：对参数网格一次向量化算出整批设备的年节电
+
+各参数可给单值、列表或 {start, stop, step} 区间。影响比功率的参数（服务系数、变频加载比例、
+空载/压降系数）组成网格 G，与设备维 n 一起广播为 (G, n) 一次计算；年运行时间与电费只是
+线性倍数，再各自广播一维。结果为按参数轴排列的紧凑矩阵，不生成 Excel。
+"""
+import numpy as np
+
+from app.services.cal_batch import (
+    FleetValidationError,
+    compute_fleet,
+    compute_savings,
+    fleet_columns,
+    pyround,
+    validate_fleet,
+)
+from app.services.cal_func import YEAR_RUNNING_TIME
+
+# 输出矩阵的轴顺序
+SWEEP_AXES = (
+    "running_hours_per_year",
+    "default_ser_p",
+    "default_por",
+    "empty_waste_ratio",
+    "pressure_drop_ratio",
+    "electricity_price",
+)
+# 影响比功率的参数 -> fleet_columns 中的列名
+_ENERGY_PARAMS = {
+    "default_ser_p": "ser_p",
+    "default_por": "por_fc",
+    "empty_waste_ratio": "empty_ratio",
+    "pressure_drop_ratio": "pressure_ratio",
+}
+MAX_SWEEP_POINTS = 100_000
+MAX_SWEEP_CELLS = 50_000_000  # 网格点数 × 设备台数上限，约束中间数组内存
+
+
+def expand_axis(name: str, spec) -> list[float] | None:
+    """单值 / 列表 / {start, stop, step}（含 stop）-> 数值列表；None 表示不扫描该参数。"""
+    if spec is None:
+        return None
+    if isinstance(spec, (int, float)):
+        values = [float(spec)]
+    elif isinstance(spec, dict):
+        start, stop, step = float(spec["start"]), float(spec["stop"]), float(spec["step"])
+        if step <= 0 or stop < start:
+            raise ValueError(f"{name}：区间须满足 step > 0 且 stop >= start")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        if count > MAX_SWEEP_POINTS:
+            raise ValueError(f"{name}：区间取值过多（{count}）")
+        values = np.round(start + step * np.arange(count), 10).tolist()
+    else:
+        values = [float(v) for v in spec]
+    if not values:
+        raise ValueError(f"{name}：取值不能为空")
+    if min(values) < 0 or (name in ("default_ser_p", "default_por") and min(values) <= 0):
+        raise ValueError(f"{name}：取值须为正数")
+    return values
+
+
+def sweep_savings(machines: list[dict], new_eq: list[dict], axes: dict) -> dict:
+    """axes: {参数名: 单值/列表/区间}；返回各轴取值与年节电（及电费）矩阵。
+
+    未给出的参数按单次计算的默认口径（品牌系数、默认系数、年运行 8000 小时），且不出现在结果轴中。
+    """
+    expanded = {name: expand_axis(name, axes.get(name)) for name in SWEEP_AXES}
+    shape = [len(v) if v else 1 for v in expanded.values()]
+    points = int(np.prod(shape))
+    n = len(machines)
+    if points > MAX_SWEEP_POINTS:
+        raise ValueError(f"参数网格共 {points} 个点，超过上限 {MAX_SWEEP_POINTS}")
+    if len(new_eq) < n:
+        raise FleetValidationError([f"选型设备数量（{len(new_eq)}）少于原有设备数量（{n}）"])
+
+    cols = fleet_columns(machines)
+    new_ec = np.fromiter((float(e["energy_con"]) for e in new_eq[:n]), dtype=np.float64, count=n)
+    validate_fleet(cols, new_ec)
+
+    # 比功率相关参数组成网格 G，每个参数列为 (G, 1)（扫描）或 (1, n)（按品牌/默认）
+    energy_names = list(_ENERGY_PARAMS)
+    energy_shape = [shape[SWEEP_AXES.index(k)] for k in energy_names]
+    g = int(np.prod(energy_shape))
+    hours_count = shape[0]
+    if g * hours_count * n > MAX_SWEEP_CELLS:
+        raise ValueError(f"参数网格 × 设备数过大（{g * hours_count} × {n}），请缩小扫描范围")
+    index = np.indices(energy_shape).reshape(len(energy_names), -1)
+    grid_cols = dict(cols)
+    for k, name in enumerate(energy_names):
+        values = expanded[name]
+        col = _ENERGY_PARAMS[name]
+        if values is None:
+            grid_cols[col] = cols[col][None, :]
+        else:
+            grid_cols[col] = np.asarray(values)[index[k]][:, None]
+    res = compute_fleet(grid_cols)
+    energy = np.broadcast_to(res["actual_energyE"], (g, n))
+    act_air = np.broadcast_to(res["act_air"], (g, n))
+
+    hours = np.asarray(expanded["running_hours_per_year"] or [YEAR_RUNNING_TIME], dtype=np.float64)
+    sav = compute_savings(energy, act_air, new_ec, hours[:, None, None])
+    kwh = sav["all_year_savings"].reshape(shape[:-1])  # (H, S, P, E, D)
+
+    requested = [k for k, name in enumerate(SWEEP_AXES[:-1]) if expanded[name] is not None]
+    squeeze = tuple(k for k in range(len(SWEEP_AXES) - 1) if k not in requested)
+    out = {
+        "axes": [{"name": name, "values": expanded[name]} for name in SWEEP_AXES if expanded[name] is not None],
+        "points": points,
+        "machine_count": n,
+        "energy_savings_kwh": np.squeeze(kwh, axis=squeeze).astype(np.int64).tolist(),
+    }
+    prices = expanded["electricity_price"]
+    if prices is not None:
+        cost = pyround(kwh[..., None] * np.asarray(prices), 2)
+        out["energy_savings_cost"] = np.squeeze(cost, axis=squeeze).tolist()
+    return out
@@ -0,0 +1,208 @@
+"""供应商目录快照：全表只读一次，按目录版本号缓存并跨请求共用
+
+供应商表任何增删改都会递增 catalog_version（见 models/catalog.py），每个请求只查一次版本号，
+版本未变时直接复用进程内快照，不再逐行构建 ORM 对象：
+  - records    结构化 NumPy 数组（一行一条供应商设备，NULL 记在 nulls 位掩码中）
+  - catalog    推荐用的 SupplierCatalog（仅 name 非空的行，首次使用时构建）
+  - responses  /machines/suppliers 的响应行（首次使用时构建）
+  - distinct   各列去重排序后的取值，供 /machines/options 的下拉选项（首次使用时构建）
+配置 CATALOG_SNAPSHOT_DIR 后，快照另写为该目录下的 supplier_catalog_v<版本>.npy，
+多个 uvicorn 工作进程以只读 mmap 方式共用，只有第一个发现新版本的进程查询数据库。
+"""
+import glob
+import os
+import re
+import tempfile
+import threading
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import CatalogVersion, MachineSupplier
+from app.services.supplier_catalog import SupplierCatalog
+
+settings = get_settings()
+
+# (列名, 类型)；str 列宽度按当前数据最长值确定
+COLUMNS = (
+    ("id", "i8"), ("user_id", "i8"), ("name", str), ("no", "i8"), ("model", str),
+    ("ori_power", "f8"), ("air", "f8"), ("brand", str), ("is_FC", "i8"), ("origin_pre", "f8"),
+    ("energy_con", "f8"), ("energy_con_min", "f8"), ("collect_time", "M8[D]"), ("timestamp", "M8[us]"),
+)
+_EMPTY = {str: "", "i8": 0, "f8": np.nan, "M8[D]": np.datetime64("NaT"), "M8[us]": np.datetime64("NaT")}
+# DECIMAL 列按库表精度输出（与 ORM 读出的 Decimal 一致）
+_DECIMAL_SCALE = {
+    name: Decimal(1).scaleb(-MachineSupplier.__table__.c[name].type.scale)
+    for name, kind in COLUMNS if kind == "f8"
+}
+
+_current = None
+_build_lock = threading.Lock()
+
+
+def catalog_version(db: Session) -> int:
+    return db.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+
+def _build_records(db: Session) -> np.ndarray:
+    table = MachineSupplier.__table__
+    rows = db.execute(select(*(table.c[name] for name, _ in COLUMNS)).order_by(table.c.id)).all()
+    widths = {
+        k: max([len(r[k] or "") for r in rows] + [1])
+        for k, (_, kind) in enumerate(COLUMNS) if kind is str
+    }
+    dtype = np.dtype(
+        [(name, f"U{widths[k]}" if kind is str else kind) for k, (name, kind) in enumerate(COLUMNS)]
+        + [("nulls", "u2")]
+    )
+    records = np.zeros(len(rows), dtype=dtype)
+    for i, row in enumerate(rows):
+        nulls, values = 0, []
+        for k, (_, kind) in enumerate(COLUMNS):
+            v = row[k]
+            if v is None:
+                nulls |= 1 << k
+                v = _EMPTY[kind]
+            elif kind == "f8":
+                v = float(v)
+            values.append(v)
+        records[i] = (*values, nulls)
+    return records
+
+
+class CatalogSnapshot:
+    """某一版本的供应商目录（只读）。records 可能是 mmap，派生结构按需构建一次。"""
+
+    def __init__(self, version: int, records: np.ndarray):
+        self.version = version
+        self.records = records
+        self._catalog = None
+        self._responses = None
+        self._distinct: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def is_null(self, name: str) -> np.ndarray:
+        k = next(k for k, (col, _) in enumerate(COLUMNS) if col == name)
+        return (self.records["nulls"] & (1 << k)) != 0
+
+    def column(self, name: str) -> list:
+        """整列取值（Python 对象），NULL 为 None。"""
+        values = self.records[name].tolist()
+        return [None if null else v for v, null in zip(values, self.is_null(name).tolist())]
+
+    @property
+    def catalog(self) -> SupplierCatalog:
+        """推荐用目录索引：name 非空的供应商设备，顺序与按 id 查询一致。"""
+        if self._catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    named = ~self.is_null("name")
+                    cols = {name: self.column(name) for name in (
+                        "brand", "model", "ori_power", "air", "is_FC", "origin_pre", "energy_con", "energy_con_min",
+                    )}
+                    self._catalog = SupplierCatalog([
+                        SimpleNamespace(**{name: values[i] for name, values in cols.items()})
+                        for i in np.flatnonzero(named).tolist()
+                    ], version=self.version)
+        return self._catalog
+
+    def distinct(self, name: str) -> list:
+        """某列去重后升序排列的非空取值（字符串列另去掉空串）。"""
+        values = self._distinct.get(name)
+        if values is None:
+            col = self.records[name][~self.is_null(name)]
+            values = np.unique(col).tolist()
+            if col.dtype.kind == "U":
+                values = [v for v in values if v]
+            self._distinct[name] = values
+        return values
+
+    def responses(self) -> list[dict]:
+        """与 MachineSupplierResponse 字段一致的行（DECIMAL 列按库表精度还原为 Decimal）。"""
+        if self._responses is None:
+            with self._lock:
+                if self._responses is None:
+                    cols = {}
+                    for name, kind in COLUMNS:
+                        values = self.column(name)
+                        if kind == "f8":
+                            q = _DECIMAL_SCALE[name]
+                            values = [None if v is None else Decimal(repr(v)).quantize(q) for v in values]
+                        cols[name] = values
+                    self._responses = [
+                        {name: cols[name][i] for name, _ in COLUMNS} for i in range(len(self.records))
+                    ]
+        return self._responses
+
+
+def _shared_path(version: int) -> str:
+    return os.path.join(settings.CATALOG_SNAPSHOT_DIR, f"supplier_catalog_v{version}.npy")
+
+
+def _write_shared(version: int, records: np.ndarray) -> None:
+    """写临时文件后原子改名，其他进程不会读到写了一半的快照；版本号更小的旧文件顺带删除。"""
+    os.makedirs(settings.CATALOG_SNAPSHOT_DIR, exist_ok=True)
+    path = _shared_path(version)
+    fd, tmp_path = tempfile.mkstemp(prefix=".supplier_catalog_", suffix=".npy.tmp", dir=settings.CATALOG_SNAPSHOT_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, records)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    for stale in glob.glob(os.path.join(settings.CATALOG_SNAPSHOT_DIR, "supplier_catalog_v*.npy")):
+        # 只删更旧的版本：落后的进程晚写旧版本时，不能删掉其他进程已写好的新版本
+        m = re.fullmatch(r"supplier_catalog_v(\d+)\.npy", os.path.basename(stale))
+        if m and int(m.group(1)) < version:
+            try:
+                os.remove(stale)  # 其他进程已 mmap 的旧文件在其关闭前仍可读
+            except OSError:
+                pass
+
+
+def _load_or_build(db: Session, version: int) -> CatalogSnapshot:
+    if settings.CATALOG_SNAPSHOT_DIR:
+        path = _shared_path(version)
+        if os.path.isfile(path):
+            try:
+                records = np.load(path, mmap_mode="r")
+                print(f"[AirComp] 供应商目录快照 v{version}：{len(records)} 条（共享文件）", flush=True)
+                return CatalogSnapshot(version, records)
+            except (OSError, ValueError):
+                pass
+    records = _build_records(db)
+    if settings.CATALOG_SNAPSHOT_DIR:
+        _write_shared(version, records)
+    print(f"[AirComp] 供应商目录快照 v{version}：{len(records)} 条（数据库）", flush=True)
+    return CatalogSnapshot(version, records)
+
+
+def get_snapshot(db: Session) -> CatalogSnapshot:
+    """当前版本的目录快照；版本变化（供应商被增删改）后首次调用时重建。"""
+    global _current
+    version = catalog_version(db)
+    snapshot = _current
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _build_lock:
+        snapshot = _current
+        if snapshot is None or snapshot.version != version:
+            snapshot = _load_or_build(db, version)
+            _current = snapshot
+    return snapshot
+
+
+def get_supplier_catalog(db: Session) -> SupplierCatalog:
+    """推荐用的供应商目录索引（跨请求复用）。"""
+    return get_snapshot(db).catalog
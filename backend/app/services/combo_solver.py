@@ -0,0 +1,194 @@
+"""最优机型组合求解：在台数上限内选若干台（可同型多台）供应商机，使总气量 >= 组合上限
+
+两种目标（供 recommend_suppliers_multi 的 optimal / optimal_energy 策略使用）：
+  overage  过盈（总气量 - 组合上限）最小；同过盈取台数少者，再取比功率低的机型。
+           气量为 DECIMAL(20,2)，按 0.01 m³/min 化为整数后做按台数分层的可达和 DP（每层一次 FFT 卷积），结果精确。
+  energy   满负荷输入功率 Σ台数×气量×比功率 最小（兼顾过盈与能效）。
+           先剔除被支配机型（有另一机型气量不小且输入功率不大），再分支定界：
+           按气量从大到小逐台加机，剩余台数全用最大机型仍不够即剪枝；下界 = 已选功率 + 覆盖剩余需求气量的最小功率，
+           后者由不限台数的覆盖 DP 预先算好（机型气量向上取整到网格，需求过大时网格放粗，始终不高于真实值），
+           与剩余机型最低比功率的下界相比强得多，数千机型、数十台的规模通常在几万节点内即证明最优。
+           展开节点超过 MAX_SEARCH_NODES 仍会停止并返回已找到的最好组合，此时 solve_combination 标记为截断（近似最优）。
+"""
+import math
+
+import numpy as np
+
+AIR_SCALE = 100  # 气量精度 0.01 m³/min
+MAX_SOLVER_UNITS = 64
+MAX_SEARCH_NODES = 500_000  # energy 目标分支定界的节点上限，超过即截断
+MAX_BOUND_CELLS = 1 << 19  # 覆盖下界表的最大格数
+MAX_BOUND_BLOCKS = 1 << 15  # 覆盖下界表按最小机型气量分块递推的最大块数
+SOLVER_OBJECTIVES = ("overage", "energy")
+
+
+def _unit(row: dict) -> dict:
+    return {k: v for k, v in row.items() if not k.startswith("_")}
+
+
+def _merge(rows: list[dict]) -> list[tuple[dict, int]]:
+    """逐台列表 -> [(机型, 台数)]，按首次出现顺序合并同型号。"""
+    merged: dict[tuple, list] = {}
+    for r in rows:
+        key = (r.get("brand"), r.get("model"))
+        if key in merged:
+            merged[key][1] += 1
+        else:
+            merged[key] = [_unit(r), 1]
+    return [(u, cnt) for u, cnt in merged.values()]
+
+
+def _min_overage(candidates: list[dict], q_target: float, max_units: int) -> list[dict] | None:
+    # 同气量只保留比功率最低（再按目录顺序）的机型
+    best_by_air: dict[int, dict] = {}
+    for r in candidates:
+        a = int(round((r.get("_air") or 0) * AIR_SCALE))
+        if a <= 0:
+            continue
+        cur = best_by_air.get(a)
+        if cur is None or (r["energy_con"], r["_idx"]) < (cur["energy_con"], cur["_idx"]):
+            best_by_air[a] = r
+    if not best_by_air:
+        return None
+    target = max(1, math.ceil(q_target * AIR_SCALE - 1e-6))
+    airs = np.array(sorted(best_by_air), dtype=np.int64)
+    max_air = int(airs[-1])
+    if max_air * max_units < target:
+        return None
+
+    size = target + max_air
+    nfft = 1 << (size - 1).bit_length()
+    kernel = np.zeros(max_air + 1)
+    kernel[airs] = 1.0
+    kernel_f = np.fft.rfft(kernel, nfft)
+    layers = [np.zeros(size, dtype=bool)]
+    layers[0][0] = True
+    best_sum, best_k = None, None
+    for k in range(1, max_units + 1):
+        frontier = layers[-1][:target]
+        if not frontier.any():
+            break
+        conv = np.fft.irfft(np.fft.rfft(frontier.astype(np.float64), nfft) * kernel_f, nfft)[:size]
+        reach = conv > 0.5
+        layers.append(reach)
+        hits = np.flatnonzero(reach[target:])
+        if hits.size and (best_sum is None or target + hits[0] < best_sum):
+            best_sum, best_k = target + int(hits[0]), k
+            if best_sum == target:
+                break
+    if best_sum is None:
+        return None
+
+    # 回溯：每一步在可行的机型中取比功率最低者
+    rows, s = [], best_sum
+    for k in range(best_k, 0, -1):
+        prev = layers[k - 1]
+        options = [
+            best_by_air[int(a)] for a in airs
+            if a <= s and s - a < target and prev[s - a]
+        ]
+        r = min(options, key=lambda x: (x["energy_con"], x["_idx"]))
+        rows.append(r)
+        s -= int(round(r["_air"] * AIR_SCALE))
+    return rows
+
+
+def _cover_bound(airs: list[int], powers: list[float], need: int) -> tuple[np.ndarray, int]:
+    """lb[g] = 台数不限时总气量覆盖 g 格的最小功率，格宽 grid（单位 0.01 m³/min）。
+    机型气量向上取整到格，需求 n 查 lb[ceil(n / grid)]，结果不高于真实的最小功率，可作分支定界的下界。"""
+    grid = max(1, math.ceil(need / MAX_BOUND_CELLS))
+    if min(airs) * MAX_BOUND_BLOCKS < need:
+        grid = max(grid, math.ceil(need / MAX_BOUND_BLOCKS))
+    a = np.array([-(-x // grid) for x in airs], dtype=np.int64)
+    p = np.array(powers)
+    cells = -(-need // grid) + 1
+    lb = np.zeros(cells)
+    step = int(a.min())
+    # 每块内各格只依赖块之前的格（a >= step），整块对全部机型一次向量化取最小
+    for start in range(1, cells, step):
+        g = np.arange(start, min(start + step, cells))
+        lb[g] = (lb[np.maximum(g[None, :] - a[:, None], 0)] + p[:, None]).min(axis=0)
+    return lb, grid
+
+
+def _min_power(candidates: list[dict], q_target: float, max_units: int) -> tuple[list[dict] | None, bool]:
+    """返回 (逐台机型, 是否因节点上限截断)。"""
+    models = [r for r in candidates if (r.get("_air") or 0) > 0]
+    # 按气量降序（同气量输入功率低者在前），只保留输入功率严格低于所有更大机型的（非支配）机型
+    models.sort(key=lambda r: (-r["_air"], r["_air"] * r["energy_con"], r["_idx"]))
+    front = []
+    for r in models:
+        if not front or r["_air"] * r["energy_con"] < front[-1]["_air"] * front[-1]["energy_con"]:
+            front.append(r)
+    need = max(1, math.ceil(q_target * AIR_SCALE - 1e-6))
+    airs = [int(round(r["_air"] * AIR_SCALE)) for r in front]
+    if not front or airs[0] * max_units < need:
+        return None, False
+    powers = [r["_air"] * r["energy_con"] for r in front]
+    m = len(front)
+    lb, grid = _cover_bound(airs, powers, need)
+    lb = lb.tolist()
+
+    # 初始上界：单一机型凑满
+    best = [math.inf, math.inf, math.inf]  # (输入功率, 过盈, 台数)
+    best_rows: list[int] = []
+    for j in range(m):
+        cnt = -(-need // airs[j])
+        if cnt <= max_units:
+            key = [powers[j] * cnt, cnt * airs[j] - need, cnt]
+            if key < best:
+                best, best_rows = key, [j] * cnt
+
+    chosen: list[int] = []
+    nodes = 0
+    truncated = False
+
+    def dfs(i: int, rest: int, power: float, left: int) -> None:
+        nonlocal best, best_rows, nodes, truncated
+        for j in range(i, m):
+            a = airs[j]
+            if a * left < rest:
+                break  # 后面机型更小，剩余台数凑不够
+            p = power + powers[j]
+            after = rest - a
+            if p + (lb[-(-after // grid)] if after > 0 else 0.0) >= best[0] - 1e-9:
+                continue  # 下界不优于当前最好
+            nodes += 1
+            if nodes > MAX_SEARCH_NODES:
+                truncated = True
+                return
+            chosen.append(j)
+            if after <= 0:
+                key = [p, -after, len(chosen)]
+                if key < best:
+                    best, best_rows = key, list(chosen)
+            elif left > 1:
+                dfs(j, after, p, left - 1)
+            chosen.pop()
+            if truncated:
+                return
+
+    dfs(0, need, 0.0, max_units)
+    if not best_rows:
+        return None, truncated
+    return [front[j] for j in best_rows], truncated
+
+
+def solve_combination(
+    candidates: list[dict],
+    q_target: float,
+    max_units: int,
+    objective: str = "overage",
+) -> tuple[list[tuple[dict, int]] | None, bool]:
+    """candidates 为已按压力筛选的候选（含 _air、_idx），返回 ([(机型, 台数)], 是否截断)；
+    台数上限内无法满足组合上限时方案为 None。截断仅 energy 目标可能出现，此时方案不保证最优。"""
+    if objective not in SOLVER_OBJECTIVES:
+        raise ValueError(f"不支持的求解目标：{objective}")
+    max_units = max(1, min(int(max_units), MAX_SOLVER_UNITS))
+    if q_target <= 0:
+        return None, False
+    if objective == "overage":
+        rows, truncated = _min_overage(candidates, q_target, max_units), False
+    else:
+        rows, truncated = _min_power(candidates, q_target, max_units)
+    return (_merge(rows) if rows else None), truncated
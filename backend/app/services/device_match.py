@@ -10,17 +10,39 @@
 
 显示规则：若方案二总流量 > 方案一总流量则只显示方案一；若相等则都显示；否则都显示。
 共同约束：供应商额定压力 >= 客户实际压力。
+
+strategy="optimal" / "optimal_energy" 时另用 combo_solver 精确求解（过盈最小 / 满负荷输入功率最小），
+其结果作为主方案排在最前，上述两种方案仍一并列出供对比。
+
+top_k 设置时改为多目标模式（scheme_pareto）：在过盈、加权比功率、台数、年耗电四个目标上
+返回至多 top_k 个互不支配的方案（上述方案也参与比较），不再按显示规则舍弃方案二。
 """
 from __future__ import annotations
 
+import copy
 import math
 
+from app.core.config import get_settings
+from app.services.cache import TTLCache
+from app.services.combo_solver import solve_combination
+from app.services.scheme_pareto import pareto_schemes
+from app.services.supplier_catalog import CatalogView, SupplierCatalog
+
 # 品牌默认加载率（变频时用），与 cal_func 一致
 POR_DICT = {"阿特拉斯": 0.98, "凯撒": 0.98, "英格索兰": 0.98, "复盛": 0.9}
 DEFAULT_POR = 0.98
 
 MAX_RECOMMEND_UNITS = 6
 
+settings = get_settings()
+_recommend_cache = TTLCache(maxsize=settings.RECOMMEND_CACHE_SIZE, ttl=settings.RECOMMEND_CACHE_TTL_SECONDS)
+
+# 推荐策略 -> (combo_solver 目标, 方案名)
+SOLVER_STRATEGIES = {
+    "optimal": ("overage", "最优组合（过盈最小）"),
+    "optimal_energy": ("energy", "最优组合（输入功率最小）"),
+}
+
 
 def _por(brand: str) -> float:
     return POR_DICT.get(brand, DEFAULT_POR)
@@ -52,28 +74,16 @@ def demand_q(client_list: list[dict], use_caliber_a: bool = True) -> float:
     return round(total, 4)
 
 
+def client_pressure(c: dict) -> float:
+    """单台客户机的需求压力 (MPa)：实际运行压力，缺省时取额定压力，再缺省按 0.8。"""
+    return float(c.get("actual_pre") or c.get("actucal_pre") or c.get("origin_pre") or 0.8)
+
+
 def demand_p(client_list: list[dict]) -> float:
     """需求压力 P_demand (MPa)：取参与计算的客户机中实际运行压力的最大值。"""
     if not client_list:
         return 0.0
-    vals = []
-    for c in client_list:
-        v = c.get("actual_pre") or c.get("actucal_pre") or c.get("origin_pre") or 0.8
-        vals.append(float(v))
-    return round(max(vals), 4)
-
-
-def _supplier_to_dict(supplier) -> dict:
-    """将 ORM MachineSupplier 转为 cal_func 所需的 new_eq 项格式。"""
-    return {
-        "brand": supplier.brand,
-        "model": supplier.model,
-        "ori_power": int(supplier.ori_power),
-        "air": float(supplier.air),
-        "isFC": bool(supplier.is_FC),
-        "energy_con": float(supplier.energy_con),
-        "energy_con_min": float(supplier.energy_con_min),
-    }
+    return round(max(client_pressure(c) for c in client_list), 4)
 
 
 def _scheme_signature(scheme_list: list[tuple[dict, int]]) -> tuple:
@@ -81,6 +91,11 @@ def _scheme_signature(scheme_list: list[tuple[dict, int]]) -> tuple:
     return tuple((s.get("brand"), s.get("model"), cnt) for s, cnt in sorted(scheme_list, key=lambda x: (x[0].get("brand") or "", x[0].get("model") or "", -x[1])))
 
 
+def _scheme_power(scheme_list: list[tuple[dict, int]]) -> float:
+    """方案满负荷输入功率 Σ台数×气量×比功率（kW）。"""
+    return sum(cnt * float(s.get("air") or 0) * float(s.get("energy_con") or 0) for s, cnt in scheme_list)
+
+
 def _greedy_one_scheme(
     candidates: list[dict],
     q_target: float,
@@ -123,7 +138,7 @@ def _greedy_match_flow(
 
 def _scheme_flow_match(
     client_list: list[dict],
-    candidates: list[dict],
+    view: CatalogView,
     q_target: float,
     n: int,
 ) -> list[tuple[dict, int]] | None:
@@ -131,14 +146,10 @@ def _scheme_flow_match(
     方案一：找与客户设备额定流量接近的供应商设备，总气量 ≥ 组合上限，越接近越好。
     对每个客户（按额定流量），选供应商里单台气量最接近的机型，凑满 n 台且总气量 >= q_target。
     """
-    if n == 0 or not candidates:
+    if n == 0 or not view:
         return None
     # 客户额定流量列表（用于“接近”匹配）
     client_airs = [float(c.get("air") or 0) for c in client_list]
-    # 供应商按单台气量排序，便于找最接近
-    sorted_c = sorted(candidates, key=lambda x: (x.get("_air") or 0, x.get("energy_con", 0)))
-    def closest_supplier(to_air: float) -> dict:
-        return min(sorted_c, key=lambda c: (abs((c.get("_air") or 0) - to_air), c.get("energy_con", 0)))
 
     # 为尽量总气量接近 q_target：前 n-1 个按客户流量选最接近的供应商，最后 1 个选使总气量 >= q_target 且尽量小的
     slot_order = sorted(range(n), key=lambda i: -(client_airs[i] if i < len(client_airs) else 0))
@@ -148,23 +159,13 @@ def _scheme_flow_match(
         i = slot_order[idx]
         want_air = client_airs[i] if i < len(client_airs) else (q_target / n)
         if idx < n - 1:
-            c = closest_supplier(want_air)
+            c = view.closest(want_air)
             chosen[i] = c
             total += c.get("_air") or 0
         else:
             need = max(0, q_target - total)
-            # 选单台气量 >= need 且最接近 need 的（使总气量尽量接近 q_target）
-            best = None
-            best_diff = 1e9
-            for c in sorted_c:
-                air = c.get("_air") or 0
-                if air >= need:
-                    diff = (total + air) - q_target
-                    if diff < best_diff:
-                        best_diff = diff
-                        best = c
-            if best is None:
-                best = max(sorted_c, key=lambda x: x.get("_air") or 0)
+            # 选单台气量 >= need 且最接近 need 的（使总气量尽量接近 q_target）；都不足时取气量最大者
+            best = view.at_least(need)
             chosen[i] = best
             total += best.get("_air") or 0
     if total < q_target:
@@ -184,18 +185,17 @@ def _scheme_flow_match(
 
 
 def _scheme_by_avg_flow(
-    candidates: list[dict],
+    view: CatalogView,
     q_target: float,
     n: int,
 ) -> list[tuple[dict, int]] | None:
     """
     方案二：单台目标流量 = 组合上限 / 原有设备数量，在供应商里找单台气量最接近的机型，用 n 台，计算总流量。
     """
-    if n == 0 or not candidates:
+    if n == 0 or not view:
         return None
     flow_per_unit = q_target / n
-    best = min(candidates, key=lambda c: (abs((c.get("_air") or 0) - flow_per_unit), c.get("energy_con", 0)))
-    air = best.get("_air") or 0
+    best = view.closest(flow_per_unit, tiebreak="index")
     unit = {k: v for k, v in best.items() if not k.startswith("_")}
     return [(unit, n)]
 
@@ -316,19 +316,38 @@ def _greedy_balanced(
     return selected
 
 
+def expand_scheme(scheme: list[tuple[dict, int]], n: int) -> list[dict]:
+    """方案 [(机型, 台数)] 展开为与 n 台原有设备一一对应的选型列表：台数不足时重复最后一台，超出时截断。"""
+    flat = []
+    for u, cnt in scheme:
+        for _ in range(cnt):
+            flat.append(u.copy())
+    while len(flat) < n and flat:
+        flat.append(flat[-1].copy())
+    return flat[:n]
+
+
 def recommend_suppliers_multi(
     client_list: list[dict],
-    supplier_objs: list,
+    supplier_objs: list | SupplierCatalog,
     margin_ratio: float = 1.1,
     max_units: int = MAX_RECOMMEND_UNITS,
     use_caliber_a: bool = True,
+    strategy: str | None = None,
+    top_k: int | None = None,
+    running_hours_per_year: int | None = None,
 ) -> tuple[list[dict], list[tuple[dict, int]], list[dict], str]:
     """
     推荐逻辑：1) 压力 >= 客户实际压力；2) 用供应商设备气量匹配需求，给出多种组合。
 
     :param client_list: 客户机列表，仅用于汇总需求气量 q_demand、需求压力 p_demand
-    :param supplier_objs: 供应商设备（MachineSupplier）列表，其 .air（气量）、.origin_pre（压力）等用于筛选与组合
+    :param supplier_objs: 供应商设备（MachineSupplier）列表，其 .air（气量）、.origin_pre（压力）等用于筛选与组合；
+        也可直接传入已建好的 SupplierCatalog，多次推荐共用同一索引
     :param use_caliber_a: True=按实际用气量（口径 A）作为组合上限，False=按额定用气量（口径 B）作为组合上限
+    :param strategy: "optimal" / "optimal_energy" 时精确求解的组合作为主方案（见 SOLVER_STRATEGIES），其他值仅用启发式方案
+    :param top_k: 设置时返回至多 top_k 个 Pareto 最优方案（按过盈升序，第一个为主方案），schemes_all 各项另含 metrics
+    :param running_hours_per_year: 多目标模式下计算年耗电的年运行时间，默认与报告一致
+    目录带版本号（来自 catalog_snapshot）时，结果按 recommend_signature 缓存，目录变更后自然失效。
     :return: (new_eq_primary, scheme_primary, schemes_all, summary)
         - new_eq_primary: 主方案展开为与 client_list 等长的列表，供 Excel 使用
         - scheme_primary: 主方案 [(supplier_dict, count), ...]
@@ -341,6 +360,63 @@ def recommend_suppliers_multi(
 
     # 推荐台数不超过用户原有客户机数量
     max_units = min(max_units, n)
+    catalog = supplier_objs if isinstance(supplier_objs, SupplierCatalog) else SupplierCatalog(supplier_objs)
+    args = (margin_ratio, max_units, use_caliber_a, strategy, top_k, running_hours_per_year)
+    if catalog.version is None:
+        return _recommend(client_list, catalog, *args)
+
+    # 目录带版本号时按需求签名缓存；返回副本，调用方可以放心修改
+    key = recommend_signature(client_list, catalog.version, *args)
+    result = _recommend_cache.get(key)
+    if result is None:
+        result = _recommend(client_list, catalog, *args)
+        _recommend_cache.set(key, result)
+    return copy.deepcopy(result)
+
+
+def recommend_signature(
+    client_list: list[dict],
+    catalog_version: int,
+    margin_ratio: float,
+    max_units: int,
+    use_caliber_a: bool,
+    strategy: str | None,
+    top_k: int | None,
+    running_hours_per_year: int | None,
+) -> tuple:
+    """推荐结果只取决于需求气量、需求压力、台数（上限）、各台额定气量与功率及供应商目录，
+    签名即由这些量与目录版本组成；年运行时间只在多目标模式下参与计算。"""
+    return (
+        catalog_version,
+        demand_q(client_list, use_caliber_a=use_caliber_a),
+        demand_p(client_list),
+        len(client_list),
+        max_units,
+        bool(use_caliber_a),
+        float(margin_ratio),
+        strategy if strategy in SOLVER_STRATEGIES else None,
+        top_k or None,
+        running_hours_per_year if top_k else None,
+        tuple(float(c.get("air") or 0) for c in client_list),
+        tuple(c.get("ori_power") for c in client_list),
+    )
+
+
+def recommend_cache_stats() -> dict:
+    return _recommend_cache.stats()
+
+
+def _recommend(
+    client_list: list[dict],
+    catalog: SupplierCatalog,
+    margin_ratio: float,
+    max_units: int,
+    use_caliber_a: bool,
+    strategy: str | None,
+    top_k: int | None,
+    running_hours_per_year: int | None,
+) -> tuple[list[dict], list[tuple[dict, int]], list[dict], str]:
+    n = len(client_list)
 
     # 需求侧：用户选择的实际/额定用气量即为组合上限，不再乘余量
     q_demand = demand_q(client_list, use_caliber_a=use_caliber_a)
@@ -348,70 +424,71 @@ def recommend_suppliers_multi(
     q_target = q_demand
 
     # 供应侧：候选机型的气量、压力等均来自供应商设备表（MachineSupplier）
-    # 1) 首先过滤：供应商额定压力 >= 客户实际压力
-    candidates = []
-    for s in supplier_objs:
-        origin_pre = float(s.origin_pre or 0)
-        if origin_pre >= p_demand:
-            d = _supplier_to_dict(s)
-            d["_origin_pre"] = origin_pre
-            d["_air"] = float(s.air or 0)  # 供应商设备气量 (m³/min)，用于匹配是否满足 q_target
-            candidates.append(d)
+    # 1) 首先过滤：供应商额定压力 >= 客户实际压力（目录按压力排序，bisect 取后缀）
+    view = catalog.view(p_demand)
 
-    if not candidates:
+    if not view:
         return [], [], [], f"无满足压力要求（>={p_demand} MPa）的供应商机型"
 
     # 2) 方案一：按额定流量匹配；方案二：按单台目标流量。显示规则：方案二总流量>方案一则只显示方案一，否则都显示。
     schemes_with_names: list[tuple[str, list[tuple[dict, int]]]] = []
 
-    def _total_air(scheme):
-        total = 0.0
-        for u, cnt in scheme:
-            for c in candidates:
-                if c.get("brand") == u.get("brand") and c.get("model") == u.get("model"):
-                    total += (c.get("_air") or 0) * cnt
-                    break
-        return total
+    _total_air = view.total_air
 
     # 方案一：与客户额定流量接近的供应商组合，总气量 ≥ 组合上限，越接近越好
-    scheme1 = _scheme_flow_match(client_list, candidates, q_target, n)
+    scheme1 = _scheme_flow_match(client_list, view, q_target, n)
     total1 = _total_air(scheme1) if scheme1 else 1e9
 
     # 方案二：单台目标流量 = 组合上限/n，找最接近的机型 n 台
-    scheme2 = _scheme_by_avg_flow(candidates, q_target, n)
+    scheme2 = _scheme_by_avg_flow(view, q_target, n)
     total2 = _total_air(scheme2) if scheme2 else 0.0
 
     if scheme1 and total1 >= q_target:
         schemes_with_names.append(("按额定流量匹配", scheme1))
     if scheme2 and total2 >= q_target:
-        if total2 > total1:
+        if total2 > total1 and not top_k:
             pass  # 只显示方案一，不加入方案二
         else:
             schemes_with_names.append(("按单台目标流量", scheme2))
 
+    # 按方案总气量升序排列，最靠近组合上限的排前面，方便用户自选
+    schemes_with_names.sort(key=lambda x: _total_air(x[1]))
+
+    # 精确求解的组合排最前作为主方案，与之相同的启发式方案不再重复列出
+    truncated = False
+    if strategy in SOLVER_STRATEGIES:
+        objective, solver_name = SOLVER_STRATEGIES[strategy]
+        solved, truncated = solve_combination(view.candidates, q_target, max_units, objective=objective)
+        if solved:
+            sig = _scheme_signature(solved)
+            others = [x for x in schemes_with_names if _scheme_signature(x[1]) != sig]
+            if not truncated:
+                schemes_with_names = [(solver_name, solved)] + others
+            else:
+                # 搜索被截断：不保证最优，仅当输入功率低于全部启发式方案时才作主方案
+                solver_name = solver_name.replace("最优", "近似最优")
+                if all(_scheme_power(solved) < _scheme_power(x[1]) for x in others):
+                    schemes_with_names = [(solver_name, solved)] + others
+                else:
+                    schemes_with_names = others + [(solver_name, solved)]
+
+    metrics_by_name: dict[str, dict] = {}
+    if top_k:
+        ranked = pareto_schemes(
+            view, q_target, max_units, top_k,
+            seeds=schemes_with_names,
+            running_hours_per_year=running_hours_per_year,
+        )
+        schemes_with_names = [(name, scheme) for name, scheme, _ in ranked]
+        metrics_by_name = {name: metrics for name, _, metrics in ranked}
+
     if not schemes_with_names:
         return [], [], [], "无法生成满足气量要求的组合"
 
-    # 按方案总气量升序排列，最靠近组合上限的排前面，方便用户自选
-    schemes_with_names.sort(key=lambda x: _total_air(x[1]))
     scheme_primary = schemes_with_names[0][1]
-    flat = []
-    for u, cnt in scheme_primary:
-        for _ in range(cnt):
-            flat.append(u.copy())
-    while len(flat) < n and flat:
-        flat.append(flat[-1].copy())
-    flat = flat[:n]
-
-    def _scheme_total_air(scheme):
-        """从 candidates 按 brand+model 查单台气量，计算方案总气量。"""
-        total = 0.0
-        for u, cnt in scheme:
-            for c in candidates:
-                if c.get("brand") == u.get("brand") and c.get("model") == u.get("model"):
-                    total += (c.get("_air") or 0) * cnt
-                    break
-        return total
+    flat = expand_scheme(scheme_primary, n)
+
+    _scheme_total_air = view.total_air
 
     schemes_all = []
     for name, scheme in schemes_with_names:
@@ -419,6 +496,7 @@ def recommend_suppliers_multi(
             "name": name,
             "scheme": [{"brand": s.get("brand"), "model": s.get("model"), "count": cnt} for s, cnt in scheme],
             "total_air": round(_scheme_total_air(scheme), 2),
+            **({"metrics": metrics_by_name[name]} if name in metrics_by_name else {}),
         })
     # 摘要中展示目标气量与各方案总气量，便于核对结论依据
     def _scheme_summary(scheme):
@@ -428,6 +506,8 @@ def recommend_suppliers_multi(
 
     summary = f"需求气量（组合上限）{q_demand} m³/min，需求压力 {p_demand} MPa。推荐方案："
     summary += "；".join(f"{name}：{_scheme_summary(scheme)}" for name, scheme in schemes_with_names)
+    if truncated:
+        summary += "。机型与台数组合过多，输入功率最小组合的搜索已在上限处停止，结果为近似最优"
     return flat, scheme_primary, schemes_all, summary
 
 
@@ -0,0 +1,222 @@
+"""逐时负载曲线 + 分时电价：按 8760 小时计算年节电与节约电费
+
+负载曲线为每小时的负载系数（0 ~ 1，即该小时按实际产气量 act_air 运行的比例），
+可按单台设备（机器编号）或全厂上传，以 float32 存储（每条 8760×4 字节）。
+单台设备年节电 = 小时节电 × Σ负载系数，节约电费 = 小时节电 × Σ(负载系数 × 当小时电价)；
+整批设备组成 (设备, 8760) 数组与电价向量一次矩阵乘得出。曲线全为 1、共 8000 小时时与按年运行时间计算的结果一致。
+
+分时电价写法：
+  {"prices": {"峰": 1.2, "平": 0.75, "谷": 0.35}, "schedule": [24 个时段名], "weekend_schedule": [24 个时段名],
+   "year_start_weekday": 0}   # weekend_schedule 可省略；year_start_weekday 为 1 月 1 日星期几（0=周一）
+  或 {"hourly_prices": [8760 个电价]}
+"""
+import io
+
+import numpy as np
+
+from app.services.cal_batch import (
+    FleetSavings,
+    FleetValidationError,
+    compute_fleet,
+    compute_savings,
+    fleet_columns,
+    pyround,
+    validate_fleet,
+)
+from app.services.cal_func import YEAR_RUNNING_TIME
+
+HOURS_PER_YEAR = 8760
+PROFILE_DTYPE = np.dtype("<f4")
+PLANT_LABELS = ("全厂", "plant", "all")  # 上传表格中表示全厂曲线的列名
+
+
+def parse_profile(values) -> np.ndarray:
+    """校验并转为 float32 的 8760 逐时负载系数。"""
+    arr = np.asarray(values, dtype=np.float64).ravel()
+    if arr.size != HOURS_PER_YEAR:
+        raise ValueError(f"负载曲线须为 {HOURS_PER_YEAR} 个逐时值（当前 {arr.size} 个）")
+    if not np.isfinite(arr).all() or arr.min() < 0 or arr.max() > 1:
+        raise ValueError("负载曲线取值须在 0 ~ 1 之间")
+    return arr.astype(PROFILE_DTYPE)
+
+
+def profile_to_bytes(profile: np.ndarray) -> bytes:
+    return np.ascontiguousarray(profile, dtype=PROFILE_DTYPE).tobytes()
+
+
+def profile_from_bytes(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=PROFILE_DTYPE)
+
+
+def read_profile_table(content: bytes, filename: str) -> dict[int | None, np.ndarray]:
+    """读取上传的 xlsx/csv：每列一条曲线，列名为机器编号或「全厂」，共 8760 行；其他列（如时间）忽略。
+
+    返回 {机器编号 或 None(全厂): float32 曲线}。
+    """
+    import pandas as pd
+
+    buf = io.BytesIO(content)
+    if filename.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(buf)
+    else:
+        df = pd.read_csv(buf)
+    profiles: dict[int | None, np.ndarray] = {}
+    for col in df.columns:
+        name = str(col).strip()
+        if name.lower() in PLANT_LABELS:
+            key = None
+        else:
+            try:
+                key = int(float(name))
+            except ValueError:
+                continue
+        try:
+            profiles[key] = parse_profile(df[col].to_numpy(dtype=np.float64))
+        except ValueError as e:
+            raise ValueError(f"列「{name}」：{e}")
+    if not profiles:
+        raise ValueError("未找到负载曲线列：列名须为机器编号或「全厂」")
+    return profiles
+
+
+def _machine_key(no) -> int | None:
+    try:
+        return int(no)
+    except (TypeError, ValueError):
+        return None
+
+
+def tariff_vector(tariff: dict) -> tuple[np.ndarray, np.ndarray | None, list[str]]:
+    """分时电价 -> (8760 逐时电价, 逐时时段序号或 None, 时段名列表)。"""
+    if tariff.get("hourly_prices") is not None:
+        prices = np.asarray(tariff["hourly_prices"], dtype=np.float64)
+        if prices.shape != (HOURS_PER_YEAR,) or not np.isfinite(prices).all() or prices.min() < 0:
+            raise ValueError(f"逐时电价须为 {HOURS_PER_YEAR} 个非负数")
+        return prices, None, []
+    period_prices = tariff.get("prices") or {}
+    schedule = tariff.get("schedule") or []
+    if not period_prices or len(schedule) != 24:
+        raise ValueError("分时电价须给出各时段电价 prices 及 24 小时时段表 schedule")
+    labels = list(period_prices)
+    if min(period_prices.values()) < 0:
+        raise ValueError("电价不能为负")
+    weekend = tariff.get("weekend_schedule") or schedule
+    if len(weekend) != 24:
+        raise ValueError("周末时段表 weekend_schedule 须为 24 小时")
+    unknown = sorted({*schedule, *weekend} - set(labels), key=str)
+    if unknown:
+        raise ValueError(f"时段表中的时段未定价：{'、'.join(map(str, unknown))}")
+    weekday_idx = np.array([labels.index(s) for s in schedule], dtype=np.int8)
+    weekend_idx = np.array([labels.index(s) for s in weekend], dtype=np.int8)
+    start = int(tariff.get("year_start_weekday") or 0) % 7
+    days = HOURS_PER_YEAR // 24
+    is_weekend = ((np.arange(days) + start) % 7) >= 5
+    period_idx = np.where(is_weekend[:, None], weekend_idx[None, :], weekday_idx[None, :]).ravel()
+    prices = np.asarray([period_prices[s] for s in labels], dtype=np.float64)[period_idx]
+    return prices, period_idx, labels
+
+
+def hourly_fleet_savings(
+    machines: list[dict],
+    new_eq: list[dict],
+    profiles: dict[int | None, np.ndarray],
+    tariff: dict,
+    running_hours_per_year: int | None = None,
+    calc_params: dict | None = None,
+) -> tuple[FleetSavings, dict]:
+    """逐时计算整批设备的年节电与节约电费。
+
+    每台设备优先用本机编号的曲线，其次全厂曲线；都没有时按年运行时间均匀分布（年节电与原口径一致）。
+    返回 (FleetSavings（年节电为逐时结果，可直接写入原有报告表）, 分时汇总)。
+    """
+    if running_hours_per_year is None:
+        running_hours_per_year = YEAR_RUNNING_TIME
+    n = len(machines)
+    if len(new_eq) < n:
+        raise FleetValidationError([f"选型设备数量（{len(new_eq)}）少于原有设备数量（{n}）"])
+    new_eq = new_eq[:n]
+    cols = fleet_columns(machines, calc_params)
+    new_ec = np.fromiter((float(e["energy_con"]) for e in new_eq), dtype=np.float64, count=n)
+    validate_fleet(cols, new_ec)
+    res = compute_fleet(cols)
+    sav = compute_savings(res["actual_energyE"], res["act_air"], new_ec, 1)
+    saving_per_hour = sav["saving_per_hour"]
+
+    prices, period_idx, labels = tariff_vector(tariff)
+    load = np.empty((n, HOURS_PER_YEAR), dtype=PROFILE_DTYPE)
+    load_hours = np.empty(n, dtype=np.float64)
+    sources = []
+    for i, no in enumerate(cols["no"].tolist()):
+        profile = profiles.get(_machine_key(no))
+        source = "machine"
+        if profile is None:
+            profile, source = profiles.get(None), "plant"
+        if profile is None:
+            load[i] = running_hours_per_year / HOURS_PER_YEAR
+            load_hours[i] = running_hours_per_year
+            source = "flat"
+        else:
+            load[i] = profile
+            load_hours[i] = profile.sum(dtype=np.float64)
+        sources.append(source)
+
+    saving_per_year = pyround(saving_per_hour * load_hours)
+    cost = pyround(saving_per_hour * np.matmul(load, prices, dtype=np.float64), 2)
+    period_kwh = None
+    if labels:
+        onehot = np.zeros((HOURS_PER_YEAR, len(labels)), dtype=PROFILE_DTYPE)
+        onehot[np.arange(HOURS_PER_YEAR), period_idx] = 1
+        period_kwh = pyround(saving_per_hour[:, None] * np.matmul(load, onehot, dtype=np.float64))
+
+    result = FleetSavings(
+        cols=cols,
+        res=res,
+        new_machine=new_eq,
+        saving_portion=sav["saving_portion"].tolist(),
+        saving_per_hour=saving_per_hour.tolist(),
+        saving_per_year=[int(x) for x in saving_per_year.tolist()],
+        all_year_savings=int(saving_per_year.sum()),
+    )
+    summary = {
+        "energy_savings_kwh": result.all_year_savings,
+        "energy_savings_cost": round(float(cost.sum()), 2),
+        "periods": [
+            {
+                "name": label,
+                "energy_savings_kwh": int(period_kwh[:, k].sum()),
+                "energy_savings_cost": round(float((period_kwh[:, k] * tariff["prices"][label]).sum()), 2),
+            }
+            for k, label in enumerate(labels)
+        ],
+        "machines": [
+            {
+                "no": no,
+                "profile": sources[i],
+                "load_hours": round(float(load_hours[i]), 2),
+                "energy_savings_kwh": result.saving_per_year[i],
+                "energy_savings_cost": float(cost[i]),
+                **({"periods": [int(v) for v in period_kwh[i].tolist()]} if period_kwh is not None else {}),
+            }
+            for i, no in enumerate(cols["no"].tolist())
+        ],
+    }
+    return result, summary
+
+
+def hourly_sheet(summary: dict) -> tuple[str, list[str], list[tuple]]:
+    """报告附加表「分时节电」：(表名, 表头, 逐台行)。"""
+    labels = [p["name"] for p in summary["periods"]]
+    source_names = {"machine": "单机", "plant": "全厂", "flat": "按年运行时间"}
+    columns = ["设备编号", "负载曲线", "等效满负荷小时", "年节电", *(f"{s}时段节电" for s in labels), "年节约电费"]
+    rows = [
+        (
+            str(m["no"]), source_names[m["profile"]], m["load_hours"], m["energy_savings_kwh"],
+            *m.get("periods", []), m["energy_savings_cost"],
+        )
+        for m in summary["machines"]
+    ]
+    rows.append((
+        "合计", "", None, summary["energy_savings_kwh"],
+        *(p["energy_savings_kwh"] for p in summary["periods"]), summary["energy_savings_cost"],
+    ))
+    return "分时节电", columns, rows
@@ -0,0 +1,271 @@
+"""后台报告生成任务：SQLite 表 report_job 即任务队列，常驻进程池执行
+
+提交时写入一行 queued；调度线程按 id 顺序领取（UPDATE ... WHERE status='queued'，只会被领取一次），
+交给已预先导入 pandas/openpyxl 的 spawn 进程池执行，完成后回写 success/failed 及结果 JSON。
+请求线程只做写库与校验，不再占用 Starlette 线程池做计算与写 Excel。
+领取时记下领取进程（主机名:pid），运行期间定时刷新心跳；只有心跳超过 stale_seconds 未刷新的
+running 任务（所在进程已退出）才重新排队，多个工作进程共用一个库时不会互相抢走对方正在执行的任务。
+进程池中子进程异常退出（BrokenProcessPool）时，在途任务记为失败并重建进程池。
+"""
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models import ReportJob
+
+ACTIVE_STATUSES = ("queued", "running")
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 10.0
+
+_submit_lock = threading.Lock()
+
+
+class JobFailed(Exception):
+    """任务执行失败；args[0] 为返回给前端的原因。"""
+
+
+def _warm_worker(modules: tuple[str, ...]) -> None:
+    """进程池 initializer：子进程启动时即导入重模块，首个任务不再承担导入耗时。"""
+    for name in modules:
+        importlib.import_module(name)
+
+
+def payload_hash(kind: str, params: dict) -> str:
+    raw = json.dumps({"kind": kind, "params": params}, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class JobRunner:
+    """调度线程 + 进程池。execute(kind, user_id, params) 须为可 pickle 的模块级函数，返回可 JSON 序列化的结果。"""
+
+    def __init__(self, execute, workers: int = 2, warm_modules: tuple[str, ...] = (), stale_seconds: int = 60):
+        self.execute = execute
+        self.workers = max(1, workers)
+        self.warm_modules = ("pandas", "openpyxl", *warm_modules)
+        self.stale_seconds = max(stale_seconds, 2 * HEARTBEAT_SECONDS)
+        self.owner: str | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool_broken = threading.Event()
+        self._lock = threading.Lock()
+        self._inflight = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"  # 启动时取 pid，预加载后 fork 的工作进程各不相同
+        self._requeue_stale()
+        self._stop.clear()
+        self._pool = self._new_pool()
+        self._thread = threading.Thread(target=self._loop, name="report-job-runner", daemon=True)
+        self._thread.start()
+        print(f"[AirComp] 报告任务队列已启动，工作进程 {self.workers} 个", flush=True)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+            initargs=(self.warm_modules,),
+        )
+        # 每个进程先跑一次空任务，使进程池在首个请求前即全部启动并完成导入
+        for _ in range(self.workers):
+            pool.submit(_warm_worker, ())
+        return pool
+
+    def _restart_pool(self) -> None:
+        self._pool_broken.clear()
+        old, self._pool = self._pool, self._new_pool()
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+        print("[AirComp] 报告任务工作进程异常退出，已重建进程池", flush=True)
+
+    def _heartbeat(self) -> None:
+        with SessionLocal() as db:
+            db.execute(
+                update(ReportJob)
+                .where(ReportJob.owner == self.owner, ReportJob.status == "running")
+                .values(heartbeat_at=datetime.now())
+            )
+            db.commit()
+
+    def _requeue_stale(self) -> None:
+        """心跳超时的 running 任务（领取进程已退出）重新排队；本进程领取的任务不受影响。"""
+        deadline = datetime.now() - timedelta(seconds=self.stale_seconds)
+        with SessionLocal() as db:
+            n = db.execute(
+                update(ReportJob)
+                .where(
+                    ReportJob.status == "running",
+                    or_(ReportJob.owner.is_(None), ReportJob.owner != self.owner),
+                    or_(ReportJob.heartbeat_at.is_(None), ReportJob.heartbeat_at < deadline),
+                )
+                .values(status="queued", progress=0, started_at=None, owner=None, heartbeat_at=None)
+            ).rowcount
+            db.commit()
+        if n:
+            print(f"[AirComp] {n} 个心跳超时的报告任务已重新排队", flush=True)
+            self._wake.set()
+
+    def _loop(self) -> None:
+        next_beat = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_beat:
+                self._heartbeat()
+                self._requeue_stale()
+                next_beat = time.monotonic() + HEARTBEAT_SECONDS
+            if self._pool_broken.is_set():
+                self._restart_pool()
+            while self._inflight < self.workers and not self._stop.is_set() and self._dispatch_one():
+                pass
+            self._wake.wait(timeout=POLL_SECONDS)
+            self._wake.clear()
+
+    def _dispatch_one(self) -> bool:
+        """领取最早的一条 queued 任务并提交到进程池；队列为空返回 False。"""
+        with SessionLocal() as db:
+            job = db.query(ReportJob).filter(ReportJob.status == "queued").order_by(ReportJob.id).first()
+            if job is None:
+                return False
+            now = datetime.now()
+            claimed = db.execute(
+                update(ReportJob)
+                .where(ReportJob.id == job.id, ReportJob.status == "queued")
+                .values(status="running", progress=10, started_at=now, owner=self.owner, heartbeat_at=now)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return True
+            job_id, kind, user_id, params = job.id, job.kind, job.user_id, json.loads(job.payload)
+        with self._lock:
+            self._inflight += 1
+        try:
+            future = self._pool.submit(self.execute, kind, user_id, params)
+        except BrokenProcessPool:
+            # 任务尚未开始执行：放回队列，重建进程池后再领取
+            with SessionLocal() as db:
+                db.execute(
+                    update(ReportJob)
+                    .where(ReportJob.id == job_id, ReportJob.owner == self.owner)
+                    .values(status="queued", progress=0, started_at=None, owner=None, heartbeat_at=None)
+                )
+                db.commit()
+            with self._lock:
+                self._inflight -= 1
+            self._pool_broken.set()
+            return False
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(partial(self._finish, job_id))
+        return True
+
+    def _finish(self, job_id: int, future) -> None:
+        values = {"progress": 100, "finished_at": datetime.now()}
+        try:
+            result = future.result()
+            values.update(status="success", result=json.dumps(result, ensure_ascii=False))
+        except JobFailed as e:
+            values.update(status="failed", error=str(e.args[0]) if e.args else "任务失败")
+        except BrokenProcessPool:
+            # 无法判断是哪个任务导致子进程退出，在途任务一律记为失败，避免反复崩溃
+            values.update(status="failed", error="工作进程异常退出，请重新提交")
+            self._pool_broken.set()
+        except BaseException as e:
+            values.update(status="failed", error=f"{type(e).__name__}: {e}")
+        try:
+            with SessionLocal() as db:
+                # 心跳中断期间已被其他进程重新领取的任务，以对方的结果为准
+                db.execute(update(ReportJob).where(ReportJob.id == job_id, ReportJob.owner == self.owner).values(**values))
+                db.commit()
+        finally:
+            with self._lock:
+                self._inflight -= 1
+            self._wake.set()
+
+
+def submit_job(
+    db: Session,
+    runner: JobRunner,
+    user_id: int,
+    kind: str,
+    params: dict,
+    idempotency_key: str | None = None,
+) -> tuple[ReportJob, bool]:
+    """写入队列并唤醒调度线程；返回 (任务, 是否复用了已有任务)。
+
+    给定幂等键时同一用户同一键始终对应同一任务；未给定时，排队或运行中的相同请求（如重复点击）直接复用。
+    """
+    digest = payload_hash(kind, params)
+    with _submit_lock:
+        q = db.query(ReportJob).filter(ReportJob.user_id == user_id)
+        if idempotency_key:
+            existing = q.filter(ReportJob.idempotency_key == idempotency_key).first()
+        else:
+            existing = (
+                q.filter(ReportJob.payload_hash == digest, ReportJob.status.in_(ACTIVE_STATUSES))
+                .order_by(ReportJob.id.desc())
+                .first()
+            )
+        if existing is not None:
+            return existing, True
+        job = ReportJob(
+            user_id=user_id,
+            kind=kind,
+            idempotency_key=idempotency_key or None,
+            payload_hash=digest,
+            payload=json.dumps(params, ensure_ascii=False),
+            status="queued",
+            progress=0,
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # 其他进程/实例已用同一幂等键提交
+            db.rollback()
+            existing = q.filter(ReportJob.idempotency_key == idempotency_key).first()
+            return existing, True
+        db.refresh(job)
+    runner.wake()
+    return job, False
+
+
+def queue_position(db: Session, job: ReportJob) -> int | None:
+    """排队中的任务前面还有几条（运行中的不计）；非排队状态返回 None。"""
+    if job.status != "queued":
+        return None
+    return db.query(ReportJob).filter(ReportJob.status == "queued", ReportJob.id < job.id).count()
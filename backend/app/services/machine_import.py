@@ -0,0 +1,202 @@
+"""设备批量导入：整批校验后在一个事务内以 INSERT … ON CONFLICT 写入，逐行返回状态
+
+唯一键：客户机 (name, no)，供应商机 (name, model)，由唯一索引保证（见 models/machine.py、db/migrations.py）。
+两个导入同时进行时，先查后插之间的竞争由唯一索引 + ON CONFLICT 消除：重复行只会被跳过（或更新），不会重复插入。
+MySQL 没有 ON CONFLICT / RETURNING，改用 ON DUPLICATE KEY UPDATE 写入后再按唯一键查回 id；
+此时与并发导入撞上的行仍只写一次，但状态按写入前的查询判断，可能记为 created。
+on_conflict="skip"（默认）已存在的记录跳过；"update" 用导入值覆盖已存在记录的其余字段（归属用户不变），
+只覆盖导入者自己的记录（管理员除外），属于其他用户的记为 skipped。
+每行状态：created / updated / skipped（已存在或与本批前面的行重复） / invalid（缺少唯一键字段）。
+"""
+from sqlalchemy import case, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import MachineClient, MachineSupplier
+from app.models.catalog import bump_catalog_version
+from app.services.machine_options import invalidate_client_options
+
+ON_CONFLICT_MODES = ("skip", "update")
+ADMIN_ID = 999
+CHUNK_ROWS = 500  # 查询已存在键时每条 SELECT 的键数，远低于 SQLite 的绑定参数上限
+
+CLIENT_KEY = ("name", "no")
+SUPPLIER_KEY = ("name", "model")
+
+
+class ConflictTargetMissing(Exception):
+    """唯一索引尚未建立（库中存在重复记录，升级被跳过），无法按唯一键更新。"""
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        raise ValueError(f"批量导入暂不支持该数据库：{dialect}")
+    return insert
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_upsert(
+    db: Session,
+    model,
+    key: tuple[str, ...],
+    rows: list[dict],
+    on_conflict: str = "skip",
+    exists_detail: str = "记录已存在",
+) -> list[dict]:
+    """rows 为列名 -> 值（含 user_id）；返回与 rows 一一对应的 [{唯一键字段..., status, id?, detail?}]。"""
+    if on_conflict not in ON_CONFLICT_MODES:
+        raise ValueError(f"不支持的冲突处理方式：{on_conflict}")
+    table = model.__table__
+    key_cols = [table.c[c] for c in key]
+    results: list[dict] = []
+    pending: dict[tuple, int] = {}  # 唯一键 -> 本批中首次出现的行号
+    for i, row in enumerate(rows):
+        k = tuple(row.get(c) for c in key)
+        item = dict(zip(key, k))
+        if any(v is None or v == "" for v in k):
+            item.update(status="invalid", detail=f"缺少 {'/'.join(key)}")
+        elif k in pending:
+            item.update(status="skipped", detail=f"与本批第 {pending[k] + 1} 条重复")
+        else:
+            pending[k] = i
+        results.append(item)
+    if not pending:
+        return results
+
+    keys = list(pending)
+    existing: dict[tuple, int | None] = {}  # 已存在的唯一键 -> 归属用户
+    for chunk in _chunks(keys, CHUNK_ROWS):
+        stmt = select(table.c.user_id, *key_cols).where(tuple_(*key_cols).in_(chunk))
+        existing.update((tuple(r[1:]), r[0]) for r in db.execute(stmt))
+
+    # 已存在的键：skip 时不再写入（唯一索引未建立时 ON CONFLICT 没有冲突目标，写入会产生重复行）；
+    # update 时只写入导入者自己的记录，其他用户的记为 skipped
+    foreign: set[tuple] = set()
+    if on_conflict == "skip":
+        targets = [k for k in keys if k not in existing]
+    else:
+        foreign = {
+            k for k in keys
+            if k in existing and rows[pending[k]].get("user_id") not in (existing[k], ADMIN_ID)
+        }
+        targets = [k for k in keys if k not in foreign]
+    written: dict[tuple, int] = {}
+    if targets:
+        written = _write(db, model, key, [rows[pending[k]] for k in targets], targets, on_conflict)
+
+    for k, i in pending.items():
+        item = results[i]
+        if k in written:
+            item.update(status="updated" if k in existing else "created", id=written[k])
+        elif k in foreign:
+            item.update(status="skipped", detail=f"{exists_detail}（属于其他用户，未覆盖）")
+        else:
+            item.update(status="skipped", detail=exists_detail)
+    return results
+
+
+def _write(
+    db: Session, model, key: tuple[str, ...], params: list[dict], targets: list[tuple], on_conflict: str
+) -> dict[tuple, int]:
+    """执行 INSERT … ON CONFLICT 并提交，返回实际插入或更新的 {唯一键: id}；targets 为 params 对应的唯一键。"""
+    table = model.__table__
+    key_cols = [table.c[c] for c in key]
+    # 一条语句 + 多组参数：SQLAlchemy 按页展开为多行 VALUES（insertmanyvalues），RETURNING 逐行返回写入的 id
+    stmt = _insert(db)(table)
+    columns = [c for c in params[0] if c not in key and c not in ("id", "user_id")]
+    # 检查之后才被并发导入写入的同键记录，同样只在归属用户一致时覆盖（管理员导入不限）
+    admin = params[0].get("user_id") == ADMIN_ID
+    mysql = db.get_bind().dialect.name in ("mysql", "mariadb")
+    if mysql:
+        if on_conflict == "skip":
+            # 把唯一键赋回自身，等同不更新
+            set_ = {key[0]: stmt.inserted[key[0]]}
+        elif admin:
+            set_ = {c: stmt.inserted[c] for c in columns}
+        else:
+            owned = table.c.user_id == stmt.inserted.user_id
+            set_ = {c: case((owned, stmt.inserted[c]), else_=table.c[c]) for c in columns}
+        stmt = stmt.on_duplicate_key_update(set_)
+    elif on_conflict == "skip":
+        stmt = stmt.on_conflict_do_nothing()
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_cols,
+            set_={c: stmt.excluded[c] for c in columns},
+            where=None if admin else table.c.user_id == stmt.excluded.user_id,
+        )
+    written: dict[tuple, int] = {}
+    try:
+        if mysql:
+            db.execute(stmt, params)
+            for chunk in _chunks(targets, CHUNK_ROWS):
+                for r in db.execute(select(table.c.id, *key_cols).where(tuple_(*key_cols).in_(chunk))):
+                    written[tuple(r[1:])] = r[0]
+        else:
+            for r in db.execute(stmt.returning(table.c.id, *key_cols), params):
+                written[tuple(r[1:])] = r[0]
+        if written and model is MachineSupplier:
+            bump_catalog_version(db.connection())
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if on_conflict == "update" and "ON CONFLICT" in str(e):
+            raise ConflictTargetMissing(str(e)) from e
+        raise
+    if written and model is MachineClient:
+        invalidate_client_options({row.get("user_id") for row in params})
+    return written
+
+
+CLIENT_COLUMNS = (
+    "name", "no", "model", "run_time", "load_time", "ori_power", "air", "brand", "is_FC",
+    "origin_pre", "actual_pre", "collect_time",
+)
+SUPPLIER_COLUMNS = (
+    "name", "no", "model", "ori_power", "air", "brand", "is_FC", "origin_pre", "energy_con", "collect_time",
+)
+
+
+def client_row(data: dict, user_id: int) -> dict:
+    """导入字段 -> machine_client 行（各行列相同，便于多行 INSERT）。"""
+    row = {c: data.get(c) for c in CLIENT_COLUMNS}
+    row["user_id"] = user_id
+    row["is_FC"] = 1 if data.get("is_FC") else 0
+    return row
+
+
+def supplier_row(data: dict, user_id: int) -> dict:
+    """导入字段 -> machine_supplier 行，energy_con_min 由比功率换算。"""
+    row = {c: data.get(c) for c in SUPPLIER_COLUMNS}
+    row["user_id"] = user_id
+    row["is_FC"] = 1 if data.get("is_FC") else 0
+    energy_con = data.get("energy_con")
+    row["energy_con_min"] = float(energy_con) / 60 if energy_con is not None else None
+    return row
+
+
+def import_clients(db: Session, user_id: int, items: list[dict], on_conflict: str = "skip") -> list[dict]:
+    rows = [client_row(d, user_id) for d in items]
+    return bulk_upsert(db, MachineClient, CLIENT_KEY, rows, on_conflict, exists_detail="该客户该编号已存在")
+
+
+def import_suppliers(db: Session, user_id: int, items: list[dict], on_conflict: str = "skip") -> list[dict]:
+    rows = [supplier_row(d, user_id) for d in items]
+    return bulk_upsert(db, MachineSupplier, SUPPLIER_KEY, rows, on_conflict, exists_detail="该供应商该型号已存在")
+
+
+def count_status(results: list[dict]) -> dict[str, int]:
+    counts = {"created": 0, "updated": 0, "skipped": 0, "invalid": 0}
+    for r in results:
+        counts[r["status"]] += 1
+    return counts
@@ -0,0 +1,119 @@
+"""设备表单下拉选项（/machines/options）
+
+客户机各列以 SELECT DISTINCT 取值（走 machine_client 上以 user_id 开头的索引），按用户缓存；
+客户机任何增删改在提交后清掉对应用户（及管理员）的缓存：ORM 写入由下方 after_commit 钩子处理，
+绕过 ORM 的批量语句须自行调用 invalidate_client_options。
+多个工作进程各有一份缓存，其他进程的写入最迟 OPTIONS_CACHE_TTL_SECONDS 秒后可见。
+供应商机各列直接取目录快照的去重结果，随 catalog_version 更新。
+各列取值均升序排列，prefix 按前缀筛选（字符串列二分查找），limit 限制每列条数。
+"""
+from bisect import bisect_left
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import MachineClient
+from app.services.cache import TTLCache
+from app.services.catalog_snapshot import get_snapshot
+
+settings = get_settings()
+ADMIN_ID = 999
+
+CLIENT_FIELDS = {
+    "company_name": MachineClient.name,
+    "client_no": MachineClient.no,
+    "client_brand": MachineClient.brand,
+    "client_model": MachineClient.model,
+}
+SUPPLIER_FIELDS = {
+    "supplier_name": "name",
+    "supplier_no": "no",
+    "supplier_brand": "brand",
+    "supplier_model": "model",
+}
+OPTION_FIELDS = (*CLIENT_FIELDS, *SUPPLIER_FIELDS)
+
+_client_cache = TTLCache(maxsize=settings.OPTIONS_CACHE_SIZE, ttl=settings.OPTIONS_CACHE_TTL_SECONDS)
+
+
+def _distinct_values(db: Session, column, user_id: int) -> list:
+    stmt = select(column).where(column.isnot(None)).distinct().order_by(column)
+    if user_id != ADMIN_ID:
+        stmt = stmt.where(MachineClient.user_id == user_id)
+    return [v for v in db.scalars(stmt) if v != ""]
+
+
+def client_options(db: Session, user_id: int) -> dict[str, list]:
+    options = _client_cache.get(user_id)
+    if options is None:
+        options = {field: _distinct_values(db, column, user_id) for field, column in CLIENT_FIELDS.items()}
+        _client_cache.set(user_id, options)
+    return options
+
+
+def invalidate_client_options(user_ids) -> None:
+    for user_id in {*user_ids, ADMIN_ID}:
+        _client_cache.pop(user_id)
+
+
+def options_cache_stats() -> dict:
+    return _client_cache.stats()
+
+
+def filter_values(values: list, prefix: str | None = None, limit: int | None = None) -> list:
+    """values 须已升序；字符串列按前缀二分定位，数值列按十进制文本前缀匹配。"""
+    if prefix:
+        if values and isinstance(values[0], str):
+            # 以 prefix 开头的字符串在升序列表中连续，落在 [prefix, prefix + 最大码位) 内
+            values = values[bisect_left(values, prefix):bisect_left(values, prefix + "\U0010ffff")]
+            return values if limit is None else values[:limit]
+        values = [v for v in values if str(v).startswith(prefix)]
+    return values if limit is None else values[:limit]
+
+
+def machine_options(
+    db: Session,
+    user_id: int,
+    fields: list[str] | None = None,
+    prefix: str | None = None,
+    limit: int | None = None,
+) -> dict[str, list]:
+    """fields 为空时返回全部 OPTION_FIELDS。"""
+    fields = fields or list(OPTION_FIELDS)
+    out = {}
+    if any(f in CLIENT_FIELDS for f in fields):
+        clients = client_options(db, user_id)
+    if any(f in SUPPLIER_FIELDS for f in fields):
+        snapshot = get_snapshot(db)
+    for field in fields:
+        if field in CLIENT_FIELDS:
+            values = clients[field]
+        else:
+            values = snapshot.distinct(SUPPLIER_FIELDS[field])
+        out[field] = filter_values(values, prefix, limit)
+    return out
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_client_writes(session, flush_context):
+    # after_flush 时 new / dirty / deleted 仍为本次 flush 前的状态；提交后才清缓存，避免缓存到未提交前的旧值
+    user_ids = {
+        obj.user_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, MachineClient)
+    }
+    if user_ids:
+        session.info.setdefault("client_option_users", set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop("client_option_users", None)
+    if user_ids:
+        invalidate_client_options(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("client_option_users", None)
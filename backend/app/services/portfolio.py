@@ -0,0 +1,280 @@
+"""全部客户公司批量节能计算（夜间「整体组合」运行）
+
+对某用户名下的每家客户公司执行 推荐选型 + 节能计算 + 生成报告，
+各公司的 pandas/openpyxl 计算分发到进程池并行，完成一家回调一次进度；
+最后生成按公司汇总的总表，并为每家公司与总表各建一条历史报告。
+
+命令行（在 backend 目录下）：
+    python -m app.services.portfolio --user-id 1 --workers 8 --hours 8000 --price 0.8
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import User, MachineClient, EnergyReport
+from app.services.catalog_snapshot import get_supplier_catalog
+from app.services.supplier_catalog import SupplierCatalog
+
+ADMIN_ID = 999
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports")
+
+settings = get_settings()
+
+# 子进程内的供应商目录：进程池启动时由 _init_worker 设置一次，各公司任务直接复用
+_catalog: SupplierCatalog | None = None
+
+SUMMARY_COLUMNS = ["公司名称", "客户机台数", "推荐方案", "年节电(kWh)", "年节约电费(元)", "状态", "说明"]
+
+
+def load_portfolio(db: Session, user: User) -> tuple[list[tuple[str, list[dict]]], SupplierCatalog]:
+    """一次查询取出用户名下全部客户机并按公司分组；供应商目录取跨请求共用的快照。"""
+    from app.services.device_match import client_orm_to_dict
+
+    q = db.query(MachineClient).filter(MachineClient.name.isnot(None))
+    if user.id != ADMIN_ID:
+        q = q.filter(MachineClient.user_id == user.id)
+    clients = q.order_by(MachineClient.name, MachineClient.no).all()
+    companies = [
+        (name, [client_orm_to_dict(c) for c in rows])
+        for name, rows in groupby(clients, key=lambda c: c.name)
+    ]
+    return companies, get_supplier_catalog(db)
+
+
+def run_company(
+    company_name: str,
+    machines: list[dict],
+    suppliers: list,
+    reports_dir: str,
+    running_hours_per_year: int,
+    calc_params: dict | None = None,
+    use_caliber_a: bool = True,
+) -> dict:
+    """单家公司：推荐选型 + 节能计算 + 写报告。在子进程中执行，异常转为 failed 结果返回。"""
+    from app.services.cal_func import normalize_machines, normalize_new_eq
+    from app.services.device_match import recommend_suppliers_multi
+    from app.services.report_cache import cached_results_excel
+
+    out = {"company_name": company_name, "client_count": len(machines)}
+    try:
+        # 台数上限与 /calculate/recommend 一致，取该公司客户机台数
+        new_eq, scheme_primary, _schemes_all, summary = recommend_suppliers_multi(
+            machines, suppliers, max_units=len(machines), use_caliber_a=use_caliber_a
+        )
+        if not new_eq:
+            return {**out, "status": "failed", "detail": summary or "无法生成推荐方案"}
+        filepath, energy_savings_kwh = cached_results_excel(
+            normalize_machines(machines),
+            normalize_new_eq(new_eq),
+            reports_dir,
+            running_hours_per_year=running_hours_per_year,
+            calc_params=calc_params,
+        )
+    except Exception as e:
+        return {**out, "status": "failed", "detail": str(e)}
+    return {
+        **out,
+        "status": "success",
+        "detail": summary,
+        "scheme": ", ".join(f"{cnt}台 {s.get('brand', '')}-{s.get('model', '')}" for s, cnt in scheme_primary),
+        "filename": os.path.basename(filepath),
+        "energy_savings_kwh": energy_savings_kwh,
+    }
+
+
+def portfolio_worker_limit() -> int:
+    """批量计算进程数上限：PORTFOLIO_WORKERS，未配置（<= 0）时取 CPU 核数。"""
+    return settings.PORTFOLIO_WORKERS if settings.PORTFOLIO_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def _init_worker(catalog: SupplierCatalog) -> None:
+    global _catalog
+    _catalog = catalog
+
+
+def _run_company_in_worker(
+    company_name: str,
+    machines: list[dict],
+    reports_dir: str,
+    running_hours_per_year: int,
+    calc_params: dict | None = None,
+) -> dict:
+    return run_company(company_name, machines, _catalog, reports_dir, running_hours_per_year, calc_params)
+
+
+def iter_portfolio(
+    companies: list[tuple[str, list[dict]]],
+    suppliers: list,
+    running_hours_per_year: int = 8000,
+    calc_params: dict | None = None,
+    max_workers: int | None = None,
+    reports_dir: str = REPORTS_DIR,
+):
+    """并行计算所有公司，按完成顺序 yield (done, total, result)。
+
+    进程数不超过 portfolio_worker_limit()；生成器未迭代完就被关闭（如 SSE 客户端断开）时，
+    尚未开始的公司全部取消，不等待进行中的任务。
+    """
+    total = len(companies)
+    if total == 0:
+        return
+    limit = portfolio_worker_limit()
+    workers = min(max_workers or limit, limit, total)
+    # 目录索引只建一次，进程池启动时经 initializer 传给每个子进程一次，不随每家公司的任务重复序列化
+    catalog = suppliers if isinstance(suppliers, SupplierCatalog) else SupplierCatalog(suppliers)
+    # spawn：不从带线程的 Web 进程 fork，子进程独立导入 pandas/openpyxl
+    ctx = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(catalog,))
+    completed = False
+    try:
+        futures = [
+            pool.submit(_run_company_in_worker, name, machines, reports_dir, running_hours_per_year, calc_params)
+            for name, machines in companies
+        ]
+        for done, fut in enumerate(as_completed(futures), start=1):
+            yield done, total, fut.result()
+        completed = True
+    finally:
+        pool.shutdown(wait=completed, cancel_futures=not completed)
+
+
+def run_portfolio(
+    companies: list[tuple[str, list[dict]]],
+    suppliers: list,
+    running_hours_per_year: int = 8000,
+    calc_params: dict | None = None,
+    max_workers: int | None = None,
+    progress=None,
+    reports_dir: str = REPORTS_DIR,
+) -> list[dict]:
+    """iter_portfolio 的收集版：每完成一家调用 progress(done, total, result)，返回按公司名排序的结果。"""
+    results = []
+    for done, total, result in iter_portfolio(
+        companies, suppliers, running_hours_per_year, calc_params, max_workers, reports_dir
+    ):
+        results.append(result)
+        if progress:
+            progress(done, total, result)
+    results.sort(key=lambda r: r["company_name"])
+    return results
+
+
+def save_portfolio_reports(
+    db: Session,
+    user_id: int,
+    results: list[dict],
+    electricity_price: float | None = None,
+    reports_dir: str = REPORTS_DIR,
+) -> dict:
+    """为每家成功的公司建报告记录，并写出汇总表作为一条报告；返回汇总信息。"""
+    from app.services.report_writer import write_table_workbook
+
+    rows = []
+    total_kwh = 0
+    for r in results:
+        cost = None
+        if r["status"] == "success":
+            total_kwh += r["energy_savings_kwh"]
+            if electricity_price is not None and electricity_price >= 0:
+                cost = round(r["energy_savings_kwh"] * electricity_price, 2)
+            report = EnergyReport(
+                user_id=user_id,
+                title=f"{r['company_name']} 节能量计算",
+                source="portfolio",
+                company_name=r["company_name"],
+                filename=r["filename"],
+                energy_savings_kwh=r["energy_savings_kwh"],
+                energy_savings_cost=cost,
+            )
+            db.add(report)
+            db.flush()
+            r["report_id"] = report.id
+            r["energy_savings_cost"] = cost
+        rows.append((
+            r["company_name"], r["client_count"], r.get("scheme", ""), r.get("energy_savings_kwh"),
+            cost, "成功" if r["status"] == "success" else "失败", r.get("detail", ""),
+        ))
+    total_cost = None
+    if electricity_price is not None and electricity_price >= 0:
+        total_cost = round(total_kwh * electricity_price, 2)
+    summary_path = write_table_workbook("公司汇总", SUMMARY_COLUMNS, rows, reports_dir)
+    summary_report = EnergyReport(
+        user_id=user_id,
+        title=f"全部客户 节能量汇总（{len(results)} 家）",
+        source="portfolio",
+        company_name=None,
+        filename=os.path.basename(summary_path),
+        energy_savings_kwh=total_kwh,
+        energy_savings_cost=total_cost,
+    )
+    db.add(summary_report)
+    db.commit()
+    return {
+        "summary_report_id": summary_report.id,
+        "company_count": len(results),
+        "success_count": sum(1 for r in results if r["status"] == "success"),
+        "energy_savings_kwh": total_kwh,
+        "energy_savings_cost": total_cost,
+        "companies": results,
+    }
+
+
+def restore_missing_reports(
+    results: list[dict],
+    companies: list[tuple[str, list[dict]]],
+    suppliers: list,
+    running_hours_per_year: int = 8000,
+    calc_params: dict | None = None,
+    reports_dir: str = REPORTS_DIR,
+) -> None:
+    """报告记录提交后调用：复用的报告文件若已被并发的删除移走，在本进程按相同输入重新生成（文件名不变）。"""
+    machines_by_company = dict(companies)
+    for r in results:
+        if r["status"] == "success" and not os.path.isfile(os.path.join(reports_dir, r["filename"])):
+            run_company(
+                r["company_name"], machines_by_company[r["company_name"]], suppliers, reports_dir,
+                running_hours_per_year, calc_params,
+            )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="对用户名下全部客户公司批量执行推荐选型与节能计算")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认且最多为 PORTFOLIO_WORKERS（未配置时为 CPU 核数）")
+    parser.add_argument("--hours", type=int, default=8000, help="年运行时间（小时）")
+    parser.add_argument("--price", type=float, default=None, help="电费 元/kWh")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == args.user_id).first()
+        if not user:
+            raise SystemExit(f"用户不存在: {args.user_id}")
+        companies, suppliers = load_portfolio(db, user)
+        print(f"[AirComp] 共 {len(companies)} 家公司，供应商机型 {len(suppliers)} 个", flush=True)
+
+        def progress(done, total, r):
+            status = f"年节电 {r['energy_savings_kwh']} kWh" if r["status"] == "success" else f"失败：{r['detail']}"
+            print(f"[AirComp] {done}/{total} {r['company_name']} {status}", flush=True)
+
+        results = run_portfolio(companies, suppliers, args.hours, max_workers=args.workers, progress=progress)
+        out = save_portfolio_reports(db, user.id, results, args.price)
+        restore_missing_reports(results, companies, suppliers, args.hours)
+        print(
+            f"[AirComp] 完成：成功 {out['success_count']}/{out['company_count']} 家，"
+            f"年总节电 {out['energy_savings_kwh']} kWh，汇总报告 id={out['summary_report_id']}",
+            flush=True,
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""按内容寻址的能耗计算结果缓存
+
+键为规范化输入（cal_func.normalize_machines / normalize_new_eq 的输出 + 年运行时间 + calc_params）
+的 SHA-256。报告文件以键命名（report_<hash>.xlsx），内容相同的报告共用同一文件；
+内存缓存记录 (文件路径, 年总节电)，命中且文件仍在时直接复用，不再计算、不再写 Excel。
+
+复用与删除的先后：调用方在报告记录提交后调用 ensure_results_excel，文件已不在就按原输入重新生成；
+删除报告在提交后调用 remove_unreferenced_report，先把文件改名移开、再确认仍无记录引用才真正删除，
+期间有新记录提交则改回原名。两边都在提交之后检查，任意交错下新提交的报告都不会丢文件。
+"""
+import hashlib
+import json
+import os
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import EnergyReport
+from app.services.cache import TTLCache
+
+# 规范化口径或报告版式变化时递增，使旧键全部失效
+CACHE_SCHEMA = 1
+
+settings = get_settings()
+_result_cache = TTLCache(maxsize=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL_SECONDS)
+
+
+def content_key(
+    machines: list[dict],
+    new_eq: list[dict],
+    running_hours_per_year: int,
+    calc_params: dict | None = None,
+) -> str:
+    """规范化输入的内容哈希；入参须已经过 normalize_machines / normalize_new_eq。"""
+    payload = {
+        "schema": CACHE_SCHEMA,
+        "machines": machines,
+        "new_eq": new_eq,
+        "running_hours_per_year": int(running_hours_per_year),
+        "calc_params": {k: float(v) for k, v in sorted((calc_params or {}).items())},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def content_filename(key: str) -> str:
+    return f"report_{key[:32]}.xlsx"
+
+
+def cached_results_excel(
+    machines: list[dict],
+    new_eq: list[dict],
+    output_dir: str,
+    running_hours_per_year: int,
+    calc_params: dict | None = None,
+    result=None,
+) -> tuple[str, int]:
+    """与 final_results_excel 相同的返回 (文件路径, 年总节电 kWh)，相同输入复用已生成的报告。
+
+    result：调用方已按同一输入算出的 FleetSavings（如 scheme_savings 的主方案），传入时不再重复计算。
+    """
+    from app.services.cal_batch import fleet_savings
+    from app.services.report_writer import write_report_workbook
+
+    key = content_key(machines, new_eq, running_hours_per_year, calc_params)
+    hit = _result_cache.get(key)
+    if hit is not None and os.path.isfile(hit[0]):
+        return hit
+    if result is None:
+        result = fleet_savings(machines, new_eq, running_hours_per_year=running_hours_per_year, calc_params=calc_params)
+    filepath = os.path.join(output_dir, content_filename(key))
+    if not os.path.isfile(filepath):
+        write_report_workbook(result, output_dir, filename=content_filename(key))
+    value = (filepath, result.all_year_savings)
+    _result_cache.set(key, value)
+    return value
+
+
+def ensure_results_excel(
+    filepath: str,
+    machines: list[dict],
+    new_eq: list[dict],
+    output_dir: str,
+    running_hours_per_year: int,
+    calc_params: dict | None = None,
+    result=None,
+) -> None:
+    """报告记录提交后调用：复用的文件若已被并发的删除移走，按相同输入重新生成（文件名不变）。"""
+    if not os.path.isfile(filepath):
+        cached_results_excel(machines, new_eq, output_dir, running_hours_per_year, calc_params, result=result)
+
+
+def _referenced(db: Session, filename: str) -> bool:
+    db.expire_all()
+    return db.query(EnergyReport.id).filter(EnergyReport.filename == filename).first() is not None
+
+
+def remove_unreferenced_report(db: Session, filename: str, reports_dir: str) -> bool:
+    """删除报告记录提交后调用：已无记录引用该文件时删除文件，返回是否删除。"""
+    if _referenced(db, filename):
+        return False
+    filepath = os.path.join(reports_dir, filename)
+    moved = f"{filepath}.{uuid.uuid4().hex}.deleting"
+    try:
+        os.replace(filepath, moved)
+    except OSError:  # 文件不存在或已被其他删除请求移走
+        return False
+    if _referenced(db, filename):
+        # 移走期间有新报告复用了该文件：放回原处（对方若已重新生成，内容相同）
+        os.replace(moved, filepath)
+        return False
+    try:
+        os.remove(moved)
+    except OSError:
+        pass
+    return True
+
+
+def clear_result_cache() -> None:
+    _result_cache.clear()
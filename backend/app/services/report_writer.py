@@ -0,0 +1,96 @@
+"""报告 Excel 流式写出：由计算结果逐行写入 write-only 工作簿，写完后原子改名进报告目录
+
+与 pandas.ExcelWriter 生成的三张表内容一致，但不构建 DataFrame、不整表驻留内存；
+先写入同目录下的唯一临时文件，再 os.replace 为 report_<uuid>.xlsx，
+并发请求不会互相覆盖，读方也不会读到写了一半的文件。
+"""
+import os
+import tempfile
+import uuid
+
+from openpyxl import Workbook
+
+from app.services.cal_batch import (
+    CONSUMPTION_COLUMNS,
+    ENERGY_TABLE_LABELS,
+    EQUIPMENT_COLUMNS,
+    FleetSavings,
+    consumption_rows,
+    energy_compare_rows,
+    equipment_rows,
+)
+
+
+def new_report_filename() -> str:
+    return f"report_{uuid.uuid4().hex}.xlsx"
+
+
+def _write_sheets(wb: Workbook, result: FleetSavings) -> None:
+    ws = wb.create_sheet("原有设备一览")
+    ws.append(EQUIPMENT_COLUMNS)
+    for row in equipment_rows(result):
+        ws.append(row)
+
+    ws = wb.create_sheet("原有设备能耗")
+    ws.append(CONSUMPTION_COLUMNS)
+    for row in consumption_rows(result):
+        ws.append(row)
+
+    # 能效对比：与 DataFrame.from_dict(orient="index").to_excel 一致，行为字段、列为逐台记录
+    ws = wb.create_sheet("能效对比")
+    ws.append([None, *range(2 * len(result.cols["no"]))])
+    for label, values in zip(ENERGY_TABLE_LABELS, energy_compare_rows(result)):
+        ws.append([label, *values])
+
+
+def _save_atomic(wb: Workbook, dest_dir: str, filename: str | None) -> str:
+    os.makedirs(dest_dir, exist_ok=True)
+    dest_path = os.path.join(dest_dir, filename or new_report_filename())
+    fd, tmp_path = tempfile.mkstemp(prefix=".report_", suffix=".xlsx.tmp", dir=dest_dir)
+    os.close(fd)
+    try:
+        wb.save(tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return dest_path
+
+
+def write_report_workbook(
+    result: FleetSavings,
+    dest_dir: str,
+    filename: str | None = None,
+    extra_sheets: list[tuple[str, list[str], list]] | None = None,
+) -> str:
+    """写出报告工作簿并返回最终路径；filename 缺省时生成唯一的 report_<uuid>.xlsx。
+
+    extra_sheets 为追加在三张报告表之后的 (表名, 表头, 行) 列表。
+    """
+    wb = Workbook(write_only=True)
+    _write_sheets(wb, result)
+    for sheet_name, columns, rows in extra_sheets or ():
+        ws = wb.create_sheet(sheet_name)
+        ws.append(columns)
+        for row in rows:
+            ws.append(list(row))
+    return _save_atomic(wb, dest_dir, filename)
+
+
+def write_table_workbook(
+    sheet_name: str,
+    columns: list[str],
+    rows,
+    dest_dir: str,
+    filename: str | None = None,
+) -> str:
+    """单表工作簿（如汇总表），同样流式写入并原子改名。"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(columns)
+    for row in rows:
+        ws.append(list(row))
+    return _save_atomic(wb, dest_dir, filename)
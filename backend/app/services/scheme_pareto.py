@@ -0,0 +1,256 @@
+"""多目标选型：枚举候选组合，返回 Pareto 最优（互不支配）的 top-k 方案
+
+四个目标均越小越好：
+  过盈      方案总气量 - 组合上限 (m³/min)
+  加权比功率 Σ台数×气量×比功率 / 方案总气量
+  台数
+  年耗电    按比功率从低到高依次带载组合上限气量，年运行时间内新设备的耗电量 (kWh)
+
+候选组合为「主机 a 台 + 调峰机 b 台」（b 可为 0，即同型多台），另并入启发式方案与精确求解方案。
+枚举时的支配剪枝：
+  - 同气量机型只保留比功率最低者；
+  - 给定主机与台数，调峰机只取「气量不小于缺口的最小机型」（过盈最小）与「其中比功率最低的机型」两端，
+    过盈与比功率介于两端之间的机型不再逐一展开，以控制候选规模；
+  - 去掉任一台仍满足组合上限的组合（多余一台）不予考虑。
+候选按台数组合 (a, b) 分批生成，每批先剔除被当前前沿支配的组合再并入前沿，内存与耗时只随前沿大小增长；
+最后取各目标最优方案及彼此差异最大的方案凑满 top-k。
+"""
+import math
+
+import numpy as np
+
+from app.services.cal_func import YEAR_RUNNING_TIME
+from app.services.combo_solver import MAX_SOLVER_UNITS
+from app.services.supplier_catalog import CatalogView
+
+MAX_PARETO_TOP_K = 20
+OBJECTIVES = ("overage", "specific_power", "units", "annual_kwh")
+OBJECTIVE_LABELS = {
+    "overage": "过盈最小",
+    "specific_power": "比功率最低",
+    "units": "台数最少",
+    "annual_kwh": "年耗电最少",
+}
+_EPS = 1e-9
+
+
+def scheme_metrics(scheme: list[tuple[dict, int]], view: CatalogView, q_target: float, hours: float) -> tuple:
+    """(过盈, 加权比功率, 台数, 年耗电)。单台气量按目录查找，与 view.total_air 口径一致。"""
+    units = []
+    for u, cnt in scheme:
+        units.append((view.unit_air(u.get("brand"), u.get("model")), float(u.get("energy_con") or 0), cnt))
+    total = sum(a * cnt for a, _, cnt in units)
+    power = sum(a * e * cnt for a, e, cnt in units)
+    remaining, kwh = q_target, 0.0
+    for a, e, cnt in sorted(units, key=lambda x: x[1]):
+        load = min(a * cnt, max(remaining, 0.0))
+        kwh += load * e
+        remaining -= load
+    return (
+        total - q_target,
+        power / total if total else math.inf,
+        sum(cnt for _, _, cnt in units),
+        kwh * hours,
+    )
+
+
+def _objectives(air, ec, i, ci, j, cj, q_target: float, hours: float) -> np.ndarray:
+    """组合 [主机 i × ci 台 + 调峰机 j × cj 台]（j < 0 表示无调峰机）的四个目标，按行向量化计算。"""
+    has_j = j >= 0
+    jj = np.where(has_j, j, 0)
+    cj = np.where(has_j, cj, 0)
+    cap_i, cap_j = ci * air[i], cj * air[jj]
+    total = cap_i + cap_j
+    power = cap_i * ec[i] + cap_j * ec[jj]
+    # 比功率低者先带载
+    first_i = ec[i] <= ec[jj]
+    cap_1 = np.where(first_i, cap_i, cap_j)
+    ec_1 = np.where(first_i, ec[i], ec[jj])
+    ec_2 = np.where(first_i, ec[jj], ec[i])
+    load_1 = np.minimum(cap_1, q_target)
+    kwh = (load_1 * ec_1 + (q_target - load_1) * ec_2) * hours
+    return np.column_stack([total - q_target, power / total, ci + cj, kwh])
+
+
+def _enumerate(air: np.ndarray, ec: np.ndarray, q_target: float, max_units: int, hours: float):
+    """逐批产出 (目标矩阵 (N,4), 组合 (N,4) = [主机, a, 调峰机或 -1, b])，同一批台数组合 (a, b) 相同。"""
+    m = len(air)
+    # 后缀中比功率最低的位置（同比功率取气量小者）
+    best_from = np.empty(m, dtype=np.int64)
+    best = m - 1
+    for p in range(m - 1, -1, -1):
+        if ec[p] <= ec[best]:
+            best = p
+        best_from[p] = best
+
+    def _batch(i, ci, j, cj):
+        # (主, 调峰) 与 (调峰, 主) 为同一组合：按机型序号规范化
+        combos = np.column_stack([i, ci, j, cj]).astype(np.int64)
+        swap = (combos[:, 2] >= 0) & (combos[:, 2] < combos[:, 0])
+        combos[swap] = combos[swap][:, [2, 3, 0, 1]]
+        return _objectives(air, ec, *combos.T, q_target, hours), combos
+
+    # 同型多台
+    cnt = np.ceil(q_target / air - _EPS).astype(np.int64)
+    idx = np.flatnonzero((cnt >= 1) & (cnt <= max_units))
+    if idx.size:
+        yield _batch(idx, cnt[idx], np.full(idx.size, -1), np.zeros(idx.size))
+    # 主机 a 台 + 调峰机 b 台
+    for a in range(1, max_units):
+        rem = q_target - a * air
+        live = np.flatnonzero(rem > _EPS)
+        if live.size == 0:
+            continue
+        for b in range(1, max_units - a + 1):
+            pos = np.searchsorted(air, rem[live] / b - _EPS, side="left")
+            inside = pos < m
+            if not inside.any():
+                continue
+            A, pos = live[inside], pos[inside]
+            A = np.concatenate([A, A])
+            B = np.concatenate([pos, best_from[pos]])
+            # 去掉一台调峰机或一台主机仍满足 -> 多余一台，不考虑
+            keep = (
+                ((b - 1) * air[B] < rem[A] - _EPS)
+                & ((a - 1) * air[A] + b * air[B] < q_target - _EPS)
+                & (B != A)
+            )
+            if keep.any():
+                n = int(keep.sum())
+                yield _batch(A[keep], np.full(n, a), B[keep], np.full(n, b))
+
+
+def _rounded(F: np.ndarray) -> np.ndarray:
+    """比较用精度：过盈 0.01 m³/min、比功率 1e-4、年耗电 1 kWh，避免浮点误差造成的伪支配。"""
+    return np.column_stack([F[:, 0].round(2), F[:, 1].round(4), F[:, 2], F[:, 3].round(0)])
+
+
+def _dominated_by(front: np.ndarray, G: np.ndarray) -> np.ndarray:
+    """G 中各行是否被 front 中某行支配或与之相同。"""
+    if len(front) == 0 or len(G) == 0:
+        return np.zeros(len(G), dtype=bool)
+    return (front[:, None, :] <= G[None, :, :]).all(axis=2).any(axis=0)
+
+
+def non_dominated(F: np.ndarray) -> np.ndarray:
+    """返回互不支配的行号（目标值完全相同者只保留一行）。
+
+    按字典序排序后，剩余行中的第一行必不被支配：取出它并删去它所支配的行，重复至取完。
+    耗时与「行数 × 前沿大小」成正比，前沿通常只有几十个方案。
+    """
+    if len(F) == 0:
+        return np.empty(0, dtype=np.int64)
+    G, first = np.unique(_rounded(F), axis=0, return_index=True)  # 去重并按字典序排序
+    alive = np.arange(len(G))
+    front = []
+    while alive.size:
+        top = alive[0]
+        front.append(top)
+        rest = alive[1:]
+        alive = rest[~(G[top] <= G[rest]).all(axis=1)]
+    return first[np.array(front)]
+
+
+def _merge_front(front_F, front_C, F, C):
+    """把一批候选并入当前前沿，返回新的前沿 (目标矩阵, 组合)。"""
+    G = _rounded(F)
+    fresh = ~_dominated_by(_rounded(front_F), G)
+    F, C = F[fresh], C[fresh]
+    if len(F) == 0:
+        return front_F, front_C
+    nd = non_dominated(F)
+    F, C = F[nd], C[nd]
+    stale = _dominated_by(_rounded(F), _rounded(front_F))
+    return np.vstack([front_F[~stale], F]), np.vstack([front_C[~stale], C])
+
+
+def select_top_k(F: np.ndarray, k: int) -> list[tuple[int, list[str]]]:
+    """从前沿中选 k 个：先取各目标最优者，再依次取与已选方案（归一化后）距离最远者。
+
+    返回 [(行号, 该方案为最优的目标名)]。
+    """
+    n = len(F)
+    span = F.max(axis=0) - F.min(axis=0)
+    norm = (F - F.min(axis=0)) / np.where(span > 0, span, 1)
+    total = norm.sum(axis=1)
+    chosen: list[int] = []
+    for col in range(F.shape[1]):
+        best = int(np.lexsort((total, F[:, col]))[0])
+        if best not in chosen:
+            chosen.append(best)
+    chosen = chosen[:k]
+    if len(chosen) < min(k, n):
+        dist = np.min(np.linalg.norm(norm[:, None, :] - norm[chosen][None, :, :], axis=2), axis=1)
+        while len(chosen) < min(k, n):
+            nxt = int(np.argmax(dist))
+            chosen.append(nxt)
+            dist = np.minimum(dist, np.linalg.norm(norm - norm[nxt], axis=1))
+    G = _rounded(F)
+    best_per_col = G.min(axis=0)
+    return [(i, [OBJECTIVES[c] for c in range(G.shape[1]) if G[i, c] <= best_per_col[c]]) for i in chosen]
+
+
+def pareto_schemes(
+    view: CatalogView,
+    q_target: float,
+    max_units: int,
+    top_k: int,
+    seeds: list[tuple[str, list[tuple[dict, int]]]] | None = None,
+    running_hours_per_year: float | None = None,
+) -> list[tuple[str, list[tuple[dict, int]], dict]]:
+    """返回 [(方案名, [(机型, 台数)], 指标)]，按过盈从小到大排列；seeds 为需一并参与比较的已有方案。"""
+    hours = running_hours_per_year if running_hours_per_year is not None else YEAR_RUNNING_TIME
+    top_k = max(1, min(int(top_k), MAX_PARETO_TOP_K))
+    rows, seen = [], set()
+    for r in view.by_air:  # by_air 同气量内比功率低者在前：同气量只保留比功率最低者
+        if r["_air"] > 0 and r["_air"] not in seen:
+            seen.add(r["_air"])
+            rows.append(r)
+    air = np.array([r["_air"] for r in rows])
+    ec = np.array([float(r["energy_con"]) for r in rows])
+
+    front_F, front_C = np.empty((0, 4)), np.empty((0, 4), dtype=np.int64)
+    if rows:
+        # 枚举批次随台数上限平方增长，与精确求解同样以 MAX_SOLVER_UNITS 为界（已有方案不受此限）
+        for F, C in _enumerate(air, ec, q_target, min(max_units, MAX_SOLVER_UNITS), hours):
+            front_F, front_C = _merge_front(front_F, front_C, F, C)
+    # 已有方案一并比较；组合列记为 [-(序号+1), 0, -1, 0]
+    seed_schemes, seed_F = [], []
+    for _, scheme in seeds or []:
+        if sum(cnt for _, cnt in scheme) <= max_units and view.total_air(scheme) >= q_target - _EPS:
+            seed_F.append(scheme_metrics(scheme, view, q_target, hours))
+            seed_schemes.append(scheme)
+    if seed_F:
+        seed_C = np.array([[-(s + 1), 0, -1, 0] for s in range(len(seed_F))], dtype=np.int64)
+        front_F, front_C = _merge_front(front_F, front_C, np.array(seed_F), seed_C)
+    if len(front_F) == 0:
+        return []
+
+    def _unit(r):
+        return {k: v for k, v in r.items() if not k.startswith("_")}
+
+    def _scheme(i, ci, j, cj):
+        if i < 0:
+            return seed_schemes[-i - 1]
+        scheme = [(_unit(rows[i]), ci)]
+        if j >= 0:
+            scheme.append((_unit(rows[j]), cj))
+        return scheme
+
+    result = []
+    for row, best_of in select_top_k(front_F, top_k):
+        over, sp, units, kwh = front_F[row].tolist()
+        metrics = {
+            "overage": round(over, 2),
+            "specific_power": round(sp, 4),
+            "units": int(units),
+            "annual_kwh": int(round(kwh)),
+            "best_of": best_of,
+        }
+        result.append((_scheme(*front_C[row].tolist()), metrics))
+    result.sort(key=lambda x: (x[1]["overage"], x[1]["specific_power"], x[1]["units"]))
+    named = []
+    for n, (scheme, metrics) in enumerate(result, 1):
+        tags = "、".join(OBJECTIVE_LABELS[o] for o in metrics["best_of"])
+        named.append((f"权衡方案{n}" + (f"（{tags}）" if tags else ""), scheme, metrics))
+    return named
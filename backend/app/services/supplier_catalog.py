@@ -0,0 +1,106 @@
+"""供应商机型目录索引：供 device_match 做候选筛选与最接近气量查找
+
+目录按额定压力 origin_pre 排序，「压力 >= 需求压力」即为一段后缀（bisect 定位）；
+每个不同的后缀起点缓存一份候选视图，视图内按 (气量, 比功率, 目录序号) 排序，
+最接近气量只需 bisect 后比较左右两个邻居，(品牌, 型号) -> 机型 用哈希表查找。
+推荐耗时因此与目录规模基本无关，结果与逐个扫描候选完全一致（同距离时的取舍规则相同）。
+"""
+import bisect
+
+
+def supplier_to_dict(supplier) -> dict:
+    """将 ORM MachineSupplier 转为 cal_func 所需的 new_eq 项格式。"""
+    return {
+        "brand": supplier.brand,
+        "model": supplier.model,
+        "ori_power": int(supplier.ori_power),
+        "air": float(supplier.air),
+        "isFC": bool(supplier.is_FC),
+        "energy_con": float(supplier.energy_con),
+        "energy_con_min": float(supplier.energy_con_min),
+    }
+
+
+def _catalog_row(supplier, idx: int) -> dict:
+    d = supplier_to_dict(supplier)
+    d["_origin_pre"] = float(supplier.origin_pre or 0)
+    d["_air"] = float(supplier.air or 0)  # 供应商设备气量 (m³/min)，用于匹配是否满足 q_target
+    d["_idx"] = idx  # 目录中的原始顺序，用于同等条件下的取舍
+    return d
+
+
+class CatalogView:
+    """满足压力要求的候选机型。candidates 保持目录原始顺序；by_air 按 (气量, 比功率, 序号) 排序。"""
+
+    def __init__(self, rows: list[dict]):
+        self.candidates = sorted(rows, key=lambda r: r["_idx"])
+        self.by_air = sorted(rows, key=lambda r: (r["_air"], r["energy_con"], r["_idx"]))
+        self.airs = [r["_air"] for r in self.by_air]
+        self.by_key: dict[tuple, dict] = {}
+        for r in self.candidates:
+            self.by_key.setdefault((r["brand"], r["model"]), r)
+
+    def __len__(self) -> int:
+        return len(self.by_air)
+
+    def _run_start(self, pos: int) -> int:
+        """与 by_air[pos] 气量相同的一段中第一条（比功率最低）的位置。"""
+        return bisect.bisect_left(self.airs, self.airs[pos])
+
+    def closest(self, to_air: float, tiebreak: str = "air") -> dict:
+        """单台气量最接近 to_air 的机型；距离相同取比功率低者，仍相同时
+        tiebreak="air" 取气量小者（同按气量排序后的 min），"index" 取目录中靠前者（同对原始候选列表的 min）。"""
+        pos = bisect.bisect_left(self.airs, to_air)
+        options = []
+        if pos < len(self.airs):
+            options.append(self.by_air[pos])
+        if pos > 0:
+            options.append(self.by_air[self._run_start(pos - 1)])
+
+        def key(r):
+            k = (abs(r["_air"] - to_air), r["energy_con"])
+            return k + ((r["_air"], r["_idx"]) if tiebreak == "air" else (r["_idx"],))
+
+        return min(options, key=key)
+
+    def at_least(self, need: float) -> dict:
+        """单台气量 >= need 的最小机型（同气量取比功率低者）；都不足时取气量最大者。"""
+        pos = bisect.bisect_left(self.airs, need)
+        if pos < len(self.airs):
+            return self.by_air[pos]
+        return self.by_air[self._run_start(len(self.airs) - 1)]
+
+    def unit_air(self, brand, model) -> float:
+        row = self.by_key.get((brand, model))
+        return (row["_air"] or 0) if row else 0.0
+
+    def total_air(self, scheme: list[tuple[dict, int]]) -> float:
+        """方案总气量：按 brand+model 查单台气量 × 台数。"""
+        total = 0.0
+        for u, cnt in scheme:
+            total += self.unit_air(u.get("brand"), u.get("model")) * cnt
+        return total
+
+
+class SupplierCatalog:
+    """供应商机型目录（只读）。由 MachineSupplier 或同名属性的对象列表构建，可跨进程传递。
+    version 为构建时的目录版本号（见 catalog_snapshot），临时构建的目录为 None。"""
+
+    def __init__(self, suppliers, version: int | None = None):
+        self.version = version
+        rows = [_catalog_row(s, i) for i, s in enumerate(suppliers)]
+        self.rows = sorted(rows, key=lambda r: (r["_origin_pre"], r["_idx"]))
+        self.pressures = [r["_origin_pre"] for r in self.rows]
+        self._views: dict[int, CatalogView] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def view(self, min_pressure: float) -> CatalogView:
+        """额定压力 >= min_pressure 的候选视图（同一后缀起点只构建一次）。"""
+        start = bisect.bisect_left(self.pressures, min_pressure)
+        view = self._views.get(start)
+        if view is None:
+            view = CatalogView(self.rows[start:])
+            self._views[start] = view
+        return view
@@ -0,0 +1,121 @@
+"""按压力分区推荐：大型站房按需求压力分成若干区，各区独立推荐后合并
+
+demand_p 取全部客户机实际压力的最大值，一台高压机会迫使全部候选机型都满足该压力；
+分区后每区只需满足区内最高压力，台数上限也按区内台数计。
+客户机按需求压力排序，与区内最低压力相差超过 step（默认 0.1 MPa）即另起一区。
+多区且台数较多时，各区推荐分发到常驻进程池（RECOMMEND_WORKERS 个 spawn 进程）并行，
+合并后的逐台选型与原客户机顺序一一对应，可直接用于节能计算与报告。
+"""
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import get_settings
+from app.services.device_match import client_pressure, demand_q, recommend_suppliers_multi
+from app.services.supplier_catalog import SupplierCatalog
+
+ZONE_PRESSURE_STEP = 0.1  # MPa
+PARALLEL_MIN_CLIENTS = 24  # 台数少于此时顺序计算，省去进程间传递开销
+
+settings = get_settings()
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if settings.RECOMMEND_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn：不从带线程的 Web 进程 fork
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RECOMMEND_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def pressure_zones(client_list: list[dict], step: float = ZONE_PRESSURE_STEP) -> list[list[int]]:
+    """按需求压力分区，返回各区客户机下标（区按压力从低到高，区内保持原顺序）。"""
+    order = sorted(range(len(client_list)), key=lambda i: client_pressure(client_list[i]))
+    zones: list[list[int]] = []
+    zone_floor = None
+    for i in order:
+        p = client_pressure(client_list[i])
+        if zone_floor is None or p > zone_floor + step + 1e-9:
+            zones.append([])
+            zone_floor = p
+        zones[-1].append(i)
+    return [sorted(z) for z in zones]
+
+
+def _recommend_zone(zone_clients: list[dict], catalog: SupplierCatalog, kwargs: dict):
+    return recommend_suppliers_multi(zone_clients, catalog, max_units=len(zone_clients), **kwargs)
+
+
+def recommend_by_zone(
+    client_list: list[dict],
+    supplier_objs: list | SupplierCatalog,
+    step: float = ZONE_PRESSURE_STEP,
+    margin_ratio: float = 1.1,
+    use_caliber_a: bool = True,
+    strategy: str | None = None,
+) -> tuple[list[dict], list[tuple[dict, int]], list[dict], str]:
+    """返回值与 recommend_suppliers_multi 相同：(逐台选型, 主方案, 方案列表, 摘要)。
+
+    方案列表只有一项「分压力区组合」（各区主方案合并），其 zones 中列出每区的压力、机器编号与该区全部方案；
+    任一区无法推荐时整体失败，摘要说明是哪一区。
+    """
+    n = len(client_list)
+    if n == 0:
+        return [], [], [], "无客户机参与计算"
+    catalog = supplier_objs if isinstance(supplier_objs, SupplierCatalog) else SupplierCatalog(supplier_objs)
+    zones = pressure_zones(client_list, step)
+    kwargs = {"margin_ratio": margin_ratio, "use_caliber_a": use_caliber_a, "strategy": strategy}
+    zone_clients = [[client_list[i] for i in z] for z in zones]
+
+    pool = _get_pool() if len(zones) > 1 and n >= PARALLEL_MIN_CLIENTS else None
+    if pool is None:
+        results = [_recommend_zone(c, catalog, kwargs) for c in zone_clients]
+    else:
+        futures = [pool.submit(_recommend_zone, c, catalog, kwargs) for c in zone_clients]
+        results = [f.result() for f in futures]
+
+    flat: list[dict | None] = [None] * n
+    merged: dict[tuple, list] = {}
+    zone_info, summaries = [], []
+    for k, (idx, clients, (zone_flat, zone_primary, zone_schemes, zone_summary)) in enumerate(
+        zip(zones, zone_clients, results), 1
+    ):
+        p_zone = max(client_pressure(c) for c in clients)
+        label = f"压力区{k}（{p_zone} MPa，{len(clients)} 台）"
+        if not zone_flat:
+            return [], [], [], f"{label}：{zone_summary}"
+        for i, u in zip(idx, zone_flat):
+            flat[i] = u
+        for u, cnt in zone_primary:
+            key = (u.get("brand"), u.get("model"))
+            if key in merged:
+                merged[key][1] += cnt
+            else:
+                merged[key] = [u, cnt]
+        zone_info.append({
+            "pressure": p_zone,
+            "client_nos": [c.get("no") for c in clients],
+            "q_demand": demand_q(clients, use_caliber_a=use_caliber_a),
+            "schemes": zone_schemes,
+        })
+        summaries.append(f"{label}：{zone_summary}")
+
+    scheme_primary = [(u, cnt) for u, cnt in merged.values()]
+    schemes_all = [{
+        "name": "分压力区组合",
+        "scheme": [{"brand": u.get("brand"), "model": u.get("model"), "count": cnt} for u, cnt in scheme_primary],
+        "total_air": round(sum(z["schemes"][0]["total_air"] for z in zone_info), 2),
+        "zones": zone_info,
+    }]
+    summary = f"按需求压力分为 {len(zones)} 个区分别推荐。" + "；".join(summaries)
+    return flat, scheme_primary, schemes_all, summary
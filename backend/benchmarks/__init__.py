@@ -0,0 +1 @@
+"""性能基准：在 backend/ 下执行 python -m benchmarks.run（无需数据库与外部服务）"""
@@ -0,0 +1,196 @@
+"""device_match / cal_func 热点路径基准
+
+在 backend/ 下执行：
+  python -m benchmarks.run                                   # 默认规模网格
+  python -m benchmarks.run --models 10 1000 --clients 1 50   # 指定规模
+  python -m benchmarks.run --compare benchmarks/results/<旧版本>.json
+
+每个 (机型数, 客户机台数) 组合先预热一次，再重复计时（单项累计超过 --max-seconds 即停止），
+结果（最小/中位/最大耗时，秒）连同版本信息写入 JSON；--compare 时按中位耗时与旧结果对比，
+超过 --threshold 倍视为退化，进程以非零状态退出。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.services import device_match as dm
+from app.services.cal_batch import fleet_savings, originEC_to_dataframe_batch
+from app.services.cal_func import originEC_to_dataframe, final_results_excel
+from app.services.combo_solver import solve_combination
+from app.services.scheme_pareto import pareto_schemes
+from app.services.supplier_catalog import CatalogView, SupplierCatalog, supplier_to_dict
+from benchmarks.synthetic import make_catalog, make_fleet
+
+DEFAULT_MODELS = [10, 1000, 10000, 100000]
+DEFAULT_CLIENTS = [1, 50, 500]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _cases(suppliers: list, fleet: list[dict], hours: int, tmp_dir: str) -> dict:
+    """本规模下各计时项 -> 无参函数。推荐类各项共用同一目录索引（与跨请求共用的目录快照一致）。"""
+    n = len(fleet)
+    catalog = SupplierCatalog(suppliers)
+    q_target = dm.demand_q(fleet)
+    view = catalog.view(dm.demand_p(fleet))
+    start = len(catalog.rows) - len(view)
+    candidates = view.candidates
+    client_powers = {c["ori_power"] for c in fleet}
+    new_eq, _, _, _ = dm.recommend_suppliers_multi(fleet, catalog, max_units=n)
+    if not new_eq:  # 合成数据中压力不满足时，新设备取目录中的任一机型，保证报告可算
+        new_eq = [supplier_to_dict(suppliers[0])] * n if suppliers else []
+
+    def recommend(**kwargs):
+        return lambda: dm.recommend_suppliers_multi(fleet, catalog, max_units=n, **kwargs)
+
+    return {
+        "SupplierCatalog": lambda: SupplierCatalog(suppliers),
+        "CatalogView": lambda: CatalogView(catalog.rows[start:]),
+        "recommend_suppliers_multi": recommend(),
+        "recommend_suppliers_multi[optimal]": recommend(strategy="optimal"),
+        "recommend_suppliers_multi[optimal_energy]": recommend(strategy="optimal_energy"),
+        "recommend_suppliers_multi[top_k=5]": recommend(top_k=5, running_hours_per_year=hours),
+        "_scheme_flow_match": lambda: dm._scheme_flow_match(fleet, view, q_target, n),
+        "_scheme_by_avg_flow": lambda: dm._scheme_by_avg_flow(view, q_target, n),
+        "_scheme_two_same": lambda: dm._scheme_two_same(candidates, q_target),
+        "_scheme_same_model_multi": lambda: dm._scheme_same_model_multi(candidates, q_target, n),
+        "_greedy_match_flow": lambda: dm._greedy_match_flow(candidates, q_target, n),
+        "_greedy_balanced": lambda: dm._greedy_balanced(candidates, q_target, n, client_powers),
+        "solve_combination[overage]": lambda: solve_combination(candidates, q_target, n, "overage"),
+        "solve_combination[energy]": lambda: solve_combination(candidates, q_target, n, "energy"),
+        "pareto_schemes": lambda: pareto_schemes(view, q_target, n, 5, running_hours_per_year=hours),
+        "originEC_to_dataframe": lambda: originEC_to_dataframe(fleet, new_eq, hours),
+        "originEC_to_dataframe_batch": lambda: originEC_to_dataframe_batch(fleet, new_eq, hours),
+        "fleet_savings": lambda: fleet_savings(fleet, new_eq, hours),
+        "final_results_excel": lambda: final_results_excel(fleet, new_eq, tmp_dir, hours),
+    }
+
+
+def _time(fn, repeat: int, max_seconds: float) -> list[float]:
+    fn()  # 预热：首次导入、视图缓存等不计入
+    times: list[float] = []
+    while len(times) < repeat and (not times or sum(times) < max_seconds):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(
+    models: list[int],
+    clients: list[int],
+    repeat: int = 5,
+    max_seconds: float = 10.0,
+    hours: int = 8000,
+    only: list[str] | None = None,
+    seed: int = 0,
+) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aircomp_bench_") as tmp_dir:
+        for m in models:
+            suppliers = make_catalog(m, seed)
+            for n in clients:
+                fleet = make_fleet(n, seed)
+                for case, fn in _cases(suppliers, fleet, hours, tmp_dir).items():
+                    if only and not any(case.startswith(o) for o in only):
+                        continue
+                    times = _time(fn, repeat, max_seconds)
+                    row = {
+                        "case": case,
+                        "models": m,
+                        "clients": n,
+                        "runs": len(times),
+                        "min_s": min(times),
+                        "median_s": statistics.median(times),
+                        "max_s": max(times),
+                    }
+                    results.append(row)
+                    print(f"[AirComp] {case:<44} 机型 {m:>6}  客户机 {n:>3}  中位 {row['median_s'] * 1e3:10.3f} ms", flush=True)
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "max_seconds": max_seconds,
+            "running_hours_per_year": hours,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """按 (case, models, clients) 对齐，返回中位耗时比值超过 threshold 的项。"""
+    base = {(r["case"], r["models"], r["clients"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["case"], r["models"], r["clients"]))
+        if not old or old["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        flag = "  <- 退化" if ratio > threshold else ""
+        print(
+            f"[AirComp] {r['case']:<44} 机型 {r['models']:>6}  客户机 {r['clients']:>3}  "
+            f"{old['median_s'] * 1e3:10.3f} -> {r['median_s'] * 1e3:10.3f} ms  x{ratio:.2f}{flag}",
+            flush=True,
+        )
+        if ratio > threshold:
+            regressions.append({**r, "baseline_median_s": old["median_s"], "ratio": ratio})
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="device_match / cal_func 性能基准（合成数据）")
+    parser.add_argument("--models", type=int, nargs="+", default=DEFAULT_MODELS, help="供应商机型数（可多个）")
+    parser.add_argument("--clients", type=int, nargs="+", default=DEFAULT_CLIENTS, help="客户机台数（可多个）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="单项累计计时上限（秒），至少计一次")
+    parser.add_argument("--hours", type=int, default=8000, help="年运行时间（小时）")
+    parser.add_argument("--only", nargs="+", default=None, help="只跑名称以这些前缀开头的项")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认 benchmarks/results/bench_<时间>.json")
+    parser.add_argument("--compare", default=None, help="与之对比的旧结果 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="中位耗时超过旧结果的倍数视为退化")
+    args = parser.parse_args(argv)
+
+    result = run(args.models, args.clients, args.repeat, args.max_seconds, args.hours, args.only, args.seed)
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"[AirComp] 结果已写入 {output}", flush=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"[AirComp] {len(regressions)} 项耗时超过旧结果 {args.threshold} 倍", flush=True)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
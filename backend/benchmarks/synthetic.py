@@ -0,0 +1,54 @@
+"""合成数据：按规模生成供应商机型目录与客户机群，同一 seed 结果相同
+
+供应商机型为与 MachineSupplier 同名属性的只读对象（可直接传给 SupplierCatalog / recommend_suppliers_multi），
+客户机为 client_orm_to_dict 的输出格式。数值取值范围与库表精度（DECIMAL 位数）一致。
+"""
+import random
+from types import SimpleNamespace
+
+BRANDS = ["阿特拉斯", "凯撒", "英格索兰", "复盛", "其他"]
+PRESSURES = [0.7, 0.8, 0.85, 1.0, 1.25]
+CLIENT_POWERS = [15, 22, 37, 45, 55, 75, 90, 110, 132, 160, 200, 250]
+
+
+def make_catalog(n_models: int, seed: int = 0) -> list[SimpleNamespace]:
+    """n_models 个供应商机型：气量 1~80 m³/min，比功率 4.8~7.5 kW/(m³/min)。"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_models):
+        air = round(rng.uniform(1.0, 80.0), 2)
+        energy_con = round(rng.uniform(4.8, 7.5), 2)
+        rows.append(SimpleNamespace(
+            brand=rng.choice(BRANDS),
+            model=f"SYN-{i:06d}",
+            ori_power=round(air * energy_con, 5),
+            air=air,
+            is_FC=rng.random() < 0.6,
+            origin_pre=rng.choice(PRESSURES),
+            energy_con=energy_con,
+            energy_con_min=round(energy_con * rng.uniform(0.85, 0.95), 4),
+        ))
+    return rows
+
+
+def make_fleet(n_clients: int, seed: int = 0) -> list[dict]:
+    """n_clients 台客户机：额定功率取常见档位，年运行 4000~8760 h，加载率 40%~95%。"""
+    rng = random.Random(seed + 1)
+    fleet = []
+    for i in range(n_clients):
+        power = rng.choice(CLIENT_POWERS)
+        run_time = rng.randint(4000, 8760)
+        origin_pre = rng.choice(PRESSURES[:4])
+        fleet.append({
+            "no": i + 1,
+            "model": f"CL-{i:04d}",
+            "run_time": run_time,
+            "load_time": int(run_time * rng.uniform(0.4, 0.95)),
+            "ori_power": power,
+            "air": round(power / rng.uniform(5.5, 7.5), 2),
+            "brand": rng.choice(BRANDS),
+            "isFC": rng.random() < 0.4,
+            "origin_pre": origin_pre,
+            "actucal_pre": round(origin_pre - rng.choice([0.0, 0.05, 0.1]), 2),
+        })
+    return fleet